@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ema_core
+import ema_documents
+import ema_ingest
+import ema_metrics
+import ema_packing
+import ema_preflight
+import ema_ratelimit
+import ema_trace
+
+# Resumable batch extraction over a corpus of documents.
+#
+# Progress is kept in an append-only journal (one JSON line per state change:
+# pending, in_flight, done, failed). Results are appended to a separate data file and
+# the "done" entry records their byte offset and length, written only after the result
+# itself is on disk. A restart replays the journal, skips documents that are done and
+# retries the rest. The final output is assembled from the data file in document
+# order, so it is byte-identical however often the run was interrupted.
+#
+# Documents are parsed on a process pool (ema_ingest) and each section 4.1 is handed to
+# the extraction threads as soon as it is read, so parsing never holds up the model calls.
+
+WORKERS = 4
+
+# Stop scheduling new documents after this many consecutive quota failures
+MAX_CONSECUTIVE_RATE_LIMITS = 5
+
+
+def _fsync_append(f, data):
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _truncate_torn_tail(path):
+    """
+    Cut a file back to just after its last newline, dropping a line torn by a crash so the
+    next append does not run on from it
+    """
+    with open(path, "rb+") as f:
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                position += newline + 1 - step
+                break
+            position -= step
+        if position < end:
+            f.truncate(position)
+
+
+class Journal:
+    """
+    Write-ahead journal of per-document state plus the results data file
+    """
+
+    def __init__(self, journal_path, data_path):
+        self.journal_path = journal_path
+        self.data_path = data_path
+        self.lock = threading.Lock()
+        self.states = self._replay()
+        self.journal_file = open(journal_path, "a", encoding="utf-8")
+        self.data_file = open(data_path, "ab")
+
+    def _replay(self):
+        states = {}
+        if not os.path.exists(self.journal_path):
+            return states
+        _truncate_torn_tail(self.journal_path)
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Unreadable line from an earlier crash
+                    continue
+                if entry["state"] == "done" and entry["offset"] + entry["length"] > data_size:
+                    continue
+                states[entry["doc"]] = entry
+        return states
+
+    def record(self, doc, state, **fields):
+        entry = {"doc": doc, "state": state, "ts": time.time()}
+        entry.update(fields)
+        with self.lock:
+            _fsync_append(self.journal_file, json.dumps(entry) + "\n")
+            self.states[doc] = entry
+
+    def store_result(self, doc, data):
+        """
+        Append a result to the data file, then journal it as done with its offset
+        """
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        with self.lock:
+            offset = self.data_file.seek(0, os.SEEK_END)
+            _fsync_append(self.data_file, payload + b"\n")
+        self.record(doc, "done", offset=offset, length=len(payload))
+
+    def read_result(self, doc):
+        entry = self.states[doc]
+        with open(self.data_path, "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(f.read(entry["length"]))
+
+    def state(self, doc):
+        entry = self.states.get(doc)
+        return entry["state"] if entry else None
+
+    def close(self):
+        self.journal_file.close()
+        self.data_file.close()
+
+
+def list_documents(input_dir):
+    """
+    Return (doc id, path) pairs for every supported file, in a stable order
+    """
+    documents = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if ema_documents.is_supported(path):
+                documents.append((os.path.relpath(path, input_dir), path))
+    return sorted(documents)
+
+
+def write_output(journal, documents, output_path):
+    """
+    Assemble the final output in document order: {doc id: extracted array}
+    """
+    results = {doc: journal.read_result(doc) for doc, _ in documents if journal.state(doc) == "done"}
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, output_path)
+    return len(results)
+
+
+def run_batch(input_dir, output_path, journal_path=None, workers=WORKERS, pipeline_options=None, log=print,
+              ingest_workers=ema_ingest.INGEST_WORKERS, pack=False):
+    """
+    Extract every document under input_dir, resuming from the journal if it exists.
+    With pack, short documents share model requests (ema_packing); workers then bounds
+    the concurrent requests rather than the documents in flight.
+    Returns a dict of counts by final state.
+    """
+    journal_path = journal_path or output_path + ".journal"
+    journal = Journal(journal_path, output_path + ".data")
+    documents = list_documents(input_dir)
+    pipeline_options = dict(pipeline_options or {})
+    # Every call of the run, packed or not, is charged to this user's budget
+    user = pipeline_options.pop("user", "batch")
+    packer = None
+    document_workers = workers
+    if pack:
+        packer = ema_packing.PackingExtractor(workers=workers, user=user)
+        pipeline_options["extractor"] = packer.extract
+        # Enough documents in flight to fill the packed requests
+        document_workers = workers * packer.max_documents
+
+    started = time.monotonic()
+    todo = [(doc, path) for doc, path in documents if journal.state(doc) != "done"]
+    retried = sum(1 for doc, _ in todo if journal.state(doc) == "failed")
+    for doc, _ in todo:
+        if journal.state(doc) is None:
+            journal.record(doc, "pending")
+    log(f"{len(documents)} documents, {len(documents) - len(todo)} already done, {len(todo)} to run")
+
+    rate_limited = {"consecutive": 0}
+    rate_limited_lock = threading.Lock()
+    stop = threading.Event()
+    doc_ids = {path: doc for doc, path in todo}
+    # Bounds how far reading runs ahead of extraction
+    slots = threading.BoundedSemaphore(document_workers * 2)
+
+    def process(doc, path, text):
+        try:
+            if not stop.is_set():
+                extract_document(doc, path, text)
+        finally:
+            slots.release()
+
+    def extract_document(doc, path, text):
+        estimate = ema_preflight.preflight(text, ema_core.cdp_ema_prompt)
+        reservation, budget_message = ema_preflight.reserve(
+            user, estimate["input_tokens"] + estimate["output_tokens"] + estimate["thinking_tokens"]
+        )
+        if reservation is None:
+            journal.record(doc, "failed", error=budget_message)
+            if not stop.is_set():
+                log(f"{budget_message}; stopping. Re-run the same command to resume.")
+                stop.set()
+            return
+        journal.record(doc, "in_flight")
+        try:
+            result = ema_core.run_pipeline(
+                text,
+                product=os.path.splitext(os.path.basename(path))[0],
+                user=user,
+                source=path,
+                **pipeline_options
+            )
+            journal.store_result(doc, result["data"])
+            with rate_limited_lock:
+                rate_limited["consecutive"] = 0
+        except ema_ratelimit.RateLimitError as e:
+            journal.record(doc, "failed", error=f"rate limited: {e}")
+            with rate_limited_lock:
+                rate_limited["consecutive"] += 1
+                exhausted = rate_limited["consecutive"] >= MAX_CONSECUTIVE_RATE_LIMITS
+            if exhausted and not stop.is_set():
+                log("Quota exhausted; stopping. Re-run the same command to resume.")
+                stop.set()
+        except Exception as e:
+            journal.record(doc, "failed", error=str(e))
+            log(f"Failed {doc}: {e}")
+        finally:
+            ema_preflight.release(reservation)
+
+    try:
+        with ema_trace.span("batch.run", documents=len(todo)), ema_ingest.IngestPool(ingest_workers) as ingest, \
+                ThreadPoolExecutor(max_workers=document_workers) as pool:
+            for path, text, error in ingest.iter_sections(path for _, path in todo):
+                doc = doc_ids[path]
+                if error is not None:
+                    journal.record(doc, "failed", error=f"read failed: {error}")
+                    log(f"Failed {doc}: could not read: {error}")
+                    continue
+                slots.acquire()
+                if stop.is_set():
+                    slots.release()
+                    break
+                pool.submit(ema_trace.bind(process, "batch.document"), doc, path, text)
+        written = write_output(journal, documents, output_path)
+    finally:
+        journal.close()
+        if packer is not None:
+            packer.close()
+            log(f"Packed {packer.stats['documents']} documents into {packer.stats['requests']} requests "
+                f"({packer.stats['fallbacks']} extracted on their own after a packed request)")
+
+    counts = {}
+    for doc, _ in documents:
+        state = journal.state(doc)
+        counts[state] = counts.get(state, 0) + 1
+    log(f"Wrote {written} results to {output_path}: {counts}")
+    ema_metrics.record(
+        "batch",
+        documents=len(todo),
+        retried=retried,
+        done=sum(1 for doc, _ in todo if journal.state(doc) == "done"),
+        failed=sum(1 for doc, _ in todo if journal.state(doc) == "failed"),
+        seconds=time.monotonic() - started,
+        workers=workers,
+        packed=pack
+    )
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumable batch extraction of a folder of SmPC documents")
+    parser.add_argument("input_dir")
+    parser.add_argument("output", help="combined JSON output file")
+    parser.add_argument("--journal", help="journal path (default: <output>.journal)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--ingest-workers", type=int, default=ema_ingest.INGEST_WORKERS,
+                        help="processes used to parse documents")
+    parser.add_argument("--pack", action="store_true", help="pack short documents into shared requests")
+    parser.add_argument("--user", default="batch", help="user whose token budget the run is charged to")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace (open in Perfetto) to PATH")
+    args = parser.parse_args(argv)
+    if args.trace:
+        ema_trace.enable(args.trace)
+    counts = run_batch(args.input_dir, args.output, args.journal, args.workers, pipeline_options={"user": args.user},
+                       ingest_workers=args.ingest_workers, pack=args.pack)
+    return 1 if counts.get("failed") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
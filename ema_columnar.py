@@ -0,0 +1,229 @@
+import io
+import json
+import os
+from contextlib import closing
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+import ema_results
+import ema_terms
+from ema_validate import FIELD_NAMES
+
+# Columnar form of extraction results. As nested dicts every indication carries a
+# value/evidence/confidence dict per field, and long strings such as
+# Disease_level_full_text repeat across all indications of a section. Here each
+# indication is one row of an Arrow table: every field becomes a value, an evidence and
+# a float32 confidence column, and string columns are dictionary-encoded, so a repeated
+# string is stored once. The table built from the result store is cached as an Arrow IPC
+# file and memory-mapped, and to_pandas() returns Arrow-backed frames that share its
+# buffers instead of copying them.
+
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+COLUMNAR_PATH = os.path.join(STORE_DIR, "results.arrow")
+
+# Rows converted per record batch while building, bounding the Python objects alive at once
+CHUNK_ROWS = int(os.environ.get("EMA_COLUMNAR_CHUNK_ROWS", "5000"))
+
+_STRING = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = pa.schema(
+    [
+        ("indication_id", pa.int64()),
+        ("Product", _STRING),
+        ("position", pa.int32()),
+        ("disease_id", _STRING),
+    ]
+    + [
+        column
+        for field in FIELD_NAMES
+        for column in (
+            (field, pa.int32() if field == "Indication #" else _STRING),
+            (f"{field} evidence", _STRING),
+            (f"{field} confidence", pa.float32()),
+        )
+    ]
+)
+
+# The columns shown and exported by default: one value per field
+VALUE_COLUMNS = ["Product", "disease_id"] + FIELD_NAMES
+EVIDENCE_COLUMNS = [f"{field} {part}" for field in FIELD_NAMES for part in ("evidence", "confidence")]
+
+
+def _value(field, value):
+    if field == "Indication #":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _confidence(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TableBuilder:
+    """
+    Append indications one at a time; every CHUNK_ROWS rows become an Arrow record batch
+    """
+
+    def __init__(self, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.batches = []
+        self._reset()
+
+    def _reset(self):
+        self.columns = {name: [] for name in SCHEMA.names}
+        self.rows = 0
+
+    def add(self, product, position, item, indication_id=None):
+        columns = self.columns
+        columns["indication_id"].append(indication_id)
+        columns["Product"].append(product)
+        columns["position"].append(position)
+        disease_ids = ema_terms.disease_ids(item)
+        columns["disease_id"].append(disease_ids[0] if disease_ids else None)
+        for field in FIELD_NAMES:
+            raw = item.get(field) if isinstance(item, dict) else None
+            if isinstance(raw, dict):
+                value, evidence, confidence = raw.get("value"), raw.get("evidence"), raw.get("confidence")
+            else:
+                value, evidence, confidence = raw, None, None
+            columns[field].append(_value(field, value))
+            columns[f"{field} evidence"].append(_value(None, evidence))
+            columns[f"{field} confidence"].append(_confidence(confidence))
+        self.rows += 1
+        if self.rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        arrays = []
+        for schema_field in SCHEMA:
+            values = self.columns[schema_field.name]
+            if pa.types.is_dictionary(schema_field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, schema_field.type))
+        self.batches.append(pa.RecordBatch.from_arrays(arrays, schema=SCHEMA))
+        self._reset()
+
+    def table(self, metadata=None):
+        self.flush()
+        table = pa.Table.from_batches(self.batches, schema=SCHEMA).unify_dictionaries()
+        self.batches = []
+        return table.replace_schema_metadata(metadata) if metadata else table
+
+
+def from_results(results):
+    """
+    Table from {product or file name: extracted data}, e.g. batch output or an upload batch
+    """
+    builder = TableBuilder()
+    for product, data in results.items():
+        items = data if isinstance(data, list) else [data]
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                builder.add(product, position, item)
+    return builder.table()
+
+
+def from_store(path=None):
+    """
+    Table of every stored indication, streamed from the result store in product order
+    """
+    version = store_version(path)
+    builder = TableBuilder()
+    with closing(ema_results.connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT i.id, p.product, i.position, i.data FROM indications i JOIN products p ON p.id = i.product_id "
+            "ORDER BY p.product, i.position"
+        )
+        for indication_id, product, position, data in rows:
+            builder.add(product, position, json.loads(data), indication_id)
+    return builder.table({"store_version": version})
+
+
+def store_version(path=None):
+    """
+    Identifies the store contents and the terminology the disease_id column was mapped with
+    """
+    index = ema_terms.get_index()
+    return json.dumps([ema_results.version(path), index.digest.hex() if index is not None else None])
+
+
+def write(table, path):
+    """
+    Write an Arrow IPC file (uncompressed, so it can be memory-mapped)
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read(path):
+    """
+    Memory-map an Arrow IPC file; the table's buffers point into the mapping
+    """
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+
+def load_store(path=None, cache_path=COLUMNAR_PATH):
+    """
+    The result store as a table, from the memory-mapped cache file while the store is unchanged
+    """
+    version = store_version(path)
+    if os.path.exists(cache_path):
+        try:
+            table = read(cache_path)
+            if (table.schema.metadata or {}).get(b"store_version") == version.encode() and table.schema.equals(
+                    SCHEMA, check_metadata=False):
+                return table
+        except (OSError, pa.ArrowInvalid):
+            pass
+    write(from_store(path), cache_path)
+    return read(cache_path)
+
+
+def select(table, indication_ids):
+    """
+    Rows whose indication_id is in indication_ids, in table order
+    """
+    return table.filter(pc.is_in(table["indication_id"], value_set=pa.array(indication_ids, pa.int64())))
+
+
+def to_pandas(table, columns=None):
+    """
+    Arrow-backed frame over the table's buffers (ArrowDtype columns, no conversion to Python objects)
+    """
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def to_csv_bytes(table):
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+
+def to_parquet_bytes(table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
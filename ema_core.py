@@ -0,0 +1,1635 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import ema_metrics
+import ema_jsonrepair
+import ema_preflight
+import ema_ratelimit
+import ema_trace
+
+# Headless extraction core: the prompt, the Gemini calls and the extraction pipeline,
+# with no Streamlit side effects. google.genai and pydantic-backed modules are only
+# imported on first use so scripts, workers and the CLI start quickly.
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+DEFAULT_THINKING_BUDGET = 2500
+
+# Follow-up calls allowed when an extraction is cut off at the output limit
+MAX_CONTINUATIONS = 3
+
+# Importing this module in a fresh interpreter must stay under this many seconds
+IMPORT_TIME_BUDGET_SECONDS = 0.3
+
+
+class PipelineCancelled(Exception):
+    """
+    run_pipeline was cancelled through its cancel event
+    """
+
+
+# Define your prompt (replace with your actual prompt)
+cdp_ema_prompt = """
+# Role and Persona
+You are an expert Clinical Data Analyst and Regulatory Affairs Specialist specializing in Pharmacovigilance. Your expertise lies in parsing complex medical texts from the European Medicines Agency (EMA) and extracting highly structured data with zero error. You do not summarize; you extract exactly what is stated.
+
+# Objective
+Your task is to analyze the provided EMA clinical text and convert it into a single valid JSON array. The text contains various "Primary Disease Categories," and within those categories, multiple specific "Indications."
+
+Each extracted field MUST include:
+- value
+- evidence
+- confidence
+
+# Global Confidence Rules (STRICT – DO NOT VIOLATE)
+
+Confidence must be a numeric value between 0.0 and 1.0 ONLY.
+
+Assign confidence as follows:
+
+- 0.90 – 1.00  
+  → Value is explicitly and unambiguously stated in the Indication_text.
+
+- 0.80 – 0.89  
+  → Value is clearly stated but slightly paraphrased.
+
+- 0.60 – 0.69  
+  → Value is inferred from context or multiple statements.
+
+- 0.50 – 0.59  
+  → Text is ambiguous OR model is unsure.
+
+- < 0.50  
+  → Evidence is missing or weak.
+
+SPECIAL CASES (MANDATORY):
+- If evidence = "" AND value is present → confidence MUST be < 0.50
+- If value = null because information is absent → confidence ≤ 0.30
+- If value = null due to ambiguity → confidence between 0.50 – 0.60
+- If value is not mentioned at all but absence is clear → confidence 0.60 – 0.70
+
+Each field must be scored independently.
+
+---
+
+# Extraction Rules (Strict Compliance Required)
+
+## 1. High-Level Logic
+- The input text is divided into sections based on disease types.
+- For each section, capture the Disease_level_full_text.
+- Identify every distinct Indication within each disease section.
+- Create a separate JSON object for EACH indication.
+
+---
+
+## 2. Field-Specific Definitions & Extraction Logic
+
+### **Primary Disease_category**
+- **Source:** The bolded or capitalized header starting the section.
+- FALLBACK APPROACH - "If no explicit header exists, use the disease name found in the indication text as the Primary Category."
+- IF the Indication_text lists multiple distinct tumor types (e.g., "gastric, small intestine, or biliary cancer") that share the same treatment conditions, you MUST create a separate JSON object for each tumor type.
+- Bad Example: {"Disease": "gastric, small intestine, or biliary cancer"}
+- Good Example: [{"Disease": "gastric cancer"}, {"Disease": "small intestine cancer"}, {"Disease": "biliary cancer"}]
+- **Example:** "Melanoma", "Non-small cell lung cancer (NSCLC)".
+- DONOT SPLIT THE PRIMARY DISEASE IF ONLY Treatment modality DIFFERS and everything else is same. 
+
+Output structure:
+
+
+
+---
+
+### **Disease_level_full_text**
+### **Disease_level_full_text**
+- **Source:** The entire text block belonging to that Primary Disease Category.
+- **Rule:** This text will repeat identically for every indication object that belongs to this category.
+-  Evidence = same text.
+-  Confidence = 1.0
+
+---
+
+### **Indication #**
+- **Logic:** An integer counter (1, 2, 3...) representing the specific indication sequence within that Primary Disease Category. Reset to 1 for a new Disease Category.
+- Evidence = implicit sequencing.
+- Confidence = 1.0
+
+---
+
+### **Indication_text**
+- **Source:** The specific sentence(s) defining who and what is being treated.
+- **Constraint:** Stop extracting when the text moves to a new patient population or a different drug combination.
+- Evidence = exact extracted text.
+- Confidence = 1.0
+
+---
+
+### **Treatment line**
+- **Source:** EXTRACT ONLY FROM "Indication_text".
+- **Logic (Evaluate in this specific order):**
+
+  1. **Rule (The "At Least" Range):**
+     - IF text contains "at least one" (or "≥ 1") prior therapy/treatment:
+       - OUTPUT: "Second line and later"
+     - IF text contains "at least two" (or "≥ 2") prior therapies:
+       - OUTPUT: "Third line and later"
+
+  2. **Rule (First Line):**
+     - IF text says "first-line", "previously untreated", "treatment naïve", OR "no prior systemic therapy".
+     - OUTPUT: "First line"
+
+  3. **Rule (Calculated Line - The "+1" Logic):**
+     - IF text says "after [Number] prior therapies" or "after [Number] lines" (e.g., "after 3 lines"):
+     - ACTION: Add 1 to the number found. (e.g., 3 + 1 = 4).
+     - OUTPUT: "[Result] line" (e.g., "Fourth line")
+
+  4. **Rule (Explicit Second/Third Label):**
+     - If text explicitly says "second-line" -> OUTPUT: "Second line".
+     - If text explicitly says "third-line" -> OUTPUT: "Third line".
+
+  5. **Rule (General Second Line / Relapsed / Refractory):**
+     - IF text contains any of the following:
+       - "considered inappropriate (example- metformin is considered inappropriate means the patient fails with that therapy.)
+       - "after prior therapy", "after prior chemotherapy"
+       - "after failure of...", "progressing on or after..."
+       - "relapsed", "refractory"
+       - "previously treated with"
+     - OUTPUT: "Second line"
+
+  6. **Rule (Adjuvant/Neoadjuvant Exception):**
+     - IF text mentions "Adjuvant" or "Neoadjuvant" AND does not specify a line number.
+     - OUTPUT: "_"
+
+  7. **Rule (Default):**
+     - If none of the above match.
+     - OUTPUT: "_"
+
+
+Evidence:
+- Quote the phrase used to derive the line.
+- If none found → evidence = ""
+
+Confidence:
+- Explicit mention → ≥ 0.90
+- Inferred → 0.60 – 0.69
+- Ambiguous → 0.50 – 0.59
+- No evidence but value filled → < 0.50
+- Default "_" → confidence ≤ 0.30
+
+---
+
+### **Treatment modality**
+- **Source:** EXTRACT ONLY FROM "Indication_text".
+- **Logic:** Look for these keywords and combine them with commas if multiple exist:
+  - "Monotherapy" (or implied if used alone).
+  - "Combination" (if the text contains “in combination with”; if used with ipilimumab, chemotherapy, etc.).
+  - If multiple modalities apply, combine them using commas in a single string.
+- **Example:** "Combination, Neoadjuvant"
+- Adjunct detection rules (FOR LEQVIO AND SIMILAR DRUGS):
+  - If the indication text contains any of the following phrases, include “Adjunct”:
+  - “as an adjunct to diet”
+  - “as an adjunct to therapy”
+  - “adjunctive therapy”
+  - “used as an adjunct”
+  - Adjunct refers to add-on supportive use, not treatment sequencing.
+  - Adjunct must be included independently of Monotherapy or Combination when applicable.
+- Neoadjuvant detection rules:
+  - If the indication text contains “neoadjuvant treatment” or “as neoadjuvant”, include “Neoadjuvant”.
+- Adjuvant detection rules:
+  - If the indication text contains “adjuvant treatment” or “as adjuvant”, include “Adjuvant”.
+- Multiple modality combination rules:
+  - If Adjunct + Combination → output “Adjunct, Combination”.
+  - If Adjunct + Monotherapy → output “Adjunct, Monotherapy”.
+  - If Adjunct + Monotherapy + Combination → output “Adjunct, Monotherapy, Combination”.
+  - If Neoadjuvant followed by Adjuvant with different modalities → output: “Neoadjuvant, Adjuvant, Combination, Monotherapy”.
+  IMPORTANT 
+  IF NO TREATMENT MODALITY ARE MENTIONED THEN DONOT ASSUME IT AS MONOTHERAPY. KEEP IT AS "_"
+
+Evidence:
+- Quote exact modality phrase(s).
+- Empty if none.
+
+Confidence:
+- Explicit → ≥ 0.90
+- Inferred → 0.60 – 0.69
+- Empty evidence + value → < 0.50
+- "_" → ≤ 0.30
+
+---
+
+### **Population**
+- **Source:** EXTRACT ONLY FROM "Indication_text".
+- **Logic:** Identify the target demographic.
+- Text-based population rules:
+  - If the text contains infant, neonate, or newborn, output “Infant”.
+  - If the text contains pediatric, paediatric, or children, output “Paediatric”.
+  - If the text contains adolescents, output “Adolescent”.
+  - If the text contains adults or adult patients, output “Adult”.
+  - If the text contains elderly, geriatric, or ≥ 65 years, output “Elderly”.
+- Numeric age-based population rules (mandatory):
+  - Age 0 to 1 years maps to “Infant”.
+  - Age greater than 1 and up to 12 years maps to “Pediatric”.
+  - Age greater than 12 and up to 18 years maps to “Adolescent”.
+  - Age greater than 18 and up to 60 years maps to “Adult”.
+  - Only output Elderly if it is specified in the indication text ( valid for more than 60 years)
+- Range overlap rules:
+  - If an age range spans multiple groups, include all applicable populations.
+  - **Example:** Age 10 to 14 outputs “Pediatric, Adolescent”.
+  - **Example:** Age 58 to 70 outputs “Adult”.
+  - **Example:** ≥12 years outputs “Adolescent, Adult”.
+- Population formatting rules:
+  - Only these exact values are allowed:
+    - Infant
+    - Paediatric
+    - Adolescent
+    - Adult
+    - Elderly
+  - If no text age and no numeric age is present, output “_”.
+  - Never default to Adult.
+  - Never guess the population.
+**Final Formatting:**
+- Join multiple matches with a comma (e.g., "Adult, Adolescent").
+- If no population is mentioned, valid output is null or inferred from context only if highly obvious, otherwise "_".
+
+
+Evidence:
+- Quote age or population phrase.
+- Empty if none.
+
+Confidence:
+- Explicit age/population → ≥ 0.90
+- Numeric inference → 0.70 – 0.85
+- Ambiguous → 0.50 – 0.59
+- "_" → ≤ 0.30
+
+---
+
+### **Disease + sybtypes**
+### **Disease + sybtypes**
+- **Source:** EXTRACT ONLY FROM "Indication_text".
+- **Logic:** Extract the specific condition description, stage, or mutation status mentioned.
+- **Example:** "unresectable or metastatic melanoma" or "tumours have PD-L1 expression >= 1%".
+
+Field: Disease + subtypes (Strict Cleaning Rules)
+Objective: Extract only the specific medical condition or patient state. Critical Rule: This field describes the PATIENT'S BODY, not the DRUG'S ACTION.
+
+Instructions to extract text for Disease+subtypes:
+
+Start by identifying the core disease name (e.g., "Type 2 diabetes mellitus", "Melanoma").
+
+Keep specific disease modifiers found immediately around the disease name:
+
+"insufficiently controlled"
+
+"metastatic", "advanced", "resectable", "unresectable"
+
+Specific genetic mutations (e.g., "PD-L1 positive", "BRAF V600 mutation")
+
+Risk levels (e.g., "at high risk of recurrence")
+
+REMOVE all text related to:
+
+Treatment Context: "as an adjunct to diet and exercise", "in combination with...", "as monotherapy".
+
+Rationale/Reasoning: "when metformin is considered inappropriate", "due to intolerance".
+
+Treatment History (unless part of the patient definition): "after failure of...", "progressing on...". ( Note: Only keep these if they define the patient group, like 'relapsed/refractory'. If it just describes the timing, leave it out.)
+
+Examples for Training:
+
+Text: "treatment of adults with insufficiently controlled type 2 diabetes mellitus as an adjunct to diet and exercise"
+
+Bad Extraction: "insufficiently controlled type 2 diabetes mellitus as an adjunct to diet and exercise"
+
+Good Extraction: "insufficiently controlled type 2 diabetes mellitus"
+
+Text: "treatment of advanced melanoma in adults progressing on platinum-based therapy"
+
+Good Extraction: "advanced melanoma" (Note: "progressing on..." is captured in Treatment Line, not Disease).
+
+Text: "treatment of adults with MSI-H colorectal cancer"
+
+Good Extraction: "MSI-H colorectal cancer"
+
+DONOT EXTRACT TEXT WHICH WE HAVE ALREADY EXTRACT IN POPULATION , TREATMENT MODALITY AND TREATMENT LINE. 
+
+Evidence:
+- Quote exact disease-modifying phrase.
+- Empty if none.
+
+Confidence:
+- Explicit modifiers → ≥ 0.90
+- Partial inference → 0.60 – 0.69
+- Ambiguous → 0.50 – 0.59
+- Null → ≤ 0.30
+
+---
+
+
+# Negative Constraints (To prevent Hallucination)
+1. DO NOT infer information. If the `Indication_text` does not state the Population, do not guess "Adult".
+2. DO NOT include text from the "Disease_level_full_text" into the "Disease + sybtypes" field unless it is explicitly present in the "Indication_text".
+3. DO NOT alter the terminology used in the text (e.g., if it says "unresectable", do not change it to "non-operable").
+
+
+---
+
+# One-Shot Example
+
+**Input Text Segment:**
+4. 4.1 CLINICAL PARTICULARS Therapeutic indications Melanoma OPDIVO as monotherapy or in combination with ipilimumab is indicated for the treatment of advanced (unresectable or metastatic) melanoma in adults and adolescents 12 years of age and older. Relative to nivolumab monotherapy, an increase in progression-free survival (PFS) and overall survival (OS) for the combination of nivolumab with ipilimumab is established only in patients with low tumour PD-L1 expression (see sections 4.4 and 5.1). Adjuvant treatment of melanoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults and adolescents 12 years of age and older with Stage IIB or IIC melanoma, or melanoma with involvement of lymph nodes or metastatic disease who have undergone complete resection (see section 5.1). Non-small cell lung cancer (NSCLC) OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment of metastatic non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation. OPDIVO as monotherapy is indicated for the treatment of locally advanced or metastatic non-small cell lung cancer after prior chemotherapy in adults. 2 Neoadjuvant treatment of NSCLC OPDIVO in combination with platinum-based chemotherapy is indicated for the neoadjuvant treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression â‰¥ 1% (see section 5.1 for selection criteria). Neoadjuvant and adjuvant treatment of NSCLC OPDIVO, in combination with platinum-based chemotherapy as neoadjuvant treatment, followed by OPDIVO as monotherapy as adjuvant treatment, is indicated for the treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression â‰¥ 1% (see section 5.1 for selection criteria). Malignant pleural mesothelioma (MPM) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable malignant pleural mesothelioma. Renal cell carcinoma (RCC) OPDIVO as monotherapy is indicated for the treatment of advanced renal cell carcinoma after prior therapy in adults. OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with intermediate/poor-risk advanced renal cell carcinoma (see section 5.1). OPDIVO in combination with cabozantinib is indicated for the first-line treatment of adult patients with advanced renal cell carcinoma (see section 5.1). Classical Hodgkin lymphoma (cHL) OPDIVO as monotherapy is indicated for the treatment of adult patients with relapsed or refractory classical Hodgkin lymphoma after autologous stem cell transplant (ASCT) and treatment with brentuximab vedotin. Squamous cell cancer of the head and neck (SCCHN) OPDIVO as monotherapy is indicated for the treatment of recurrent or metastatic squamous cell cancer of the head and neck in adults progressing on or after platinum-based therapy (see section 5.1). Urothelial carcinoma OPDIVO in combination with cisplatin and gemcitabine is indicated for the first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma. OPDIVO as monotherapy is indicated for the treatment of locally advanced unresectable or metastatic urothelial carcinoma in adults after failure of prior platinum-containing therapy. Adjuvant treatment of urothelial carcinoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults with muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression â‰¥ 1%, who are at high risk of recurrence after undergoing radical resection of MIUC (see section 5.1). 3 Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC) OPDIVO in combination with ipilimumab is indicated for the treatment of adult patients with mismatch repair deficient or microsatellite instability-high colorectal cancer in the following settings: - - first-line treatment of unresectable or metastatic colorectal cancer; treatment of metastatic colorectal cancer after prior fluoropyrimidine-based combination chemotherapy (see section 5.1). Oesophageal squamous cell carcinoma (OSCC) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression â‰¥ 1%. OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression â‰¥ 1%. OPDIVO as monotherapy is indicated for the treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma after prior fluoropyrimidine- and platinum-based combination chemotherapy. Adjuvant treatment of oesophageal or gastro-oesophageal junction cancer (OC or GEJC) OPDIVO as monotherapy is indicated for the adjuvant treatment of adult patients with oesophageal or gastro-oesophageal junction cancer who have residual pathologic disease following prior neoadjuvant chemoradiotherapy (see section 5.1). Gastric, gastro-oesophageal junction (GEJ) or oesophageal adenocarcinoma OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma whose tumours express PD-L1 with a combined positive score (CPS) â‰¥ 5. Hepatocellular carcinoma (HCC) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable or advanced hepatocellular carcinoma.
+
+
+**Output JSON:**
+
+[
+  {
+    "Primary Disease_category": {
+      "value": "Melanoma",
+      "evidence": "Melanoma",
+      "confidence": 0.95
+    },
+    "Disease_level_full_text": {
+      "value": "Melanoma OPDIVO as monotherapy or in combination with ipilimumab is indicated...",
+      "evidence": "Melanoma OPDIVO as monotherapy or in combination with ipilimumab is indicated...",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy or in combination with ipilimumab is indicated for the treatment of advanced (unresectable or metastatic) melanoma in adults and adolescents 12 years of age and older.",
+      "evidence": "OPDIVO as monotherapy or in combination with ipilimumab is indicated for the treatment of advanced (unresectable or metastatic) melanoma in adults and adolescents 12 years of age and older.",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "_",
+      "evidence": "",
+      "confidence": 0.28
+    },
+    "Treatment modality": {
+      "value": "Monotherapy,Combination",
+      "evidence": "as monotherapy or in combination with ipilimumab",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult, Adolescent",
+      "evidence": "adults and adolescents 12 years of age and older",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "advanced (unresectable or metastatic) melanoma",
+      "evidence": "advanced (unresectable or metastatic) melanoma",
+      "confidence": 0.97
+    }
+  },
+  [
+  {
+    "Primary Disease_category": {
+      "value": "Melanoma",
+      "evidence": "Melanoma",
+      "confidence": 0.95
+    },
+    "Disease_level_full_text": {
+      "value": "Melanoma OPDIVO as monotherapy or in combination with ipilimumab is indicated for the treatment of advanced (unresectable or metastatic) melanoma in adults and adolescents 12 years of age and older. Relative to nivolumab monotherapy, an increase in progression-free survival (PFS) and overall survival (OS) for the combination of nivolumab with ipilimumab is established only in patients with low tumour PD-L1 expression (see sections 4.4 and 5.1). Adjuvant treatment of melanoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults and adolescents 12 years of age and older with Stage IIB or IIC melanoma, or melanoma with involvement of lymph nodes or metastatic disease who have undergone complete resection",
+      "evidence": "Melanoma OPDIVO as monotherapy or in combination with ipilimumab is indicated...",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 2,
+      "evidence": "2nd indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy is indicated for the adjuvant treatment of adults and adolescents 12 years of age and older with Stage IIB or IIC melanoma, or melanoma with involvement of lymph nodes or metastatic disease who have undergone complete resection.",
+      "evidence": "OPDIVO as monotherapy is indicated for the adjuvant treatment of adults and adolescents 12 years of age and older with Stage IIB or IIC melanoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "_",
+      "evidence": "",
+      "confidence": 0.28
+    },
+    "Treatment modality": {
+      "value": "Adjuvant, Monotherapy",
+      "evidence": "adjuvant treatment ... as monotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult, Adolescent",
+      "evidence": "adults and adolescents 12 years of age and older",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "Stage IIB or IIC melanoma, or melanoma with involvement of lymph nodes or metastatic disease",
+      "evidence": "Stage IIB or IIC melanoma, or melanoma with involvement of lymph nodes or metastatic disease",
+      "confidence": 0.95
+    }
+  },
+
+  {
+    "Primary Disease_category": {
+      "value": "Non-small cell lung cancer (NSCLC)",
+      "evidence": "Non-small cell lung cancer (NSCLC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Non-small cell lung cancer (NSCLC) OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment...",
+      "evidence": "Non-small cell lung cancer (NSCLC) OPDIVO in combination...",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment of metastatic non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation.",
+      "evidence": "first-line treatment of metastatic non-small cell lung cancer",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with ipilimumab and 2 cycles of platinum-based chemotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "in adults",
+      "confidence": 0.93
+    },
+    "Disease + sybtypes": {
+      "value": "non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation",
+      "evidence": "metastatic non-small cell lung cancer ... no sensitising EGFR mutation or ALK translocation",
+      "confidence": 0.94
+    }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Non-small cell lung cancer (NSCLC)", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Non-small cell lung cancer (NSCLC) OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment of metastatic non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation. OPDIVO as monotherapy is indicated for the treatment of locally advanced or metastatic non-small cell lung cancer after prior chemotherapy in adults. Neoadjuvant treatment of NSCLC OPDIVO in combination with platinum-based chemotherapy is indicated for the neoadjuvant treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%. Neoadjuvant and adjuvant treatment of NSCLC OPDIVO, in combination with platinum-based chemotherapy as neoadjuvant treatment, followed by OPDIVO as monotherapy as adjuvant treatment, is indicated for the treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%.", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 1.0 },
+    "Indication #": { "value": 2, "evidence": "2nd indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO as monotherapy is indicated for the treatment of locally advanced or metastatic non-small cell lung cancer after prior chemotherapy in adults.", "evidence": "after prior chemotherapy", "confidence": 1.0 },
+    "Treatment line": { "value": "Second line", "evidence": "after prior chemotherapy", "confidence": 0.95 },
+    "Treatment modality": { "value": "Monotherapy", "evidence": "as monotherapy", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "in adults", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "locally advanced or metastatic non-small cell lung cancer", "evidence": "locally advanced or metastatic non-small cell lung cancer", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Non-small cell lung cancer (NSCLC)", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Non-small cell lung cancer (NSCLC) OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment of metastatic non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation. OPDIVO as monotherapy is indicated for the treatment of locally advanced or metastatic non-small cell lung cancer after prior chemotherapy in adults. Neoadjuvant treatment of NSCLC OPDIVO in combination with platinum-based chemotherapy is indicated for the neoadjuvant treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%. Neoadjuvant and adjuvant treatment of NSCLC OPDIVO, in combination with platinum-based chemotherapy as neoadjuvant treatment, followed by OPDIVO as monotherapy as adjuvant treatment, is indicated for the treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%.", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 1.0 },
+    "Indication #": { "value": 3, "evidence": "3rd indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO in combination with platinum-based chemotherapy is indicated for the neoadjuvant treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%.", "evidence": "neoadjuvant treatment of resectable non-small cell lung cancer", "confidence": 1.0 },
+    "Treatment line": { "value": "_", "evidence": "", "confidence": 0.30 },
+    "Treatment modality": { "value": "Combination, Neoadjuvant", "evidence": "in combination with platinum-based chemotherapy ... neoadjuvant treatment", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "resectable non-small cell lung cancer at high risk of recurrence", "evidence": "resectable non-small cell lung cancer at high risk of recurrence", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Non-small cell lung cancer (NSCLC)", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Non-small cell lung cancer (NSCLC) OPDIVO in combination with ipilimumab and 2 cycles of platinum-based chemotherapy is indicated for the first-line treatment of metastatic non-small cell lung cancer in adults whose tumours have no sensitising EGFR mutation or ALK translocation. OPDIVO as monotherapy is indicated for the treatment of locally advanced or metastatic non-small cell lung cancer after prior chemotherapy in adults. Neoadjuvant treatment of NSCLC OPDIVO in combination with platinum-based chemotherapy is indicated for the neoadjuvant treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%. Neoadjuvant and adjuvant treatment of NSCLC OPDIVO, in combination with platinum-based chemotherapy as neoadjuvant treatment, followed by OPDIVO as monotherapy as adjuvant treatment, is indicated for the treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%.", "evidence": "Non-small cell lung cancer (NSCLC)", "confidence": 1.0 },
+    "Indication #": { "value": 4, "evidence": "4th indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO, in combination with platinum-based chemotherapy as neoadjuvant treatment, followed by OPDIVO as monotherapy as adjuvant treatment, is indicated for the treatment of resectable non-small cell lung cancer at high risk of recurrence in adult patients whose tumours have PD-L1 expression ≥ 1%.", "evidence": "neoadjuvant treatment ... followed by ... adjuvant treatment", "confidence": 1.0 },
+    "Treatment line": { "value": "_", "evidence": "", "confidence": 0.30 },
+    "Treatment modality": { "value": "Combination, Neoadjuvant, Adjuvant, Monotherapy", "evidence": "combination ... neoadjuvant ... followed by ... monotherapy as adjuvant", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "resectable non-small cell lung cancer at high risk of recurrence", "evidence": "resectable non-small cell lung cancer at high risk of recurrence", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Malignant pleural mesothelioma (MPM)", "evidence": "Malignant pleural mesothelioma (MPM)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Malignant pleural mesothelioma (MPM) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable malignant pleural mesothelioma.", "evidence": "Malignant pleural mesothelioma (MPM)", "confidence": 1.0 },
+    "Indication #": { "value": 1, "evidence": "1st indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable malignant pleural mesothelioma.", "evidence": "first-line treatment", "confidence": 1.0 },
+    "Treatment line": { "value": "First line", "evidence": "first-line treatment", "confidence": 0.97 },
+    "Treatment modality": { "value": "Combination", "evidence": "in combination with ipilimumab", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "unresectable malignant pleural mesothelioma", "evidence": "unresectable malignant pleural mesothelioma", "confidence": 0.96 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Renal cell carcinoma (RCC)", "evidence": "Renal cell carcinoma (RCC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Renal cell carcinoma (RCC) OPDIVO as monotherapy is indicated for the treatment of advanced renal cell carcinoma after prior therapy in adults. OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with intermediate/poor-risk advanced renal cell carcinoma (see section 5.1). OPDIVO in combination with cabozantinib is indicated for the first-line treatment of adult patients with advanced renal cell carcinoma (see section 5.1).", "evidence": "Renal cell carcinoma (RCC)", "confidence": 1.0 },
+    "Indication #": { "value": 1, "evidence": "1st indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO as monotherapy is indicated for the treatment of advanced renal cell carcinoma after prior therapy in adults", "evidence": "after prior therapy", "confidence": 1.0 },
+    "Treatment line": { "value": "Second line", "evidence": "after prior therapy", "confidence": 0.95 },
+    "Treatment modality": { "value": "Monotherapy", "evidence": "as monotherapy", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "in adults", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "advanced renal cell carcinoma", "evidence": "advanced renal cell carcinoma", "confidence": 0.95 }
+  },
+  {
+    "Primary Disease_category": { "value": "Renal cell carcinoma (RCC)", "evidence": "Renal cell carcinoma (RCC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Renal cell carcinoma (RCC) OPDIVO as monotherapy is indicated for the treatment of advanced renal cell carcinoma after prior therapy in adults. OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with intermediate/poor-risk advanced renal cell carcinoma (see section 5.1). OPDIVO in combination with cabozantinib is indicated for the first-line treatment of adult patients with advanced renal cell carcinoma (see section 5.1).", "evidence": "Renal cell carcinoma (RCC)", "confidence": 1.0 },
+    "Indication #": { "value": 2, "evidence": "2nd indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with intermediate/poor-risk advanced renal cell carcinoma", "evidence": "first-line treatment", "confidence": 1.0 },
+    "Treatment line": { "value": "First line", "evidence": "first-line treatment", "confidence": 0.97 },
+    "Treatment modality": { "value": "Combination", "evidence": "in combination with ipilimumab", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "intermediate/poor-risk advanced renal cell carcinoma", "evidence": "intermediate/poor-risk advanced renal cell carcinoma", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Renal cell carcinoma (RCC)", "evidence": "Renal cell carcinoma (RCC)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Renal cell carcinoma (RCC) OPDIVO as monotherapy is indicated for the treatment of advanced renal cell carcinoma after prior therapy in adults. OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with intermediate/poor-risk advanced renal cell carcinoma (see section 5.1). OPDIVO in combination with cabozantinib is indicated for the first-line treatment of adult patients with advanced renal cell carcinoma (see section 5.1).", "evidence": "Renal cell carcinoma (RCC)", "confidence": 1.0 },
+    "Indication #": { "value": 3, "evidence": "3rd indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO in combination with cabozantinib is indicated for the first-line treatment of adult patients with advanced renal cell carcinoma", "evidence": "first-line treatment", "confidence": 1.0 },
+    "Treatment line": { "value": "First line", "evidence": "first-line treatment", "confidence": 0.97 },
+    "Treatment modality": { "value": "Combination", "evidence": "in combination with cabozantinib", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "advanced renal cell carcinoma", "evidence": "advanced renal cell carcinoma", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Classical Hodgkin lymphoma (cHL)", "evidence": "Classical Hodgkin lymphoma (cHL)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Classical Hodgkin lymphoma (cHL) OPDIVO as monotherapy is indicated for the treatment of adult patients with relapsed or refractory classical Hodgkin lymphoma after autologous stem cell transplant (ASCT) and treatment with brentuximab vedotin.", "evidence": "Classical Hodgkin lymphoma (cHL)", "confidence": 1.0 },
+    "Indication #": { "value": 1, "evidence": "1st indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO as monotherapy is indicated for the treatment of adult patients with relapsed or refractory classical Hodgkin lymphoma after autologous stem cell transplant (ASCT) and treatment with brentuximab vedotin", "evidence": "relapsed or refractory", "confidence": 1.0 },
+    "Treatment line": { "value": "Third line", "evidence": "after autologous stem cell transplant (ASCT) and treatment with brentuximab vedotin", "confidence": 0.95 },
+    "Treatment modality": { "value": "Monotherapy", "evidence": "as monotherapy", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "adult patients", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "relapsed or refractory classical Hodgkin lymphoma", "evidence": "relapsed or refractory classical Hodgkin lymphoma", "confidence": 0.95 }
+  },
+  
+  {
+    "Primary Disease_category": { "value": "Squamous cell cancer of the head and neck (SCCHN)", "evidence": "Squamous cell cancer of the head and neck (SCCHN)", "confidence": 0.96 },
+    "Disease_level_full_text": { "value": "Squamous cell cancer of the head and neck (SCCHN) OPDIVO as monotherapy is indicated for the treatment of recurrent or metastatic squamous cell cancer of the head and neck in adults progressing on or after platinum-based therapy", "evidence": "Squamous cell cancer of the head and neck (SCCHN)", "confidence": 1.0 },
+    "Indication #": { "value": 1, "evidence": "1st indication", "confidence": 1.0 },
+    "Indication_text": { "value": "OPDIVO as monotherapy is indicated for the treatment of recurrent or metastatic squamous cell cancer of the head and neck in adults progressing on or after platinum-based therapy", "evidence": "progressing on or after platinum-based therapy", "confidence": 1.0 },
+    "Treatment line": { "value": "Second line", "evidence": "progressing on or after platinum-based therapy", "confidence": 0.95 },
+    "Treatment modality": { "value": "Monotherapy", "evidence": "as monotherapy", "confidence": 0.96 },
+    "Population": { "value": "Adult", "evidence": "in adults", "confidence": 0.94 },
+    "Disease + sybtypes": { "value": "recurrent or metastatic squamous cell cancer of the head and neck", "evidence": "recurrent or metastatic squamous cell cancer of the head and neck", "confidence": 0.95 }
+  },
+  
+  [
+  {
+    "Primary Disease_category": {
+      "value": "Urothelial carcinoma",
+      "evidence": "Urothelial carcinoma",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Urothelial carcinoma OPDIVO in combination with cisplatin and gemcitabine is indicated for the first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma. OPDIVO as monotherapy is indicated for the treatment of locally advanced unresectable or metastatic urothelial carcinoma in adults after failure of prior platinum-containing therapy. Adjuvant treatment of urothelial carcinoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults with muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%, who are at high risk of recurrence after undergoing radical resection of MIUC (see section 5.1).",
+      "evidence": "Urothelial carcinoma OPDIVO in combination with cisplatin and gemcitabine is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with cisplatin and gemcitabine is indicated for the first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma.",
+      "evidence": "first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with cisplatin and gemcitabine",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable or metastatic urothelial carcinoma",
+      "evidence": "unresectable or metastatic urothelial carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Urothelial carcinoma",
+      "evidence": "Urothelial carcinoma",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Urothelial carcinoma OPDIVO in combination with cisplatin and gemcitabine is indicated for the first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma. OPDIVO as monotherapy is indicated for the treatment of locally advanced unresectable or metastatic urothelial carcinoma in adults after failure of prior platinum-containing therapy. Adjuvant treatment of urothelial carcinoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults with muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%, who are at high risk of recurrence after undergoing radical resection of MIUC (see section 5.1).",
+      "evidence": "Urothelial carcinoma OPDIVO as monotherapy is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 2,
+      "evidence": "2nd indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy is indicated for the treatment of locally advanced unresectable or metastatic urothelial carcinoma in adults after failure of prior platinum-containing therapy",
+      "evidence": "after failure of prior platinum-containing therapy",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "Second line",
+      "evidence": "after failure of prior platinum-containing therapy",
+      "confidence": 0.95
+    },
+    "Treatment modality": {
+      "value": "Monotherapy",
+      "evidence": "as monotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "in adults",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "locally advanced unresectable or metastatic urothelial carcinoma",
+      "evidence": "locally advanced unresectable or metastatic urothelial carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Urothelial carcinoma",
+      "evidence": "Urothelial carcinoma",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Urothelial carcinoma OPDIVO in combination with cisplatin and gemcitabine is indicated for the first-line treatment of adult patients with unresectable or metastatic urothelial carcinoma. OPDIVO as monotherapy is indicated for the treatment of locally advanced unresectable or metastatic urothelial carcinoma in adults after failure of prior platinum-containing therapy. Adjuvant treatment of urothelial carcinoma OPDIVO as monotherapy is indicated for the adjuvant treatment of adults with muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%, who are at high risk of recurrence after undergoing radical resection of MIUC (see section 5.1)",
+      "evidence": "Adjuvant treatment of urothelial carcinoma OPDIVO as monotherapy is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 3,
+      "evidence": "3rd indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy is indicated for the adjuvant treatment of adults with muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%, who are at high risk of recurrence after undergoing radical resection of MIUC",
+      "evidence": "adjuvant treatment of adults with muscle invasive urothelial carcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "Second line",
+      "evidence": "after undergoing radical resection",
+      "confidence": 0.90
+    },
+    "Treatment modality": {
+      "value": "Monotherapy, Adjuvant",
+      "evidence": "as monotherapy ... adjuvant treatment",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adults",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%, who are at high risk of recurrence",
+      "evidence": "muscle invasive urothelial carcinoma (MIUC) with tumour cell PD-L1 expression ≥ 1%",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "evidence": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC) OPDIVO in combination with ipilimumab is indicated for the treatment of adult patients with mismatch repair deficient or microsatellite instability-high colorectal cancer in the following settings: - - first-line treatment of unresectable or metastatic colorectal cancer; treatment of metastatic colorectal cancer after prior fluoropyrimidine-based combination chemotherapy",
+      "evidence": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with ipilimumab is indicated for the treatment of adult patients with mismatch repair deficient or microsatellite instability-high colorectal cancer in the following settings: - - first-line treatment of unresectable or metastatic colorectal cancer",
+      "evidence": "first-line treatment of unresectable or metastatic colorectal cancer",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with ipilimumab",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable or metastatic colorectal cancer",
+      "evidence": "unresectable or metastatic colorectal cancer",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "evidence": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC) OPDIVO in combination with ipilimumab is indicated for the treatment of adult patients with mismatch repair deficient or microsatellite instability-high colorectal cancer in the following settings: - - first-line treatment of unresectable or metastatic colorectal cancer; treatment of metastatic colorectal cancer after prior fluoropyrimidine-based combination chemotherapy",
+      "evidence": "Mismatch repair deficient (dMMR) or microsatellite instability-high (MSI-H) colorectal cancer (CRC)",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 2,
+      "evidence": "2nd indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with ipilimumab is indicated for the treatment of adult patients with mismatch repair deficient or microsatellite instability-high colorectal cancer in the following settings-treatment of metastatic colorectal cancer after prior fluoropyrimidine-based combination chemotherapy",
+      "evidence": "after prior fluoropyrimidine-based combination chemotherapy",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "Second line",
+      "evidence": "after prior fluoropyrimidine-based combination chemotherapy",
+      "confidence": 0.95
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with ipilimumab",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "metastatic colorectal cancer",
+      "evidence": "metastatic colorectal cancer",
+      "confidence": 0.95
+    }
+  },
+  [
+  {
+    "Primary Disease_category": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC)",
+      "evidence": "Oesophageal squamous cell carcinoma (OSCC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO as monotherapy is indicated for the treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma after prior fluoropyrimidine- and platinum-based combination chemotherapy.",
+      "evidence": "Oesophageal squamous cell carcinoma (OSCC) OPDIVO in combination with ipilimumab is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%",
+      "evidence": "first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with ipilimumab",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "evidence": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC)",
+      "evidence": "Oesophageal squamous cell carcinoma (OSCC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO as monotherapy is indicated for the treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma after prior fluoropyrimidine- and platinum-based combination chemotherapy.",
+      "evidence": "OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 2,
+      "evidence": "",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%",
+      "evidence": "first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with fluoropyrimidine- and platinum-based combination chemotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "evidence": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC)",
+      "evidence": "Oesophageal squamous cell carcinoma (OSCC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Oesophageal squamous cell carcinoma (OSCC) OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma with tumour cell PD-L1 expression ≥ 1%. OPDIVO as monotherapy is indicated for the treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma after prior fluoropyrimidine- and platinum-based combination chemotherapy.",
+      "evidence": "OPDIVO as monotherapy is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 3,
+      "evidence": "",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy is indicated for the treatment of adult patients with unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma after prior fluoropyrimidine- and platinum-based combination chemotherapy",
+      "evidence": "after prior fluoropyrimidine- and platinum-based combination chemotherapy",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "Second line",
+      "evidence": "after prior fluoropyrimidine- and platinum-based combination chemotherapy",
+      "confidence": 0.95
+    },
+    "Treatment modality": {
+      "value": "Monotherapy",
+      "evidence": "as monotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "evidence": "unresectable advanced, recurrent or metastatic oesophageal squamous cell carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Oesophageal or gastro-oesophageal junction cancer (OC or GEJC)",
+      "evidence": "Oesophageal or gastro-oesophageal junction cancer (OC or GEJC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Adjuvant treatment of oesophageal or gastro-oesophageal junction cancer (OC or GEJC) OPDIVO as monotherapy is indicated for the adjuvant treatment of adult patients with oesophageal or gastro-oesophageal junction cancer who have residual pathologic disease following prior neoadjuvant chemoradiotherapy",
+      "evidence": "Adjuvant treatment of oesophageal or gastro-oesophageal junction cancer",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO as monotherapy is indicated for the adjuvant treatment of adult patients with oesophageal or gastro-oesophageal junction cancer who have residual pathologic disease following prior neoadjuvant chemoradiotherapy",
+      "evidence": "adjuvant treatment of adult patients with oesophageal or gastro-oesophageal junction cancer",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "Second line",
+      "evidence": "following prior neoadjuvant chemoradiotherapy",
+      "confidence": 0.90
+    },
+    "Treatment modality": {
+      "value": "Monotherapy, Adjuvant",
+      "evidence": "as monotherapy ... adjuvant treatment",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "oesophageal or gastro-oesophageal junction cancer who have residual pathologic disease",
+      "evidence": "residual pathologic disease",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Gastric, gastro-oesophageal junction (GEJ) or oesophageal adenocarcinoma",
+      "evidence": "Gastric, gastro-oesophageal junction (GEJ) or oesophageal adenocarcinoma",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Gastric, gastro-oesophageal junction (GEJ) or oesophageal adenocarcinoma OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma whose tumours express PD-L1 with a combined positive score (CPS) ≥ 5",
+      "evidence": "OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with fluoropyrimidine- and platinum-based combination chemotherapy is indicated for the first-line treatment of adult patients with HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma whose tumours express PD-L1 with a combined positive score (CPS) ≥ 5",
+      "evidence": "first-line treatment of adult patients with HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with fluoropyrimidine- and platinum-based combination chemotherapy",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma",
+      "evidence": "HER2-negative advanced or metastatic gastric, gastro-oesophageal junction or oesophageal adenocarcinoma",
+      "confidence": 0.95
+    }
+  },
+  
+  [
+  {
+    "Primary Disease_category": {
+      "value": "Hepatocellular carcinoma (HCC)",
+      "evidence": "Hepatocellular carcinoma (HCC)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable or advanced hepatocellular carcinoma",
+      "evidence": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "OPDIVO in combination with ipilimumab is indicated for the first-line treatment of adult patients with unresectable or advanced hepatocellular carcinoma",
+      "evidence": "first-line treatment of adult patients with unresectable or advanced hepatocellular carcinoma",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "First line",
+      "evidence": "first-line treatment",
+      "confidence": 0.97
+    },
+    "Treatment modality": {
+      "value": "Combination",
+      "evidence": "in combination with ipilimumab",
+      "confidence": 0.96
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "adult patients",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "unresectable or advanced hepatocellular carcinoma",
+      "evidence": "unresectable or advanced hepatocellular carcinoma",
+      "confidence": 0.95
+    }
+  },
+  {
+    "Primary Disease_category": {
+      "value": "Neovascular (wet) age-related macular degeneration (AMD)",
+      "evidence": "Neovascular (wet) age-related macular degeneration (AMD)",
+      "confidence": 0.96
+    },
+    "Disease_level_full_text": {
+      "value": "Lucentis is indicated in adults for: The treatment of neovascular (wet) age-related macular degeneration (AMD)",
+      "evidence": "Lucentis is indicated in adults",
+      "confidence": 1.0
+    },
+    "Indication #": {
+      "value": 1,
+      "evidence": "1st indication",
+      "confidence": 1.0
+    },
+    "Indication_text": {
+      "value": "Lucentis is indicated in adults for: The treatment of neovascular (wet) age-related macular degeneration (AMD)",
+      "evidence": "The treatment of neovascular (wet) age-related macular degeneration (AMD)",
+      "confidence": 1.0
+    },
+    "Treatment line": {
+      "value": "_",
+      "evidence": "Not mentioned in text",
+      "confidence": 0.30
+    },
+    "Treatment modality": {
+      "value": "_",
+      "evidence": "Not mentioned in text",
+      "confidence": 0.30
+    },
+    "Population": {
+      "value": "Adult",
+      "evidence": "in adults",
+      "confidence": 0.94
+    },
+    "Disease + sybtypes": {
+      "value": "neovascular (wet) age-related macular degeneration (AMD)",
+      "evidence": "neovascular (wet) age-related macular degeneration (AMD)",
+      "confidence": 0.96
+    }
+  }
+]
+
+"""  # Replace with your actual prompt
+
+
+# Appended to the prompt when a response was cut off; {done} lists the indications already kept
+CONTINUATION_PROMPT = """
+
+# Continuation
+Your previous answer was cut off at the output limit. These indications are already extracted
+(Primary Disease_category #Indication #: Indication_text):
+{done}
+
+Extract ONLY the indications that come after these in the text, with the same fields and rules,
+and return them as a JSON array. Do not repeat any indication listed above. Return [] if none remain.
+"""
+
+
+# Function to create the Gemini client
+@lru_cache(maxsize=4)
+def _cached_client(project, location, credentials_path):
+    from google import genai
+
+    return genai.Client(
+        vertexai=True,
+        project=project,
+        location=location
+    )
+
+
+@ema_trace.traced("core.get_gemini_client")
+def get_gemini_client():
+    """
+    Return a Vertex AI Gemini client, reused while project, region and credentials are unchanged
+    """
+    PROJECT_ID = "ybrant-gemini-vertexai"  # Replace with your project ID
+    LOCATION = os.environ.get("GOOGLE_CLOUD_REGION", "us-central1")
+    
+    return _cached_client(PROJECT_ID, LOCATION, os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"))
+
+
+# Function to count prompt tokens with the API
+def count_gemini_tokens(contents, model_name=DEFAULT_MODEL):
+    """
+    Count the input tokens of the contents with the model's tokenizer
+    """
+    client = get_gemini_client()
+    return client.models.count_tokens(model=model_name, contents=contents).total_tokens
+
+
+@lru_cache(maxsize=32)
+def prompt_version(prompt):
+    """
+    Short hash of a prompt, recorded with each call so a prompt change shows up as a new series
+    """
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+
+
+# Function to call Gemini API
+@ema_trace.traced("core.call_gemini_api")
+def call_gemini_api(text_data, prompt, thinking_budget=DEFAULT_THINKING_BUDGET, user="anonymous", model_name=DEFAULT_MODEL,
+                    on_usage=None, on_finish=None):
+    """
+    Call the Gemini API with the provided text and prompt. on_usage(input_tokens,
+    output_tokens, thinking_tokens) is called with the token counts of the response and
+    on_finish(reason) with its finish reason ("STOP", "MAX_TOKENS", ...).
+    """
+    from google.genai import types
+
+    client = get_gemini_client()
+    
+    contents = [text_data, prompt]
+    
+    generate_config = types.GenerateContentConfig(
+        temperature=0,
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=thinking_budget
+        )
+    )
+    
+    # Wait for a slot under the shared rate limit
+    with ema_trace.span("core.rate_limit_wait"):
+        ema_ratelimit.shared.acquire()
+    
+    start = time.perf_counter()
+    try:
+        with ema_trace.span("core.generate_content", model=model_name, thinking_budget=thinking_budget) as call_span:
+            response = client.models.generate_content(
+                model=model_name,
+                contents=contents,
+                config=generate_config
+            )
+    except Exception as e:
+        ema_metrics.record(
+            "call",
+            model=model_name,
+            thinking_budget=thinking_budget,
+            latency=time.perf_counter() - start,
+            status="error",
+            error_code=getattr(e, "code", None),
+            rate_limited=ema_ratelimit.is_rate_limit_error(e),
+            prompt_version=prompt_version(prompt)
+        )
+        if ema_ratelimit.is_rate_limit_error(e):
+            ema_ratelimit.shared.penalize()
+            raise ema_ratelimit.RateLimitError(str(e)) from e
+        raise
+    ema_ratelimit.shared.reward()
+    
+    # Record the tokens spent against the user's daily budget
+    usage = getattr(response, "usage_metadata", None)
+    candidates = getattr(response, "candidates", None) or []
+    finish_reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    finish_reason = getattr(finish_reason, "name", finish_reason)
+    call_span.set(
+        input_tokens=getattr(usage, "prompt_token_count", None),
+        output_tokens=getattr(usage, "candidates_token_count", None)
+    )
+    ema_preflight.record_usage(user, getattr(usage, "total_token_count", None) or 0)
+    ema_metrics.record(
+        "call",
+        model=model_name,
+        thinking_budget=thinking_budget,
+        latency=time.perf_counter() - start,
+        status="ok",
+        input_tokens=getattr(usage, "prompt_token_count", None),
+        output_tokens=getattr(usage, "candidates_token_count", None),
+        thinking_tokens=getattr(usage, "thoughts_token_count", None),
+        cached_tokens=getattr(usage, "cached_content_token_count", None),
+        prompt_version=prompt_version(prompt),
+        finish_reason=finish_reason
+    )
+    if on_usage is not None:
+        on_usage(
+            getattr(usage, "prompt_token_count", None) or 0,
+            getattr(usage, "candidates_token_count", None) or 0,
+            getattr(usage, "thoughts_token_count", None) or 0
+        )
+    if on_finish is not None:
+        on_finish(finish_reason)
+    
+    return response.text
+
+
+def _indication_key(item):
+    import ema_incremental
+
+    return tuple(
+        str(ema_incremental.field_value(item, key, "") or "").strip().lower()
+        for key in ("Primary Disease_category", "Indication_text")
+    )
+
+
+def _generate_json(text, prompt, on_parse_errors=None, **call_options):
+    """
+    One model call parsed with the tolerant parser; returns (data, truncated, raw response). Objects
+    that had to be dropped are passed to on_parse_errors(errors). A response with nothing
+    usable raises JSONDecodeError with the raw response attached.
+    """
+    finish = {}
+    raw_response = call_gemini_api(text, prompt, on_finish=lambda reason: finish.update(reason=reason), **call_options)
+    with ema_trace.span("core.parse_response", chars=len(raw_response)) as parse_span:
+        parsed = ema_jsonrepair.recover(raw_response)
+        parse_span.set(repairs=sum(parsed["repairs"].values()), dropped=len(parsed["errors"]))
+    data = parsed["data"]
+    truncated = parsed["truncated"] or finish.get("reason") == "MAX_TOKENS"
+    if parsed["repairs"] or parsed["errors"]:
+        ema_metrics.record("parse_recovery", repairs=parsed["repairs"], dropped=len(parsed["errors"]),
+                           truncated=truncated)
+    if data is None or (truncated and not isinstance(data, list)):
+        error = parsed["errors"][0] if parsed["errors"] else {"message": "response was cut off", "position": 0}
+        exception = json.JSONDecodeError(error["message"], raw_response, error["position"])
+        exception.raw_response = raw_response
+        raise exception
+    if parsed["errors"] and on_parse_errors is not None:
+        on_parse_errors(parsed["errors"])
+    return data, truncated, raw_response
+
+
+def extract(text, prompt=None, model_name=DEFAULT_MODEL, thinking_budget=DEFAULT_THINKING_BUDGET, user="anonymous",
+            on_usage=None, on_continuation=None, on_parse_errors=None):
+    """
+    Call the model and parse its JSON answer with ema_jsonrepair, which fixes common
+    formatting faults and drops (reporting to on_parse_errors) objects it cannot parse.
+    When nothing usable comes back, the raw response is attached to the JSONDecodeError
+    as raw_response.
+
+    When an array answer is cut off at the output limit, its complete indications are
+    kept and up to MAX_CONTINUATIONS follow-up calls ask for the remaining ones only.
+    on_continuation(number, indications_so_far) is called before each of them.
+    """
+    call_options = dict(thinking_budget=thinking_budget, user=user, model_name=model_name, on_usage=on_usage,
+                        on_parse_errors=on_parse_errors)
+    prompt = prompt or cdp_ema_prompt
+    data, truncated, raw_response = _generate_json(text, prompt, **call_options)
+    if not truncated:
+        return data
+
+    import ema_incremental
+
+    items = data
+    seen = {_indication_key(item) for item in items}
+    for number in range(1, MAX_CONTINUATIONS + 1):
+        if not items:
+            break
+        if on_continuation is not None:
+            on_continuation(number, len(items))
+        done = "\n".join(
+            "- {} #{}: {}".format(*(
+                ema_incremental.field_value(item, key, "?")
+                for key in ("Primary Disease_category", "Indication #", "Indication_text")
+            ))
+            for item in items
+        )
+        with ema_trace.span("core.continuation", number=number, kept=len(items)):
+            more, truncated, raw_response = _generate_json(
+                text, prompt + CONTINUATION_PROMPT.format(done=done), **call_options
+            )
+        new_items = [
+            item for item in (more if isinstance(more, list) else [])
+            if isinstance(item, dict) and _indication_key(item) not in seen
+        ]
+        ema_metrics.record("continuation", model=model_name, number=number, kept=len(items), added=len(new_items),
+                           truncated=truncated)
+        seen.update(_indication_key(item) for item in new_items)
+        items.extend(new_items)
+        if not truncated:
+            return ema_incremental.renumber_indications(items)
+        if not new_items:
+            break
+
+    error = json.JSONDecodeError("Response was cut off at the output limit and could not be continued",
+                                 raw_response, len(raw_response))
+    error.raw_response = raw_response
+    raise error
+
+
+def ask(text, prompt, model_name=DEFAULT_MODEL, user="anonymous", on_usage=None):
+    """
+    Small follow-up call (repairs, segmentation, enrichment) with thinking disabled
+    """
+    return extract(text, prompt, model_name=model_name, thinking_budget=0, user=user, on_usage=on_usage)
+
+
+@ema_trace.traced("pipeline.run")
+def run_pipeline(
+    text,
+    product="",
+    normalize=True,
+    incremental=True,
+    dedup=True,
+    max_distance=None,
+    routing=True,
+    two_stage=False,
+    repair=True,
+    split_parts=1,
+    user="anonymous",
+    persist=True,
+    source=None,
+    on_event=None,
+    cancel=None,
+    on_usage=None,
+    extractor=None
+):
+    """
+    Run the full extraction pipeline on one section 4.1 text.
+
+    Returns a dict with the parsed "data", the evidence "grounding" (spans in the original
+    text), remaining rule "violations", the "input_text" actually sent and the progress
+    "events". on_event(kind, message) is called for each event as it happens, with kind
+    "info" or "caption". The token "usage" of all model calls is totalled in the result,
+    and on_usage(input_tokens, output_tokens, thinking_tokens) is called after each one.
+    With persist, the result is stored through persist_result (dedup index, revision and
+    result store, under the product name or the detected one, and source); without it
+    nothing is stored. With user=None the model calls are not charged to any budget. When the threading.Event
+    cancel is set, the pipeline raises PipelineCancelled before its next model call and
+    stores nothing. extractor(text, on_usage=...) replaces the extraction call itself, e.g.
+    ema_packing.PackingExtractor.extract; routing and two-stage are not used with it.
+    """
+    import ema_dedup
+    import ema_grounding
+    import ema_incremental
+    import ema_normalize
+    import ema_routing
+    import ema_two_stage
+    import ema_validate
+
+    events = []
+
+    def emit(kind, message):
+        events.append((kind, message))
+        if on_event is not None:
+            on_event(kind, message)
+
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "thinking_tokens": 0}
+    usage_lock = threading.Lock()
+
+    def add_usage(input_tokens, output_tokens, thinking_tokens):
+        # Two-stage enrichment calls finish on several threads at once
+        with usage_lock:
+            usage["calls"] += 1
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+            usage["thinking_tokens"] += thinking_tokens
+        if on_usage is not None:
+            on_usage(input_tokens, output_tokens, thinking_tokens)
+
+    def check_cancel():
+        if cancel is not None and cancel.is_set():
+            raise PipelineCancelled()
+
+    started = time.perf_counter()
+    reuse = "none"
+    large_model = ema_routing.MODEL_TIERS[-1]
+
+    def ask_with_model(part, prompt, model_name):
+        check_cancel()
+        return ask(part, prompt, model_name=model_name, user=user, on_usage=add_usage)
+
+    def continue_extraction(number, kept):
+        check_cancel()
+        emit("caption", f"✂️ Output was cut off after {kept} indication(s); requesting the rest (continuation {number})")
+
+    def extract_with_model(part, model_name):
+        check_cancel()
+        dropped = []
+        data = extract(part, model_name=model_name, user=user, on_usage=add_usage, on_continuation=continue_extraction,
+                       on_parse_errors=dropped.extend)
+        if dropped:
+            if model_name != large_model:
+                # Counts as a parse failure, so the routing cascade escalates instead of losing indications
+                raise ValueError(f"{len(dropped)} malformed object(s) in the response")
+            emit("caption", f"🩹 Dropped {len(dropped)} malformed object(s) from the model response: " + "; ".join(
+                f"line {error['line']}, column {error['column']}: {error['message']}" for error in dropped[:3]
+            ))
+        return data
+
+    def extract_section(part):
+        with ema_trace.span("pipeline.extract_section", chars=len(part), two_stage=two_stage, routing=routing):
+            return extract_section_untraced(part)
+
+    def extract_section_untraced(part):
+        if extractor is not None:
+            check_cancel()
+            return extractor(part, on_usage=add_usage)
+        if two_stage:
+            from google.genai import errors as genai_errors
+
+            return ema_two_stage.two_stage_extract(
+                part,
+                cdp_ema_prompt,
+                lambda t, p: ask_with_model(t, p, large_model),
+                lambda t, p: ask_with_model(t, p, large_model),
+                errors=(ValueError, genai_errors.APIError),
+                on_failure=lambda index, e: emit(
+                    "caption", f"⚠️ Enrichment of indication {index + 1} failed ({type(e).__name__}: {e}); "
+                               "its fields are left empty for repair"
+                )
+            )
+        if not routing:
+            return extract_with_model(part, large_model)
+        data, route = ema_routing.cascade_extract(part, extract_with_model, ask_with_model)
+        emit("caption", "🧭 Model route: " + " → ".join(
+            f"{tier['model']} ({tier['outcome']})" for tier in route["tiers"]
+        ))
+        return data
+
+    # Clean up the pasted text; offsets map it back to the original for grounding
+    input_text, input_offsets = text, None
+    if normalize:
+        with ema_trace.span("pipeline.normalize"):
+            normalized = ema_normalize.normalize(text)
+        input_text, input_offsets = normalized["text"], normalized["offsets"]
+        if normalized["chars_saved"] > 0:
+            emit("caption", (
+                f"🧹 Normalized input: {normalized['chars_saved']:,} characters removed "
+                f"(~{normalized['tokens_saved']:,} tokens saved)"
+            ))
+
+    product = (product or "").strip()
+    is_new_extraction = False
+    with ema_trace.span("pipeline.load_revision"):
+        previous = ema_incremental.load_revision(product) if product else None
+
+    if incremental and previous is not None:
+        result = ema_incremental.incremental_extract(input_text, previous["data"], extract_section)
+        data = result["data"]
+        reuse = "incremental" if result["reused_sections"] else "none"
+        emit("info", (
+            f"♻️ Reused {result['reused_sections']} unchanged section(s), "
+            f"re-extracted {result['reextracted_sections']} "
+            f"({result['chars_sent']:,} of {result['chars_total']:,} characters sent)"
+        ))
+    else:
+        dedup_product = product or ema_dedup.detect_product_name(input_text)
+        duplicate, distance = (None, None)
+        if dedup:
+            with ema_trace.span("pipeline.dedup_lookup"):
+                duplicate, distance = ema_dedup.find_near_duplicate(
+                    input_text,
+                    dedup_product,
+                    ema_dedup.DEFAULT_MAX_DISTANCE if max_distance is None else max_distance
+                )
+
+        if duplicate is not None:
+            data = ema_dedup.reuse(duplicate, dedup_product)
+            reuse = "dedup"
+            emit("info", (
+                f"♻️ Reused the extraction of near-identical text for "
+                f"{duplicate.get('product') or 'an earlier product'} (distance {distance:.3f})"
+            ))
+        else:
+            parts = ema_preflight.split_text(input_text, split_parts)
+            if len(parts) == 1:
+                data = extract_section(input_text)
+            else:
+                # Inputs too large for one response are extracted in parts
+                data = []
+                for part in parts:
+                    result = extract_section(part)
+                    data.extend(result if isinstance(result, list) else [result])
+                data = ema_incremental.renumber_indications(data)
+            is_new_extraction = True
+
+    # Check the output against the prompt's own rules and the input text
+    with ema_trace.span("pipeline.validate"):
+        violations = ema_validate.validate_extraction(data)
+    with ema_trace.span("pipeline.grounding"):
+        grounding = ema_grounding.ground_extraction(input_text, data, input_offsets)
+        violations += ema_grounding.grounding_violations(grounding)
+    if violations and repair:
+        repaired_count = len(violations)
+        with ema_trace.span("pipeline.repair", violations=repaired_count):
+            try:
+                data, violations = ema_validate.repair_extraction(
+                    data, violations, lambda t, p: ask_with_model(t, p, large_model)
+                )
+            except PipelineCancelled:
+                raise
+            except Exception as e:
+                # The extraction itself is fine; keep it and leave its violations open
+                emit("info", f"⚠️ Repair call failed ({type(e).__name__}: {e}); keeping the unrepaired extraction")
+                violations = ema_validate.validate_extraction(data)
+            else:
+                grounding = ema_grounding.ground_extraction(input_text, data, input_offsets)
+            violations += ema_grounding.grounding_violations(grounding)
+        emit("info", f"🔧 Repaired {repaired_count - len(violations)} of {repaired_count} rule violation(s)")
+
+    check_cancel()
+    result = {
+        "data": data,
+        "grounding": grounding,
+        "violations": violations,
+        "input_text": input_text,
+        "events": events,
+        "usage": usage,
+        "new_extraction": is_new_extraction
+    }
+    if persist:
+        persist_result(result, product, source)
+
+    # reuse is "dedup" or "incremental" when stored work replaced (some) model calls
+    ema_metrics.record(
+        "pipeline",
+        latency=time.perf_counter() - started,
+        reuse=reuse,
+        two_stage=two_stage,
+        routing=routing,
+        violations=len(violations),
+        **usage
+    )
+    return result
+
+
+@ema_trace.traced("pipeline.persist")
+def persist_result(result, product="", source=None):
+    """
+    Store a run_pipeline result: new extractions go into the dedup index, a named product
+    gets a revision for incremental runs, and the result store gets the data
+    """
+    import ema_dedup
+    import ema_incremental
+    import ema_results
+
+    input_text, data = result["input_text"], result["data"]
+    product = (product or "").strip()
+    if result["new_extraction"]:
+        ema_dedup.add(input_text, data, product or ema_dedup.detect_product_name(input_text))
+    if product:
+        ema_incremental.save_revision(product, input_text, data)
+    ema_results.save(product or ema_dedup.detect_product_name(input_text), data, source=source)
+
+
+def check_import_time():
+    """
+    Import this module in a fresh interpreter and return the seconds it took
+    """
+    import subprocess
+
+    code = "import time; t = time.perf_counter(); import ema_core; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(output.stdout.strip())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract EMA indications from a section 4.1 text file")
+    parser.add_argument("input", nargs="?", help="text file to extract, or - for stdin")
+    parser.add_argument("--product", default="", help="product name used for revision tracking")
+    parser.add_argument("--output", help="write the JSON array here instead of stdout")
+    parser.add_argument("--check-import-time", action="store_true", help="verify the import-time budget")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace (open in Perfetto) to PATH")
+    args = parser.parse_args(argv)
+    if args.trace:
+        ema_trace.enable(args.trace)
+
+    if args.check_import_time:
+        seconds = check_import_time()
+        print(f"import ema_core: {seconds * 1000:.0f} ms (budget {IMPORT_TIME_BUDGET_SECONDS * 1000:.0f} ms)")
+        return 0 if seconds <= IMPORT_TIME_BUDGET_SECONDS else 1
+
+    if not args.input:
+        parser.error("an input file is required")
+    if args.input == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    result = run_pipeline(
+        text,
+        product=args.product,
+        on_event=lambda kind, message: print(message, file=sys.stderr)
+    )
+    output = json.dumps(result["data"], indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
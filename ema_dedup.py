@@ -0,0 +1,196 @@
+import copy
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+# Near-duplicate index over previously extracted inputs (generics, biosimilars,
+# duplicate marketing authorisations). Texts are compared on word shingles with the
+# product name masked out, using MinHash signatures bucketed by LSH bands.
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+INDEX_PATH = os.path.join(STORE_DIR, "near_duplicates.jsonl")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+# Jaccard distance above which a full extraction is made instead of reusing a result
+DEFAULT_MAX_DISTANCE = 0.05
+
+PRODUCT_PLACEHOLDER = "<product>"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"[a-z0-9<>]+(?:[-'][a-z0-9]+)*")
+_PRODUCT_RE = re.compile(r"\b([A-Z][A-Za-z0-9-]{2,})\b(?=[^.]{0,80}?\bis indicated\b)")
+
+# Fixed permutation parameters so signatures stay comparable across runs
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME
+    )
+    for i in range(NUM_PERM)
+]
+
+_index_cache = {"mtime": None, "entries": [], "buckets": {}}
+
+
+def detect_product_name(text):
+    """
+    Guess the product name as the capitalised word most often followed by "is indicated"
+    """
+    counts = Counter(m.group(1) for m in _PRODUCT_RE.finditer(text or ""))
+    for word, _ in counts.most_common():
+        if word.lower() not in ("the", "this", "it", "treatment", "adjuvant", "neoadjuvant"):
+            return word
+    return None
+
+
+def mask_product(text, product):
+    """
+    Lower-case the text and replace the product name with a placeholder
+    """
+    text = (text or "").lower()
+    if product:
+        text = re.sub(r"\b" + re.escape(product.lower()) + r"\b", PRODUCT_PLACEHOLDER, text)
+    return text
+
+
+def shingles(text, product=None):
+    """
+    Return the set of hashed word shingles of the product-masked text
+    """
+    words = _WORD_RE.findall(mask_product(text, product))
+    if len(words) < SHINGLE_SIZE:
+        words = words + [""] * (SHINGLE_SIZE - len(words))
+    result = set()
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")
+        result.add(int.from_bytes(hashlib.blake2b(shingle, digest_size=4).digest(), "big"))
+    return result
+
+
+def minhash(shingle_set):
+    """
+    Compute the MinHash signature of a shingle set
+    """
+    signature = []
+    for a, b in _PERMUTATIONS:
+        signature.append(min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingle_set))
+    return signature
+
+
+def _band_keys(signature):
+    return [f"{band}:" + ",".join(map(str, signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def jaccard_distance(a, b):
+    if not a and not b:
+        return 0.0
+    return 1.0 - len(a & b) / len(a | b)
+
+
+def _load_index():
+    """
+    Load the index file, re-reading it only when it has changed on disk
+    """
+    if not os.path.exists(INDEX_PATH):
+        return _index_cache
+    mtime = os.path.getmtime(INDEX_PATH)
+    if _index_cache["mtime"] == mtime:
+        return _index_cache
+
+    entries = []
+    buckets = {}
+    with open(INDEX_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line is skipped
+                continue
+            entry["shingles"] = set(entry["shingles"])
+            for key in _band_keys(entry["signature"]):
+                buckets.setdefault(key, []).append(len(entries))
+            entries.append(entry)
+
+    _index_cache.update(mtime=mtime, entries=entries, buckets=buckets)
+    return _index_cache
+
+
+def add(text, data, product=None):
+    """
+    Add an extracted input and its result to the index
+    """
+    product = product or detect_product_name(text)
+    shingle_set = shingles(text, product)
+    entry = {
+        "product": product,
+        "signature": minhash(shingle_set),
+        "shingles": sorted(shingle_set),
+        "data": data
+    }
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(INDEX_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def find_near_duplicate(text, product=None, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Return (entry, distance) for the closest indexed input within max_distance. When no
+    input is close enough, entry is None and distance is that of the closest candidate
+    found, or None when there was no candidate at all.
+    """
+    index = _load_index()
+    if not index["entries"]:
+        return None, None
+
+    product = product or detect_product_name(text)
+    shingle_set = shingles(text, product)
+    candidates = set()
+    for key in _band_keys(minhash(shingle_set)):
+        candidates.update(index["buckets"].get(key, []))
+
+    best, best_distance = None, None
+    for position in candidates:
+        entry = index["entries"][position]
+        distance = jaccard_distance(shingle_set, entry["shingles"])
+        if best_distance is None or distance < best_distance:
+            best, best_distance = entry, distance
+
+    if best is None or best_distance > max_distance:
+        return None, best_distance
+    return best, best_distance
+
+
+def _substitute(value, old, new):
+    if isinstance(value, str):
+        def repl(match):
+            found = match.group(0)
+            if found.isupper():
+                return new.upper()
+            if found.islower():
+                return new.lower()
+            return new
+        return re.sub(r"\b" + re.escape(old) + r"\b", repl, value, flags=re.IGNORECASE)
+    if isinstance(value, list):
+        return [_substitute(v, old, new) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, old, new) for k, v in value.items()}
+    return value
+
+
+def reuse(entry, product=None):
+    """
+    Return a copy of a stored result with the stored product name replaced by the new one
+    """
+    data = copy.deepcopy(entry["data"])
+    if entry.get("product") and product and entry["product"].lower() != product.lower():
+        data = _substitute(data, entry["product"], product)
+    return data
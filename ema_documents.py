@@ -0,0 +1,95 @@
+import os
+import re
+
+# Reading SmPC documents (PDF, DOCX, TXT) and cutting out section 4.1.
+# The parsers are imported on first use so callers that only handle text stay light.
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+# "4.1 Therapeutic indications" up to "4.2 Posology and method of administration"
+_SECTION_START_RE = re.compile(r"4\.1\.?\s+Therapeutic\s+indications", re.IGNORECASE)
+_SECTION_END_RE = re.compile(r"4\.2\.?\s+Posology", re.IGNORECASE)
+
+
+def is_supported(path):
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def read_pdf(path):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def read_pdf_pages(path, start, stop):
+    """
+    Return (text of pages start..stop-1, total page count) of a PDF
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    pages = reader.pages[start:stop]
+    return "\n".join(page.extract_text() or "" for page in pages), len(reader.pages)
+
+
+def read_docx(path):
+    import docx
+
+    document = docx.Document(path)
+    return "\n".join(paragraph.text for paragraph in document.paragraphs)
+
+
+def read_txt(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp1252", errors="replace")
+
+
+def read_document(path):
+    """
+    Return the plain text of a PDF, DOCX or TXT file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return read_pdf(path)
+    if extension == ".docx":
+        return read_docx(path)
+    if extension == ".txt":
+        return read_txt(path)
+    raise ValueError(f"Unsupported document type: {extension}")
+
+
+def find_section_41(text, require_end=False):
+    """
+    Return section 4.1 of a full SmPC, or None if there is none. With require_end,
+    a section not yet followed by the 4.2 heading (a partly read document) is not returned.
+    """
+    # The first match is usually the table of contents when it is followed by 4.2 right away
+    for start in _SECTION_START_RE.finditer(text):
+        end = _SECTION_END_RE.search(text, start.end())
+        if end is None and require_end:
+            return None
+        section = text[start.start():end.start() if end else len(text)].strip()
+        if len(section.split()) > 12:
+            return section
+    return None
+
+
+def extract_section_41(text):
+    """
+    Cut section 4.1 out of a full SmPC. Text without a 4.1 heading (e.g. an already
+    pasted indications section) is returned unchanged.
+    """
+    section = find_section_41(text)
+    return section if section is not None else text.strip()
+
+
+def read_section_41(path):
+    """
+    Read a document and return its section 4.1 text
+    """
+    return extract_section_41(read_document(path))
@@ -0,0 +1,159 @@
+import html
+import re
+
+from ema_normalize import to_original_span
+
+# Fields whose evidence is not a quote from the input
+UNQUOTED_FIELDS = {"Indication #"}
+
+_ELLIPSIS_RE = re.compile(r"\s*(?:\.\.\.|…)\s*")
+
+# Characters folded together before matching, so typographic variants still match
+_FOLD = str.maketrans({
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "−": "-",
+    " ": " "
+})
+
+
+def build_index(text):
+    """
+    Build a normalized, case-folded copy of the input with whitespace collapsed,
+    plus a map from each normalized character back to its offset in the original text.
+    """
+    chars = []
+    offsets = []
+    previous_space = True
+    for position, char in enumerate(text or ""):
+        char = char.translate(_FOLD)
+        if char.isspace():
+            if previous_space:
+                continue
+            char = " "
+            previous_space = True
+        else:
+            previous_space = False
+        for folded in char.casefold():
+            chars.append(folded)
+            offsets.append(position)
+    if chars and chars[-1] == " ":
+        chars.pop()
+        offsets.pop()
+    return "".join(chars), offsets
+
+
+def _normalize(text):
+    normalized, _ = build_index(text)
+    return normalized.strip(" .;,:")
+
+
+def locate(index, evidence):
+    """
+    Resolve an evidence string to character spans in the original text.
+    Evidence with "..." is matched piecewise, in order. Returns a list of (start, end)
+    tuples, or None if any piece is missing.
+    """
+    normalized, offsets = index
+    pieces = [_normalize(piece) for piece in _ELLIPSIS_RE.split(evidence or "")]
+    pieces = [piece for piece in pieces if piece]
+    if not pieces:
+        return None
+
+    spans = []
+    cursor = 0
+    for piece in pieces:
+        start = normalized.find(piece, cursor)
+        if start == -1 and cursor:
+            start = normalized.find(piece)
+        if start == -1:
+            return None
+        end = start + len(piece)
+        spans.append((offsets[start], offsets[end - 1] + 1))
+        cursor = end
+    return spans
+
+
+def ground_extraction(text, data, offsets=None):
+    """
+    Check every field's evidence against the input text.
+
+    Returns a list parallel to data; each entry maps field name to
+    {"grounded": bool or None, "spans": [(start, end), ...]}. grounded is None
+    when the field has no value or no quoted evidence to check. If text was
+    normalized, pass its offsets map to get spans in the original text.
+    """
+    index = build_index(text)
+    results = []
+    for item in data if isinstance(data, list) else [data]:
+        fields = {}
+        if isinstance(item, dict):
+            for name, field in item.items():
+                if not isinstance(field, dict) or name in UNQUOTED_FIELDS:
+                    continue
+                value = field.get("value")
+                evidence = field.get("evidence")
+                if value in (None, "", "_") or not isinstance(evidence, str) or not evidence.strip():
+                    fields[name] = {"grounded": None, "spans": []}
+                    continue
+                spans = locate(index, evidence)
+                if spans and offsets is not None:
+                    spans = [to_original_span(offsets, start, end) for start, end in spans]
+                fields[name] = {"grounded": spans is not None, "spans": spans or []}
+        results.append(fields)
+    return results
+
+
+def grounding_violations(grounding):
+    """
+    Turn ungrounded fields into violations in the same shape as ema_validate produces,
+    so they can be sent through the same targeted repair
+    """
+    violations = []
+    for index, fields in enumerate(grounding):
+        for name, result in fields.items():
+            if result["grounded"] is False:
+                violations.append({
+                    "index": index,
+                    "field": name,
+                    "message": "evidence does not appear in the input text"
+                })
+    return violations
+
+
+def grounding_summary(grounding):
+    """
+    Return (grounded, ungrounded) field counts
+    """
+    grounded = sum(1 for fields in grounding for r in fields.values() if r["grounded"] is True)
+    ungrounded = sum(1 for fields in grounding for r in fields.values() if r["grounded"] is False)
+    return grounded, ungrounded
+
+
+def highlight_html(text, grounding, item_index=None):
+    """
+    Render the input text as HTML with evidence spans highlighted.
+    Only the spans of one indication are shown if item_index is given.
+    """
+    spans = []
+    for index, fields in enumerate(grounding):
+        if item_index is not None and index != item_index:
+            continue
+        for result in fields.values():
+            spans.extend(result["spans"])
+
+    # Merge overlapping spans so marks never nest
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    parts = []
+    cursor = 0
+    for start, end in merged:
+        parts.append(html.escape(text[cursor:start]))
+        parts.append(f'<mark class="evidence-mark">{html.escape(text[start:end])}</mark>')
+        cursor = end
+    parts.append(html.escape(text[cursor:]))
+    return "".join(parts).replace("\n", "<br>")
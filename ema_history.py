@@ -0,0 +1,187 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from cachetools import LRUCache
+
+# Per-session history of recent extractions. The newest results stay in memory in an
+# LRU cache bounded both by entry count and by size, so every session costs at most
+# MAX_MEMORY_BYTES however many extractions it runs. Evicted entries are spilled to
+# gzipped JSON under the store and loaded back when the user switches to them.
+
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+HISTORY_DIR = os.path.join(STORE_DIR, "history")
+
+MAX_MEMORY_ENTRIES = int(os.environ.get("EMA_HISTORY_MEMORY_ENTRIES", "5"))
+MAX_MEMORY_BYTES = int(float(os.environ.get("EMA_HISTORY_MEMORY_MB", "4")) * 1024 * 1024)
+MAX_ENTRIES = int(os.environ.get("EMA_HISTORY_ENTRIES", "50"))
+
+# Spill folders of sessions that have not been touched for this long are removed
+SPILL_RETENTION_SECONDS = 24 * 3600
+
+
+def _entry_size(entry):
+    return entry["size"]
+
+
+class _SpillingCache(LRUCache):
+    """
+    LRU cache that hands evicted entries to a spill function instead of dropping them
+    """
+
+    def __init__(self, maxsize, max_entries, spill):
+        super().__init__(maxsize, getsizeof=_entry_size)
+        self.max_entries = max_entries
+        self.spill = spill
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        while len(self) > self.max_entries:
+            self.popitem()
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.spill(key, value)
+        return key, value
+
+
+class SessionHistory:
+    """
+    Recent extractions of one session, newest first
+    """
+
+    def __init__(self, max_memory_bytes=MAX_MEMORY_BYTES, max_memory_entries=MAX_MEMORY_ENTRIES,
+                 max_entries=MAX_ENTRIES, spill_dir=None):
+        self.session_id = uuid.uuid4().hex
+        self.spill_dir = os.path.join(spill_dir or HISTORY_DIR, self.session_id)
+        self.max_entries = max_entries
+        # Metadata for every entry, in memory or spilled: id -> label fields
+        self.index = {}
+        self.spilled = set()
+        self.lock = threading.RLock()
+        self.cache = _SpillingCache(max_memory_bytes, max_memory_entries, self._spill)
+        cleanup_spills(spill_dir or HISTORY_DIR)
+
+    def _spill_path(self, entry_id):
+        return os.path.join(self.spill_dir, f"{entry_id}.json.gz")
+
+    def _spill(self, entry_id, entry):
+        if entry_id not in self.index or entry_id in self.spilled:
+            # Gone, or already on disk from an earlier eviction (entries never change)
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        tmp_path = self._spill_path(entry_id) + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._spill_path(entry_id))
+        self.spilled.add(entry_id)
+
+    def add(self, data, grounding=None, source_text="", product="", violations=None):
+        """
+        Store a result and return its id
+        """
+        entry_id = uuid.uuid4().hex[:12]
+        entry = {
+            "data": data,
+            "grounding": grounding or [],
+            "source_text": source_text,
+            "violations": violations or [],
+        }
+        payload = json.dumps(entry, ensure_ascii=False)
+        entry["size"] = len(payload.encode("utf-8"))
+        with self.lock:
+            self.index[entry_id] = {
+                "created": time.time(),
+                "product": product,
+                "indications": len(data) if isinstance(data, list) else 1,
+                "preview": " ".join(source_text.split())[:60],
+            }
+            if entry["size"] > self.cache.maxsize:
+                # Too large to keep in memory at all
+                self._spill(entry_id, entry)
+            else:
+                self.cache[entry_id] = entry
+            self._trim()
+        return entry_id
+
+    def _trim(self):
+        while len(self.index) > self.max_entries:
+            oldest = next(iter(self.index))
+            self.remove(oldest)
+
+    def get(self, entry_id):
+        """
+        Return an entry, loading it back from disk if it was spilled
+        """
+        with self.lock:
+            if entry_id not in self.index:
+                return None
+            entry = self.cache.get(entry_id)
+            if entry is not None:
+                return entry
+            try:
+                with gzip.open(self._spill_path(entry_id), "rt", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.index.pop(entry_id, None)
+                self.spilled.discard(entry_id)
+                return None
+            if entry["size"] <= self.cache.maxsize:
+                self.cache[entry_id] = entry
+            return entry
+
+    def remove(self, entry_id):
+        with self.lock:
+            self.index.pop(entry_id, None)
+            self.cache.pop(entry_id, None)
+            if entry_id in self.spilled:
+                self.spilled.discard(entry_id)
+                try:
+                    os.remove(self._spill_path(entry_id))
+                except OSError:
+                    pass
+
+    def entries(self):
+        """
+        Return (id, metadata) pairs, newest first
+        """
+        with self.lock:
+            return list(reversed(self.index.items()))
+
+    def label(self, entry_id):
+        meta = self.index.get(entry_id)
+        if meta is None:
+            return entry_id
+        when = time.strftime("%H:%M:%S", time.localtime(meta["created"]))
+        name = meta["product"] or meta["preview"] or "untitled"
+        return f"{when} · {name} · {meta['indications']} indication(s)"
+
+    def memory_bytes(self):
+        return self.cache.currsize
+
+    def clear(self):
+        with self.lock:
+            self.index.clear()
+            self.cache.clear()
+            self.spilled.clear()
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def cleanup_spills(history_dir=HISTORY_DIR, max_age=SPILL_RETENTION_SECONDS):
+    """
+    Remove spill folders of sessions that ended long ago
+    """
+    if not os.path.isdir(history_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(history_dir):
+        path = os.path.join(history_dir, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue
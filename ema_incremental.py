@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import hashlib
+
+# Where previous extractions are kept so revisions can be diffed against them
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+REVISIONS_DIR = os.path.join(STORE_DIR, "revisions")
+
+# Uncovered text shorter than this (page numbers, "- -" debris) is ignored
+MIN_REGION_WORDS = 4
+
+_WS_RE = re.compile(r"\s+")
+_INDICATED_RE = re.compile(r"\bindicat", re.IGNORECASE)
+
+
+def field_value(item, key, default=None):
+    """
+    Return the "value" of a field, tolerating plain (non value/evidence/confidence) fields
+    """
+    field = item.get(key, default) if isinstance(item, dict) else default
+    if isinstance(field, dict):
+        return field.get("value", default)
+    return field
+
+
+def normalize_ws(text):
+    """
+    Collapse all whitespace runs to a single space
+    """
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+def group_sections(data):
+    """
+    Group consecutive indication objects that share the same Disease_level_full_text.
+    Each section is a dict with the section text and its indication objects.
+    """
+    sections = []
+    for item in data or []:
+        text = normalize_ws(str(field_value(item, "Disease_level_full_text", "") or ""))
+        if sections and sections[-1]["text"] == text:
+            sections[-1]["items"].append(item)
+        else:
+            sections.append({"text": text, "items": [item]})
+    return sections
+
+
+def renumber_indications(data):
+    """
+    Re-sequence "Indication #" so it counts 1, 2, 3... within each Primary Disease_category
+    """
+    counters = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        category = str(field_value(item, "Primary Disease_category", "") or "").strip().lower()
+        counters[category] = counters.get(category, 0) + 1
+        number = counters[category]
+        field = item.get("Indication #")
+        if isinstance(field, dict):
+            field["value"] = number
+        else:
+            item["Indication #"] = {
+                "value": number,
+                "evidence": "implicit sequencing",
+                "confidence": 1.0
+            }
+    return data
+
+
+def _claim(text, needle, claimed):
+    """
+    Find the first occurrence of needle in text that does not overlap an already claimed span
+    """
+    start = text.find(needle)
+    while start != -1:
+        end = start + len(needle)
+        if all(end <= s or start >= e for s, e in claimed):
+            return start, end
+        start = text.find(needle, start + 1)
+    return None
+
+
+def diff_sections(new_text, previous_data):
+    """
+    Compare the new section 4.1 text against the previous extraction.
+
+    Returns a list of segments in text order. Each segment is either
+    {"kind": "reuse", "start", "end", "items"} for a disease section whose text is
+    unchanged, or {"kind": "extract", "start", "end", "text"} for text that must be
+    sent to the model again.
+    """
+    text = normalize_ws(new_text)
+    claimed = []
+    segments = []
+
+    for section in group_sections(previous_data):
+        if not section["text"]:
+            continue
+        span = _claim(text, section["text"], claimed)
+        if span is None:
+            continue
+        claimed.append(span)
+        segments.append({"kind": "reuse", "start": span[0], "end": span[1], "items": section["items"]})
+
+    segments.sort(key=lambda s: s["start"])
+
+    # Everything not covered by an unchanged section is new or revised text
+    merged = []
+    cursor = 0
+    for segment in segments + [{"kind": "end", "start": len(text), "end": len(text)}]:
+        gap = text[cursor:segment["start"]]
+        if len(gap.split()) >= MIN_REGION_WORDS:
+            if _INDICATED_RE.search(gap):
+                merged.append({"kind": "extract", "start": cursor, "end": segment["start"]})
+            elif merged:
+                # Sentences without an indication extend the previous section,
+                # so that section is re-extracted together with them
+                previous = merged.pop()
+                merged.append({"kind": "extract", "start": previous["start"], "end": segment["start"]})
+            elif segment["kind"] != "end":
+                # Leading text without an indication belongs to the section after it
+                merged.append({"kind": "extract", "start": cursor, "end": segment["end"]})
+                cursor = segment["end"]
+                continue
+            else:
+                merged.append({"kind": "extract", "start": cursor, "end": segment["start"]})
+        if segment["kind"] == "end":
+            break
+        merged.append(segment)
+        cursor = segment["end"]
+
+    for segment in merged:
+        if segment["kind"] == "extract":
+            segment["text"] = text[segment["start"]:segment["end"]].strip()
+    return merged
+
+
+def incremental_extract(new_text, previous_data, extract_fn):
+    """
+    Re-extract only the disease sections that changed since previous_data was produced.
+
+    extract_fn takes a piece of section 4.1 text and returns the parsed JSON array for it.
+    Returns a dict with the spliced "data" and counters describing how much was re-sent.
+    """
+    segments = diff_sections(new_text, previous_data)
+    data = []
+    reused = 0
+    extracted = 0
+    chars_sent = 0
+
+    for segment in segments:
+        if segment["kind"] == "reuse":
+            data.extend(json.loads(json.dumps(segment["items"])))
+            reused += 1
+        else:
+            result = extract_fn(segment["text"])
+            if isinstance(result, dict):
+                result = [result]
+            data.extend(result or [])
+            extracted += 1
+            chars_sent += len(segment["text"])
+
+    return {
+        "data": renumber_indications(data),
+        "reused_sections": reused,
+        "reextracted_sections": extracted,
+        "chars_sent": chars_sent,
+        "chars_total": len(normalize_ws(new_text))
+    }
+
+
+def _revision_path(product):
+    key = hashlib.sha1(product.strip().lower().encode("utf-8")).hexdigest()[:16]
+    return os.path.join(REVISIONS_DIR, f"{key}.json")
+
+
+def load_revision(product):
+    """
+    Load the last stored extraction for a product, or None if there is none
+    """
+    path = _revision_path(product)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_revision(product, text, data):
+    """
+    Store the extraction for a product so the next revision can be diffed against it
+    """
+    os.makedirs(REVISIONS_DIR, exist_ok=True)
+    path = _revision_path(product)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"product": product, "text": text, "data": data}, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+import ema_documents
+
+# Document ingest on a process pool. PDF and DOCX parsing is pure Python and CPU-bound,
+# so it runs in worker processes instead of competing for the GIL with the threads that
+# wait on the model. PDFs are read in page ranges: the first range usually holds
+# section 4.1 and then nothing else is parsed; when it does not, the remaining ranges are
+# parsed in parallel and joined in page order.
+
+INGEST_WORKERS = int(os.environ.get("EMA_INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+PAGES_PER_UNIT = 8
+
+
+class IngestPool:
+    """
+    Process pool that turns document paths into section 4.1 texts
+    """
+
+    def __init__(self, workers=INGEST_WORKERS, pages_per_unit=PAGES_PER_UNIT):
+        self.workers = workers
+        self.pages_per_unit = pages_per_unit
+        # Spawned workers do not inherit the threads and locks of the parent process
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Reads nobody is waiting for any more are dropped
+        self.close(cancel=True)
+
+    def close(self, cancel=False):
+        self.pool.shutdown(wait=True, cancel_futures=cancel)
+
+    def submit(self, path):
+        """
+        Start reading a document; returns a Future for its section 4.1 text
+        """
+        result = Future()
+        result.set_running_or_notify_cancel()
+        try:
+            if os.path.splitext(path)[1].lower() == ".pdf":
+                first = self.pool.submit(ema_documents.read_pdf_pages, path, 0, self.pages_per_unit)
+                first.add_done_callback(lambda unit: self._first_unit_done(path, unit, result))
+            else:
+                whole = self.pool.submit(ema_documents.read_section_41, path)
+                whole.add_done_callback(lambda unit: _forward(unit, result))
+        except RuntimeError as e:
+            # The pool has been shut down
+            result.set_exception(e)
+        return result
+
+    def _first_unit_done(self, path, unit, result):
+        try:
+            text, page_count = unit.result()
+            if page_count <= self.pages_per_unit or ema_documents.find_section_41(text, require_end=True):
+                result.set_result(ema_documents.extract_section_41(text))
+                return
+            starts = range(self.pages_per_unit, page_count, self.pages_per_unit)
+            units = [
+                self.pool.submit(ema_documents.read_pdf_pages, path, start, start + self.pages_per_unit)
+                for start in starts
+            ]
+        except (Exception, CancelledError) as e:
+            result.set_exception(e)
+            return
+
+        texts = [text] + [None] * len(units)
+        remaining = [len(units)]
+        lock = threading.Lock()
+
+        def unit_done(index, done_unit):
+            with lock:
+                if result.done():
+                    return
+                try:
+                    texts[index + 1] = done_unit.result()[0]
+                except (Exception, CancelledError) as e:
+                    result.set_exception(e)
+                    return
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    result.set_result(ema_documents.extract_section_41("\n".join(texts)))
+
+        for index, pending in enumerate(units):
+            pending.add_done_callback(lambda done_unit, index=index: unit_done(index, done_unit))
+
+    def iter_sections(self, paths, read_ahead=None):
+        """
+        Yield (path, text, error) as documents finish, in completion order. At most
+        read_ahead documents (default: twice the workers) are read before being consumed.
+        """
+        read_ahead = read_ahead or self.workers * 2
+        finished = queue.Queue()
+        paths = list(paths)
+        next_index = 0
+        in_flight = 0
+
+        def on_done(path, future):
+            finished.put((path, future))
+
+        for _ in range(len(paths)):
+            while in_flight < read_ahead and next_index < len(paths):
+                path = paths[next_index]
+                self.submit(path).add_done_callback(lambda future, path=path: on_done(path, future))
+                next_index += 1
+                in_flight += 1
+            path, future = finished.get()
+            in_flight -= 1
+            try:
+                text, error = future.result(), None
+            except (Exception, CancelledError) as e:
+                text, error = None, e
+            yield path, text, error
+
+
+def _forward(source, target):
+    try:
+        target.set_result(source.result())
+    except (Exception, CancelledError) as e:
+        target.set_exception(e)
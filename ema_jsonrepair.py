@@ -0,0 +1,394 @@
+import bisect
+import json
+import re
+import time
+
+# Tolerant parsing of model responses. The fast path is plain json.loads after
+# stripping a code fence. Responses that fail it are rewritten in one left-to-right
+# pass that fixes the usual LLM formatting faults:
+# - preamble and trailing commentary;
+# - code fences anywhere outside strings;
+# - // and /* */ comments;
+# - trailing, doubled and missing commas;
+# - raw newlines and bad escapes inside strings;
+# - stray inner quotes;
+# - Python literals (True, False, None) and NaN.
+# Each step of the pass consumes input, and all regular expressions are single character
+# classes or literals, so large responses cannot trigger backtracking blow-ups. Elements
+# of the outer array are parsed one by one when the whole still fails, so one malformed
+# object costs that object only; errors report line and column in the original response.
+
+_FENCE = "`" * 3
+
+# An opening bracket that plausibly starts the JSON value (not "[see below]" in a preamble)
+_START_RE = re.compile(r'\[\s*[\[{"\]\-0-9tfnTFN/`]|\{\s*["}]')
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_SPECIAL_RE = re.compile(r'["\\\x00-\x1f]')
+_LITERAL_RE = re.compile(r"-?(?:\d+\.?\d*(?:[eE][+\-]?\d+)?|Infinity)|true|false|null|True|False|None|NaN")
+_STRAY_RE = re.compile(r'[^\s"{}\[\],:`/]+')
+_FENCE_TAG_RE = re.compile(r"[A-Za-z]*")
+_NEXT_TOKEN_RE = re.compile(r"\s*(.)", re.DOTALL)
+
+_LITERALS = {"True": "true", "False": "false", "None": "null", "NaN": "null",
+             "Infinity": "null", "-Infinity": "null"}
+_ESCAPES = set('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+def _strip_fence(text):
+    cleaned = text.strip()
+    if cleaned.startswith(_FENCE):
+        cleaned = cleaned[len(_FENCE):]
+        if cleaned.startswith("json"):
+            cleaned = cleaned[len("json"):]
+    if cleaned.endswith(_FENCE):
+        cleaned = cleaned[:-len(_FENCE)]
+    return cleaned.strip()
+
+
+class _Repair:
+    """
+    One rewriting pass over a response; out holds the repaired JSON and anchors map
+    positions in it back to the response
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.out = []
+        self.out_length = 0
+        self.anchors_out = []
+        self.anchors_in = []
+        self.stack = []
+        self.last = None  # "open", "value", "colon" or "comma"
+        self.pending_comma = None
+        self.element_start = None
+        self.elements = []
+        self.repairs = {}
+        self.truncated = False
+
+    def note(self, kind):
+        self.repairs[kind] = self.repairs.get(kind, 0) + 1
+
+    def emit(self, chunk, position):
+        self.anchors_out.append(self.out_length)
+        self.anchors_in.append(position)
+        self.out.append(chunk)
+        self.out_length += len(chunk)
+
+    def source_position(self, out_position):
+        index = bisect.bisect_right(self.anchors_out, out_position) - 1
+        if index < 0:
+            return 0
+        return self.anchors_in[index] + out_position - self.anchors_out[index]
+
+    def begin_value(self, position):
+        """
+        Called before a value (or object key) is written
+        """
+        if self.pending_comma is not None:
+            self.emit(",", self.pending_comma)
+            self.pending_comma = None
+        elif self.last == "value" and self.stack:
+            self.note("missing comma")
+            self.emit(",", position)
+        if len(self.stack) == 1 and self.stack[0] == "[":
+            self.element_start = self.out_length
+
+    def end_value(self):
+        self.last = "value"
+        if len(self.stack) == 1 and self.stack[0] == "[" and self.element_start is not None:
+            self.elements.append((self.element_start, self.out_length))
+            self.element_start = None
+
+    def run(self, start):
+        text = self.text
+        length = len(text)
+        i = start
+        while i < length:
+            c = text[i]
+            if c in " \t\r\n":
+                # Whitespace is dropped; error locations still map through the anchors
+                i = _WHITESPACE_RE.match(text, i).end()
+            elif c == '"':
+                if self.last == "colon" or not self.stack or self.stack[-1] == "[":
+                    self.begin_value(i)
+                else:
+                    # An object key
+                    if self.pending_comma is not None:
+                        self.emit(",", self.pending_comma)
+                        self.pending_comma = None
+                    elif self.last == "value":
+                        self.note("missing comma")
+                        self.emit(",", i)
+                i = self.string(i)
+                if i < 0:
+                    self.truncated = True
+                    return
+                if self.last == "colon" or not self.stack or self.stack[-1] == "[":
+                    self.end_value()
+                else:
+                    self.last = "key"
+            elif c in "[{":
+                if self.stack and self.stack[-1] == "{" and self.last in ("open", "comma"):
+                    # A value where a key should be: the previous object was never closed
+                    self.note("missing bracket")
+                    self.stack.pop()
+                    self.emit("}", i)
+                    self.end_value()
+                self.begin_value(i)
+                self.stack.append(c)
+                self.emit(c, i)
+                self.last = "open"
+                i += 1
+            elif c in "]}":
+                i = self.close(c, i)
+                if not self.stack:
+                    return
+            elif c == ",":
+                if self.last in ("open", "comma") or self.pending_comma is not None:
+                    self.note("extra comma")
+                else:
+                    self.pending_comma = i
+                    self.last = "comma"
+                i += 1
+            elif c == ":":
+                self.emit(c, i)
+                self.last = "colon"
+                i += 1
+            elif text.startswith(_FENCE, i):
+                self.note("code fence")
+                i = _FENCE_TAG_RE.match(text, i + len(_FENCE)).end()
+            elif text.startswith("//", i):
+                self.note("comment")
+                end = text.find("\n", i)
+                i = length if end < 0 else end
+            elif text.startswith("/*", i):
+                self.note("comment")
+                end = text.find("*/", i + 2)
+                i = length if end < 0 else end + 2
+            else:
+                match = _LITERAL_RE.match(text, i)
+                if match:
+                    literal = match.group()
+                    self.begin_value(i)
+                    if literal in _LITERALS:
+                        self.note("non-JSON literal")
+                        literal = _LITERALS[literal]
+                    self.emit(literal, i)
+                    self.end_value()
+                    i = match.end()
+                else:
+                    self.note("stray text")
+                    match = _STRAY_RE.match(text, i)
+                    i = match.end() if match else i + 1
+        self.truncated = bool(self.stack)
+
+    def close(self, c, i):
+        opener = "[" if c == "]" else "{"
+        if opener not in self.stack:
+            self.note("unmatched bracket")
+            return i + 1
+        if self.pending_comma is not None:
+            self.note("trailing comma")
+            self.pending_comma = None
+        # Close anything left open inside, e.g. an object missing its "}" before "]"
+        while self.stack[-1] != opener:
+            self.note("missing bracket")
+            self.emit(_CLOSERS[self.stack.pop()], i)
+            self.end_value()
+        self.stack.pop()
+        self.emit(c, i)
+        self.end_value()
+        return i + 1
+
+    def string(self, i):
+        """
+        Copy the string starting at text[i], repairing its content; returns the index
+        after it, or -1 when the response ends inside it
+        """
+        text = self.text
+        # Unchanged stretches are copied in one piece from segment to the current position
+        segment = i
+        i += 1
+        while True:
+            match = _STRING_SPECIAL_RE.search(text, i)
+            if match is None:
+                return -1
+            j = match.start()
+            c = text[j]
+            if c == '"':
+                following = _NEXT_TOKEN_RE.match(text, j + 1)
+                if following is None or following.group(1) in ',:}]"[{`/':
+                    self.emit(text[segment:j + 1], segment)
+                    return j + 1
+                # A quote followed by more words is part of the text
+                self.note("unescaped quote")
+                replacement = '\\"'
+            elif c == "\\":
+                if j + 1 >= len(text):
+                    return -1
+                if text[j + 1] in _ESCAPES:
+                    i = j + 2
+                    continue
+                self.note("invalid escape")
+                replacement = "\\\\"
+            else:
+                self.note("control character in string")
+                replacement = _CONTROL_ESCAPES.get(c, f"\\u{ord(c):04x}")
+            self.emit(text[segment:j], segment)
+            self.emit(replacement, j)
+            segment = i = j + 1
+
+
+def _location(text, position):
+    line = text.count("\n", 0, position) + 1
+    return line, position - (text.rfind("\n", 0, position) + 1) + 1
+
+
+def _parse(fragment):
+    """
+    json.loads returning (value, None) or (None, (offset, message))
+    """
+    try:
+        return json.loads(fragment), None
+    except json.JSONDecodeError as e:
+        return None, (e.pos, e.msg)
+    except RecursionError:
+        return None, (0, "nested too deeply")
+
+
+def recover(text):
+    """
+    Parse a model response as JSON, repairing it where needed.
+
+    Returns a dict with "data" (None when no JSON value was found), "truncated" (the
+    response ended inside the value; data then holds the complete elements of the outer
+    array), "errors" (one {"position", "line", "column", "message"} per element that could
+    not be parsed and was dropped) and "repairs" (counts of the faults that were fixed).
+    """
+    data, error = _parse(_strip_fence(text))
+    if error is None:
+        return {"data": data, "truncated": False, "errors": [], "repairs": {}}
+
+    start = _START_RE.search(text)
+    if start is None:
+        return {"data": None, "truncated": False, "repairs": {},
+                "errors": [{"position": 0, "line": 1, "column": 1, "message": "no JSON array or object found"}]}
+
+    repair = _Repair(text)
+    repair.run(start.start())
+    repaired = "".join(repair.out)
+    result = {"data": None, "truncated": repair.truncated, "errors": [], "repairs": repair.repairs}
+
+    def add_error(out_position, message):
+        position = repair.source_position(out_position)
+        line, column = _location(text, position)
+        result["errors"].append({"position": position, "line": line, "column": column, "message": message})
+
+    if not repair.truncated:
+        data, error = _parse(repaired)
+        if error is None:
+            result["data"] = data
+            return result
+        if text[start.start()] != "[":
+            add_error(*error)
+            return result
+
+    if text[start.start()] != "[":
+        return result
+
+    # Parse the outer array element by element and keep the ones that are well formed
+    items = []
+    for element_start, element_end in repair.elements:
+        item, error = _parse(repaired[element_start:element_end])
+        if error is None:
+            items.append(item)
+        else:
+            add_error(element_start + error[0], error[1])
+    result["data"] = items
+    return result
+
+
+def _legacy_clean(text):
+    # The fence-stripping clean-up this module replaced, kept for the benchmark
+    cleaned = text.strip()
+    if cleaned.startswith(_FENCE + "json"):
+        cleaned = cleaned[len(_FENCE + "json"):]
+    elif cleaned.startswith(_FENCE):
+        cleaned = cleaned[len(_FENCE):]
+    if cleaned.endswith(_FENCE):
+        cleaned = cleaned[:-len(_FENCE)]
+    return cleaned.strip()
+
+
+def _benchmark_cases(indications):
+    item = {
+        "Primary Disease_category": {"value": "Melanoma", "evidence": "Melanoma", "confidence": 0.95},
+        "Indication_text": {"value": 'OPDIVO as monotherapy is indicated for "advanced" melanoma',
+                            "evidence": "indicated for the treatment of advanced melanoma", "confidence": 1.0},
+        "Treatment line": {"value": "_", "evidence": "", "confidence": 0.28},
+        "Population": {"value": "Adult", "evidence": "in adults", "confidence": 0.94},
+    }
+    body = json.dumps([dict(item, **{"Indication #": {"value": n + 1}}) for n in range(indications)], indent=2)
+    return {
+        "clean": body,
+        "fenced": _FENCE + "json\n" + body + "\n" + _FENCE,
+        "preamble and commentary": "Here is the extracted JSON:\n" + body + "\nLet me know if you need changes.",
+        "trailing commas": body.replace("}\n  }", "},\n  }").replace("\n]", ",\n]"),
+        "mid-response fence": body.replace("},\n  {", "}\n" + _FENCE + "\n" + _FENCE + "json\n  {", 1),
+        "raw newline in string": body.replace("advanced", "advanced\nunresectable", 1),
+        "cut off": body[:int(len(body) * 0.7)],
+    }
+
+
+def benchmark(sizes=(10, 100, 1000), repeat=20):
+    """
+    Time the old path (fence strip + json.loads) against recover() on synthetic responses
+    """
+    rows = []
+    for size in sizes:
+        for name, response in _benchmark_cases(size).items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                try:
+                    json.loads(_legacy_clean(response))
+                    legacy_ok = True
+                except json.JSONDecodeError:
+                    legacy_ok = False
+            legacy_ms = (time.perf_counter() - start) * 1000 / repeat
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = recover(response)
+            recover_ms = (time.perf_counter() - start) * 1000 / repeat
+            rows.append({
+                "indications": size,
+                "case": name,
+                "kb": len(response) / 1024,
+                "legacy_ok": legacy_ok,
+                "legacy_ms": legacy_ms,
+                "recovered": len(result["data"]) if isinstance(result["data"], list) else 0,
+                "recover_ms": recover_ms,
+            })
+    return rows
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the tolerant JSON parser against the old clean-up")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="indications per response")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>6} {'case':<24} {'KB':>8} {'old':>6} {'old ms':>8} {'kept':>6} {'new ms':>8}")
+    for row in benchmark(args.sizes, args.repeat):
+        print(
+            f"{row['indications']:>6} {row['case']:<24} {row['kb']:>8.1f} {'ok' if row['legacy_ok'] else 'fail':>6} "
+            f"{row['legacy_ms']:>8.2f} {row['recovered']:>6} {row['recover_ms']:>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
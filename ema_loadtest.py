@@ -0,0 +1,500 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from types import SimpleNamespace
+
+# Load test for the Streamlit app. Starts a real `streamlit run` server for
+# ema_extract_2.py with Gemini replaced by a stub client of configurable latency, then
+# drives N simulated analysts over Streamlit's websocket protocol, as browser tabs would:
+# paste a synthetic section 4.1, click "Extract Info", click "Download" and fetch the
+# file, in a loop. Reports throughput, per-step UI latency percentiles and the server's
+# memory per connected session.
+#
+# The credentials upload is simulated by setting the session state its handler sets.
+#
+#     python ema_loadtest.py --sessions 20 --iterations 3 --latency 6
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ema_extract_2.py")
+
+# Set in the server process started by the harness
+APP_MODE_ENV = "EMA_LOADTEST_APP"
+
+TEXT_AREA_LABEL = "Paste the plain text for extraction:"
+EXTRACT_LABEL = "🔍 Extract Info"
+REUSE_LABELS = ("Only re-extract", "Reuse extractions")
+
+DISEASES = [
+    ("Melanoma", "advanced (unresectable or metastatic) melanoma"),
+    ("Non-small cell lung cancer (NSCLC)", "locally advanced or metastatic non-small cell lung cancer"),
+    ("Renal cell carcinoma (RCC)", "advanced renal cell carcinoma"),
+    ("Type 2 diabetes mellitus", "insufficiently controlled type 2 diabetes mellitus"),
+    ("Rheumatoid arthritis", "moderately to severely active rheumatoid arthritis"),
+    ("Plaque psoriasis", "moderate to severe plaque psoriasis"),
+    ("Chronic heart failure", "symptomatic chronic heart failure with reduced ejection fraction"),
+    ("Hodgkin lymphoma", "relapsed or refractory classical Hodgkin lymphoma"),
+]
+POPULATIONS = [
+    ("adults", "Adult"),
+    ("adolescents 12 years and older", "Adolescent"),
+    ("adults and adolescents", "Adult, Adolescent"),
+]
+
+
+def synthetic_text(rng, product, indications):
+    """
+    Build a section 4.1 text with the given number of indications
+    """
+    lines = []
+    for category, disease in rng.sample(DISEASES, indications):
+        population = rng.choice(POPULATIONS)[0]
+        lines.append(category)
+        lines.append(f"{product} is indicated for the treatment of {disease} in {population}.")
+    return "\n".join(lines)
+
+
+def _field(value, evidence, confidence):
+    return {"value": value, "evidence": evidence, "confidence": confidence}
+
+
+def stub_extraction(text):
+    """
+    A valid, grounded extraction of a synthetic text, as the model would return it
+    """
+    items = []
+    lines = text.splitlines()
+    for position, line in enumerate(lines):
+        match = re.search(r"is indicated for the treatment of (.+) in (.+)\.$", line)
+        if not match or position == 0:
+            continue
+        category = lines[position - 1]
+        items.append({
+            "Primary Disease_category": _field(category, category, 0.95),
+            "Disease_level_full_text": _field(f"{category}\n{line}", line, 0.95),
+            "Indication #": _field(len(items) + 1, "", 1.0),
+            "Indication_text": _field(line, line, 0.97),
+            "Treatment line": _field("_", "", 0.2),
+            "Treatment modality": _field("_", "", 0.2),
+            "Population": _field(dict(POPULATIONS).get(match.group(2), "_"), match.group(2), 0.9),
+            "Disease + sybtypes": _field(match.group(1), match.group(1), 0.9),
+        })
+    return items
+
+
+class StubModels:
+    """
+    Stand-in for client.models with lognormal latency that grows with the indication count
+    """
+
+    def __init__(self, latency, per_indication, jitter, seed=None):
+        self.latency = latency
+        self.per_indication = per_indication
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _sleep(self, seconds):
+        with self.lock:
+            factor = self.rng.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        time.sleep(seconds * factor)
+
+    def generate_content(self, model, contents, config=None):
+        import ema_core
+
+        text, prompt = contents[0], contents[1]
+        if prompt == ema_core.cdp_ema_prompt:
+            items = stub_extraction(text)
+            self._sleep(self.latency + self.per_indication * len(items))
+            body = json.dumps(items)
+        else:
+            # Follow-up calls (repairs, segmentation) get an empty answer
+            self._sleep(self.latency / 4)
+            body = "{}"
+        return SimpleNamespace(
+            text=body,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=(len(text) + len(prompt)) // 4,
+                candidates_token_count=len(body) // 4,
+                thoughts_token_count=0,
+                total_token_count=(len(text) + len(prompt) + len(body)) // 4
+            ),
+            candidates=[SimpleNamespace(finish_reason="STOP")]
+        )
+
+    def count_tokens(self, model, contents):
+        time.sleep(0.05)
+        return SimpleNamespace(total_tokens=sum(len(str(c)) for c in contents) // 4)
+
+
+def serve_app():
+    """
+    Server side: install the stub client and the simulated credentials, then run the app
+    """
+    import streamlit as st
+
+    import ema_core
+
+    @st.cache_resource
+    def stub_client():
+        return SimpleNamespace(models=StubModels(
+            float(os.environ.get("EMA_LOADTEST_LATENCY", "4")),
+            float(os.environ.get("EMA_LOADTEST_PER_INDICATION", "1")),
+            float(os.environ.get("EMA_LOADTEST_JITTER", "0.3")),
+        ))
+
+    client = stub_client()
+    ema_core.get_gemini_client = lambda: client
+
+    session = st.query_params.get("session", "0")
+    st.session_state.setdefault("credentials_loaded", True)
+    st.session_state.setdefault("user_id", f"loadtest-{session}@example.com")
+
+    with open(APP_PATH, "r", encoding="utf-8") as f:
+        code = compile(f.read(), APP_PATH, "exec")
+    exec(code, {"__name__": "__main__", "__file__": APP_PATH})
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(store_dir, latency, per_indication, jitter, log_path):
+    """
+    Start `streamlit run` on this file in app mode; returns (process, base URL)
+    """
+    port = _free_port()
+    env = dict(
+        os.environ,
+        EMA_STORE_DIR=store_dir,
+        EMA_LOADTEST_LATENCY=str(latency),
+        EMA_LOADTEST_PER_INDICATION=str(per_indication),
+        EMA_LOADTEST_JITTER=str(jitter),
+    )
+    env[APP_MODE_ENV] = "1"
+    os.makedirs(store_dir, exist_ok=True)
+    log_file = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", os.path.abspath(__file__),
+            "--server.headless=true",
+            f"--server.port={port}",
+            "--server.address=127.0.0.1",
+            "--server.fileWatcherType=none",
+            "--browser.gatherUsageStats=false",
+        ],
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        cwd=os.path.dirname(APP_PATH)
+    )
+    # The child has its own handle now
+    log_file.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode}, see {log_path}")
+        try:
+            with urllib.request.urlopen(base_url + "/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process, base_url
+        except OSError:
+            time.sleep(0.25)
+    process.kill()
+    raise RuntimeError(f"streamlit did not become healthy, see {log_path}")
+
+
+def process_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class BrowserSession:
+    """
+    One simulated browser tab speaking Streamlit's websocket protocol
+    """
+
+    def __init__(self, base_url, index):
+        self.base_url = base_url
+        self.index = index
+        self.websocket = None
+        self.widget_states = {}
+        self.widgets = {}
+        self.download_url = None
+        self.timings = {}
+        self.errors = []
+        self.extractions = 0
+
+    async def connect(self):
+        import websockets
+
+        ws_url = self.base_url.replace("http://", "ws://") + "/_stcore/stream"
+        self.websocket = await websockets.connect(ws_url, max_size=None)
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    def widget_id(self, label_prefix):
+        for label, widget_id in self.widgets.items():
+            if label.startswith(label_prefix):
+                return widget_id
+        raise LookupError(f"widget not found: {label_prefix}")
+
+    def set_widget(self, widget_id, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self.widget_states[widget_id] = WidgetState(id=widget_id, **value)
+
+    def _see(self, element):
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind)
+        if hasattr(proto, "id") and getattr(proto, "label", None):
+            self.widgets[proto.label] = proto.id
+        if kind == "download_button":
+            self.download_url = proto.url
+        elif kind == "exception":
+            self.errors.append(proto.message)
+        elif kind == "alert" and proto.format == proto.ERROR:
+            self.errors.append(proto.body)
+
+    async def rerun(self, step, trigger=None):
+        """
+        Send a rerun with the current widget states and wait until the script finishes
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = f"session={self.index}"
+        message.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        if trigger is not None:
+            message.rerun_script.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        self.widgets = {}
+        self.download_url = None
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._see(forward.delta.new_element)
+            elif kind == "script_finished":
+                break
+        self.timings.setdefault(step, []).append(time.perf_counter() - start)
+
+    async def download(self):
+        """
+        Click the download button: the browser fetches the file and the app reruns
+        """
+        start = time.perf_counter()
+        url = self.base_url + self.download_url
+        await asyncio.to_thread(lambda: urllib.request.urlopen(url, timeout=60).read())
+        await self.rerun("download", trigger=self.widgets.get("📥 Download Extracted JSON"))
+        self.timings["download"][-1] = time.perf_counter() - start
+
+    async def run(self, iterations, think, allow_reuse, seed):
+        rng = random.Random(seed + self.index)
+        await self.connect()
+        await self.rerun("load")
+        if not allow_reuse:
+            # Every iteration should reach the model, not the reuse caches
+            for label in REUSE_LABELS:
+                self.set_widget(self.widget_id(label), bool_value=False)
+
+        for iteration in range(iterations):
+            text = synthetic_text(rng, f"Product{self.index}x{iteration}", rng.randint(1, 4))
+            await asyncio.sleep(rng.uniform(0, think))
+            self.set_widget(self.widget_id(TEXT_AREA_LABEL), string_value=text)
+            await self.rerun("paste")
+            await asyncio.sleep(rng.uniform(0, think))
+            await self.rerun("extract", trigger=self.widget_id(EXTRACT_LABEL))
+            if self.download_url is None:
+                self.errors.append("extract: no result shown")
+                continue
+            self.extractions += 1
+            await asyncio.sleep(rng.uniform(0, think))
+            await self.download()
+
+
+async def _drive(base_url, pid, sessions, iterations, ramp, think, allow_reuse, seed):
+    # One full iteration first, so the baseline includes lazy imports and warmed caches
+    warmup = BrowserSession(base_url, -1)
+    await warmup.run(1, 0, allow_reuse, seed)
+    await warmup.close()
+    baseline_rss = process_rss_bytes(pid)
+
+    browsers = [BrowserSession(base_url, index) for index in range(sessions)]
+
+    async def start(browser):
+        await asyncio.sleep(ramp * browser.index / max(sessions - 1, 1))
+        try:
+            await browser.run(iterations, think, allow_reuse, seed)
+        except Exception as e:
+            browser.errors.append(f"session failed: {e!r}")
+
+    peak_rss = baseline_rss
+    tasks = [asyncio.create_task(start(browser)) for browser in browsers]
+    started_at = time.time()
+    start_time = time.perf_counter()
+    while not all(task.done() for task in tasks):
+        rss = process_rss_bytes(pid)
+        if rss is not None and peak_rss is not None:
+            peak_rss = max(peak_rss, rss)
+        await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start_time
+
+    # Measured while every session is still connected, so their session state is live
+    final_rss = process_rss_bytes(pid)
+    for browser in browsers:
+        await browser.close()
+    return browsers, started_at, elapsed, baseline_rss, peak_rss, final_rss
+
+
+def run_load_test(sessions=10, iterations=3, ramp=5.0, think=1.0, latency=4.0, per_indication=1.0,
+                  jitter=0.3, allow_reuse=False, store_dir=None, seed=0, log=print):
+    """
+    Start a server, run the load test against it and return a report dict
+    """
+    store_dir = store_dir or tempfile.mkdtemp(prefix="ema_loadtest_")
+    log_path = os.path.join(store_dir, "loadtest_server.log")
+    process, base_url = start_server(store_dir, latency, per_indication, jitter, log_path)
+    log(f"Server at {base_url} (pid {process.pid}), store {store_dir}")
+    try:
+        browsers, started_at, elapsed, baseline_rss, peak_rss, final_rss = asyncio.run(
+            _drive(base_url, process.pid, sessions, iterations, ramp, think, allow_reuse, seed)
+        )
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    import ema_metrics
+
+    # The server's metrics, whatever store this process's ema_metrics was imported with
+    calls = [
+        r for r in ema_metrics.load("call", since=started_at, path=os.path.join(store_dir, "metrics.jsonl"))
+        if r.get("status") == "ok"
+    ]
+    steps = {}
+    for browser in browsers:
+        for name, values in browser.timings.items():
+            steps.setdefault(name, []).extend(values)
+    extractions = sum(browser.extractions for browser in browsers)
+    errors = [error for browser in browsers for error in browser.errors]
+    mb = 2 ** 20
+    return {
+        "sessions": sessions,
+        "iterations": iterations,
+        "elapsed_seconds": elapsed,
+        "extractions": extractions,
+        "throughput_per_minute": extractions / elapsed * 60 if elapsed else 0.0,
+        "model_calls": len(calls),
+        "model_latency_p50": percentile([r["latency"] for r in calls], 0.50),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency_seconds": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p99": percentile(values, 0.99),
+                "max": max(values),
+            }
+            for name, values in steps.items()
+        },
+        "rss_baseline_mb": baseline_rss / mb if baseline_rss else None,
+        "rss_peak_mb": peak_rss / mb if peak_rss else None,
+        "rss_per_session_mb": (final_rss - baseline_rss) / mb / max(sessions, 1) if final_rss and baseline_rss else None,
+        "store_dir": store_dir,
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['sessions']} sessions x {report['iterations']} iterations in {report['elapsed_seconds']:.1f} s",
+        f"Extractions: {report['extractions']} ({report['throughput_per_minute']:.1f}/min), "
+        f"model calls: {report['model_calls']} (p50 {report['model_latency_p50'] or 0:.2f} s), "
+        f"errors: {report['errors']}",
+        "",
+        f"{'step':<10}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}",
+    ]
+    for name in ("load", "paste", "extract", "download"):
+        stats = report["latency_seconds"].get(name)
+        if stats:
+            lines.append(
+                f"{name:<10}{stats['count']:>7}{stats['p50']:>8.2f}s{stats['p90']:>8.2f}s"
+                f"{stats['p99']:>8.2f}s{stats['max']:>8.2f}s"
+            )
+    lines.append("")
+    if report["rss_baseline_mb"] is not None:
+        lines.append(
+            f"Server RSS: {report['rss_baseline_mb']:.0f} MB idle, {report['rss_peak_mb']:.0f} MB peak, "
+            f"{report['rss_per_session_mb']:.2f} MB per connected session"
+        )
+    else:
+        lines.append("Server RSS: not available on this platform")
+    for error in report["error_samples"]:
+        lines.append(f"error: {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Streamlit app with simulated sessions and a stub model")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated analysts")
+    parser.add_argument("--iterations", type=int, default=3, help="extractions per session")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--think", type=float, default=1.0, help="max think time between steps, seconds")
+    parser.add_argument("--latency", type=float, default=4.0, help="median stub model latency, seconds")
+    parser.add_argument("--per-indication", type=float, default=1.0, help="extra stub latency per indication")
+    parser.add_argument("--jitter", type=float, default=0.3, help="lognormal sigma of the stub latency")
+    parser.add_argument("--allow-reuse", action="store_true", help="keep incremental and near-duplicate reuse on")
+    parser.add_argument("--store-dir", help="result store for the server (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(
+        sessions=args.sessions,
+        iterations=args.iterations,
+        ramp=args.ramp,
+        think=args.think,
+        latency=args.latency,
+        per_indication=args.per_indication,
+        jitter=args.jitter,
+        allow_reuse=args.allow_reuse,
+        store_dir=args.store_dir,
+        seed=args.seed,
+        log=(lambda message: None) if args.json else print
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    if os.environ.get(APP_MODE_ENV):
+        serve_app()
+    else:
+        raise SystemExit(main())
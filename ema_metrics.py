@@ -0,0 +1,47 @@
+import json
+import os
+import threading
+import time
+
+# Append-only local metrics log. One JSON record per line, each with a "kind"
+# ("call", "routing", ...) and a timestamp, so pages and scripts can aggregate it later.
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+METRICS_PATH = os.path.join(STORE_DIR, "metrics.jsonl")
+
+_lock = threading.Lock()
+
+
+def record(kind, **fields):
+    """
+    Append a metrics record
+    """
+    entry = {"kind": kind, "ts": time.time()}
+    entry.update(fields)
+    line = json.dumps(entry, default=str) + "\n"
+    with _lock:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        with open(METRICS_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def load(kind=None, since=None, path=None):
+    """
+    Read metrics records, optionally only one kind and only records newer than since;
+    path reads another store's metrics file
+    """
+    path = path or METRICS_PATH
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if kind is not None and entry.get("kind") != kind:
+                continue
+            if since is not None and entry.get("ts", 0) < since:
+                continue
+            records.append(entry)
+    return records
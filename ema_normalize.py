@@ -0,0 +1,140 @@
+import re
+
+# Deterministic clean-up of pasted section 4.1 text before it is sent to the model.
+# Every pass keeps a map from each output character to its offset in the original
+# text, so evidence found in the normalized text can be traced back to the paste.
+
+# Rough characters-per-token ratio for English regulatory text
+CHARS_PER_TOKEN = 4
+
+
+def _cp1252_continuations():
+    chars = set()
+    for byte in range(0x80, 0xC0):
+        try:
+            chars.add(bytes([byte]).decode("cp1252"))
+        except UnicodeDecodeError:
+            # Bytes undefined in cp1252 usually survive as the latin-1 control character
+            chars.add(chr(byte))
+    return "".join(sorted(chars))
+
+
+# A UTF-8 lead byte read as cp1252 (Â..ô) followed by continuation bytes read as cp1252
+_MOJIBAKE_RE = re.compile("[Â-ô][" + re.escape(_cp1252_continuations()) + "]{1,3}")
+
+# A page number on a line of its own, or right next to a page break (form feed). Numbers
+# inside running text are left alone: "Adults. 12 Weeks of treatment" is content.
+_PAGE_NUMBER_RE = re.compile(
+    r"^[ \t]*\d{1,3}[ \t]*$|[ \t]*\d{1,3}[ \t]*(?=\f)|(?<=\f)[ \t]*\d{1,3}(?=[ \t]*(?:\n|$))",
+    re.MULTILINE
+)
+
+# Empty list bullets left over from PDF copy, e.g. "settings: - - first-line"
+_LIST_DEBRIS_RE = re.compile(r"(?<!\S)-(?:[ \t]+-)+(?=\s)|^[ \t]*[-•▪][ \t]*$", re.MULTILINE)
+
+# "(see section 5.1)", "(see sections 4.4 and 5.1)", "(see section 5.1 for selection criteria)"
+_CROSS_REFERENCE_RE = re.compile(r"[ \t]*\(see sections? \d+(?:\.\d+)*(?:(?:,|,? and|,? or) \d+(?:\.\d+)*)*[^()]*\)", re.IGNORECASE)
+
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"[ \t]+(?=[.,;:])")
+_BLANK_LINES_RE = re.compile(r"[ \t]*\n(?:[ \t]*\n)+")
+_LINE_EDGES_RE = re.compile(r"[ \t]*\n[ \t]*")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of a text without calling the API
+    """
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _substitute(text, spans, pattern, repl):
+    """
+    Apply a regex substitution while carrying the offset map along.
+    spans[i] is the (start, end) range of the original text that character i came from;
+    replacement characters take the range of the whole text they replace.
+    """
+    out = []
+    out_spans = []
+    cursor = 0
+    count = 0
+    for match in pattern.finditer(text):
+        replacement = repl(match) if callable(repl) else repl
+        if replacement == match.group(0):
+            continue
+        out.append(text[cursor:match.start()])
+        out_spans.extend(spans[cursor:match.start()])
+        if replacement:
+            replaced = spans[match.start():match.end()]
+            out.append(replacement)
+            out_spans.extend([(replaced[0][0], replaced[-1][1])] * len(replacement))
+        cursor = match.end()
+        count += 1
+    out.append(text[cursor:])
+    out_spans.extend(spans[cursor:])
+    return "".join(out), out_spans, count
+
+
+def _cp1252_byte(char):
+    try:
+        return char.encode("cp1252")[0]
+    except UnicodeEncodeError:
+        return ord(char)
+
+
+def _repair_mojibake(match):
+    found = match.group(0)
+    try:
+        return bytes(_cp1252_byte(c) for c in found).decode("utf-8")
+    except (UnicodeDecodeError, ValueError):
+        return found
+
+
+def normalize(text):
+    """
+    Normalize pasted input text.
+
+    Returns a dict with the normalized "text", the "offsets" map of each normalized
+    character to its (start, end) range in the original, per-pass fix counts and the
+    estimated tokens saved.
+    """
+    original = text or ""
+    offsets = [(i, i + 1) for i in range(len(original))]
+    fixes = {}
+
+    passes = [
+        ("mojibake", _MOJIBAKE_RE, _repair_mojibake),
+        ("cross_references", _CROSS_REFERENCE_RE, ""),
+        ("page_numbers", _PAGE_NUMBER_RE, ""),
+        ("list_debris", _LIST_DEBRIS_RE, ""),
+        ("whitespace", _SPACES_RE, " "),
+        ("whitespace", _SPACE_BEFORE_PUNCT_RE, ""),
+        ("whitespace", _BLANK_LINES_RE, "\n\n"),
+        ("whitespace", _LINE_EDGES_RE, "\n"),
+    ]
+    result = original
+    for name, pattern, repl in passes:
+        result, offsets, count = _substitute(result, offsets, pattern, repl)
+        fixes[name] = fixes.get(name, 0) + count
+
+    # Trim while keeping the offset map aligned
+    start = len(result) - len(result.lstrip())
+    end = len(result.rstrip())
+    result, offsets = result[start:end], offsets[start:end]
+
+    return {
+        "text": result,
+        "offsets": offsets,
+        "fixes": fixes,
+        "chars_saved": len(original) - len(result),
+        "tokens_saved": estimate_tokens(original) - estimate_tokens(result)
+    }
+
+
+def to_original_span(offsets, start, end):
+    """
+    Map a (start, end) span in the normalized text back to the original text
+    """
+    if not offsets or start >= end:
+        return start, end
+    return offsets[start][0], offsets[min(end, len(offsets)) - 1][1]
@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import ema_core
+import ema_metrics
+import ema_preflight
+import ema_trace
+
+# Request packing for short documents. Many SmPCs have a one- or two-sentence section
+# 4.1, so the fixed extraction prompt costs far more tokens than the text itself. The
+# PackingExtractor collects concurrent extractions for a short moment, bin-packs them
+# by estimated output tokens (first-fit decreasing) and sends each bin as one request
+# with delimited document IDs. The answer is keyed by document and split back out; each
+# document then goes through the rest of its own pipeline run (validation, grounding,
+# repair) as usual. Documents missing from a packed answer are extracted on their own.
+
+# Estimated output tokens allowed per packed request, and documents per request
+PACK_OUTPUT_BUDGET = int(os.environ.get("EMA_PACK_OUTPUT_BUDGET", "16000"))
+PACK_MAX_DOCUMENTS = int(os.environ.get("EMA_PACK_MAX_DOCUMENTS", "8"))
+
+# How long the first waiting document waits for others to share its request
+PACK_WINDOW_SECONDS = float(os.environ.get("EMA_PACK_WINDOW_SECONDS", "0.5"))
+
+PACKED_PROMPT = """
+
+# Multiple documents
+The input holds several independent section 4.1 texts. Each one starts with a line
+<<<DOCUMENT id>>> and ends with a line <<<END id>>>.
+Apply every rule above to each document on its own: categories, Disease_level_full_text,
+Indication # numbering and evidence come only from that document's text.
+Return a single JSON object whose keys are the document ids and whose values are the JSON
+arrays for those documents, e.g. {{"D1": [...], "D2": [...]}}. Include all of these ids: {ids}.
+Use [] for a document without indications.
+"""
+
+
+def estimate_output_tokens(text):
+    return ema_preflight.preflight(text, "")["output_tokens"]
+
+
+def pack_bins(sizes, budget, max_items):
+    """
+    First-fit decreasing: group item indexes so no group's total size exceeds budget
+    or holds more than max_items. Items larger than the budget get a group of their own.
+    """
+    order = sorted(range(len(sizes)), key=lambda index: sizes[index], reverse=True)
+    bins = []
+    for index in order:
+        for packed in bins:
+            if packed["size"] + sizes[index] <= budget and len(packed["items"]) < max_items:
+                packed["size"] += sizes[index]
+                packed["items"].append(index)
+                break
+        else:
+            bins.append({"size": sizes[index], "items": [index]})
+    return [sorted(packed["items"]) for packed in bins]
+
+
+def build_request(texts):
+    """
+    Join {document id: text} into one delimited input
+    """
+    return "\n\n".join(f"<<<DOCUMENT {doc_id}>>>\n{text.strip()}\n<<<END {doc_id}>>>" for doc_id, text in texts.items())
+
+
+def split_response(data, doc_ids):
+    """
+    Per document id, its array from a packed answer, or None when it is missing or not an array
+    """
+    by_id = {}
+    if isinstance(data, dict):
+        by_id = {str(key).strip().upper(): value for key, value in data.items()}
+    results = {}
+    for doc_id in doc_ids:
+        value = by_id.get(doc_id.upper())
+        results[doc_id] = value if isinstance(value, list) else None
+    return results
+
+
+class _Request:
+    __slots__ = ("text", "size", "on_usage", "future")
+
+    def __init__(self, text, size, on_usage):
+        self.text = text
+        self.size = size
+        self.on_usage = on_usage
+        self.future = Future()
+
+
+class PackingExtractor:
+    """
+    Shared by concurrent pipeline runs: run_pipeline(..., extractor=packer.extract)
+    """
+
+    def __init__(self, output_budget=PACK_OUTPUT_BUDGET, max_documents=PACK_MAX_DOCUMENTS,
+                 window=PACK_WINDOW_SECONDS, workers=4, model_name=ema_core.DEFAULT_MODEL, user="batch"):
+        self.output_budget = output_budget
+        self.max_documents = max_documents
+        self.window = window
+        self.model_name = model_name
+        self.user = user
+        self.pending = []
+        self.first_pending = None
+        self.condition = threading.Condition()
+        self.closed = False
+        self.senders = ThreadPoolExecutor(max_workers=workers)
+        self.prompt_tokens = ema_preflight.count_prompt_tokens("", ema_core.cdp_ema_prompt)[0]
+        self.stats = {"requests": 0, "documents": 0, "fallbacks": 0}
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.dispatcher.join()
+        self.senders.shutdown(wait=True)
+
+    def extract(self, text, on_usage=None):
+        """
+        Extract one document, sharing a request with others when it is short enough.
+        Blocks until its result is in and returns the parsed array.
+        """
+        size = estimate_output_tokens(text)
+        if size * 2 > self.output_budget or self.max_documents < 2:
+            # Too large to share a request with anything worthwhile
+            return self._extract_alone(text, on_usage)
+        request = _Request(text, size, on_usage)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("the packing extractor is closed")
+            if not self.pending:
+                self.first_pending = time.monotonic()
+            self.pending.append(request)
+            self.condition.notify_all()
+        return request.future.result()
+
+    def _extract_alone(self, text, on_usage):
+        return ema_core.extract(text, model_name=self.model_name, user=self.user, on_usage=on_usage)
+
+    def _ready(self):
+        if not self.pending:
+            return False
+        if self.closed or len(self.pending) >= self.max_documents:
+            return True
+        if sum(request.size for request in self.pending) >= self.output_budget:
+            return True
+        return time.monotonic() - self.first_pending >= self.window
+
+    def _dispatch_loop(self):
+        while True:
+            with self.condition:
+                while not self._ready():
+                    if self.closed and not self.pending:
+                        return
+                    wait = None if not self.pending else self.window - (time.monotonic() - self.first_pending)
+                    self.condition.wait(None if wait is None else max(wait, 0.01))
+                batch, self.pending = self.pending, []
+            sizes = [request.size for request in batch]
+            for indexes in pack_bins(sizes, self.output_budget, self.max_documents):
+                self.senders.submit(ema_trace.bind(self._send, "packing.request"), [batch[i] for i in indexes])
+
+    def _send(self, requests):
+        try:
+            if len(requests) == 1:
+                request = requests[0]
+                request.future.set_result(self._extract_alone(request.text, request.on_usage))
+                return
+            self._send_packed(requests)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _send_packed(self, requests):
+        doc_ids = [f"D{number}" for number in range(1, len(requests) + 1)]
+        usage = [0, 0, 0]
+
+        def add_usage(*tokens):
+            for index, count in enumerate(tokens):
+                usage[index] += count
+
+        try:
+            data = ema_core.extract(
+                build_request({doc_id: request.text for doc_id, request in zip(doc_ids, requests)}),
+                prompt=ema_core.cdp_ema_prompt + PACKED_PROMPT.format(ids=", ".join(doc_ids)),
+                model_name=self.model_name,
+                user=self.user,
+                on_usage=add_usage
+            )
+            results = split_response(data, doc_ids)
+        except (json.JSONDecodeError, ValueError):
+            # Cut off or unreadable: every document falls back to its own request
+            results = dict.fromkeys(doc_ids)
+
+        # Token usage is shared out by each document's share of the estimated output; the
+        # last document takes the rounding remainder so the shares add up to the call
+        total_size = sum(request.size for request in requests) or 1
+        remaining = list(usage)
+        for number, request in enumerate(requests, 1):
+            if number == len(requests):
+                shares = remaining
+            else:
+                shares = [int(count * request.size / total_size) for count in usage]
+                remaining = [left - share for left, share in zip(remaining, shares)]
+            if request.on_usage is not None:
+                request.on_usage(*shares)
+
+        fallbacks = 0
+        for doc_id, request in zip(doc_ids, requests):
+            if results[doc_id] is not None:
+                request.future.set_result(results[doc_id])
+                continue
+            fallbacks += 1
+            try:
+                request.future.set_result(self._extract_alone(request.text, request.on_usage))
+            except Exception as e:
+                request.future.set_exception(e)
+
+        with self.condition:
+            self.stats["requests"] += 1
+            self.stats["documents"] += len(requests)
+            self.stats["fallbacks"] += fallbacks
+        ema_metrics.record(
+            "packing",
+            documents=len(requests),
+            fallbacks=fallbacks,
+            prompt_tokens_saved=(len(requests) - 1) * self.prompt_tokens
+        )
@@ -0,0 +1,166 @@
+import pandas as pd
+
+import ema_metrics
+import ema_trace
+
+# Aggregations behind the Performance page. Everything is read from the local metrics
+# log (ema_metrics) and the trace files (ema_trace) and returned as pandas frames in
+# long format, ready for altair. Records written before a field existed (e.g.
+# prompt_version, cached_tokens) simply count as missing for that field.
+
+WINDOWS = {
+    "Last hour": 3600,
+    "Last 24 hours": 24 * 3600,
+    "Last 7 days": 7 * 24 * 3600,
+    "All time": None,
+}
+
+# Time bucket per window: minutes for the last hour, so a regression shows up quickly
+BUCKETS = {
+    "Last hour": "1min",
+    "Last 24 hours": "15min",
+    "Last 7 days": "1h",
+    "All time": "1D",
+}
+
+PERCENTILES = (0.5, 0.9, 0.99)
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "thinking_tokens", "cached_tokens")
+
+
+def load_frame(kind, since=None, columns=()):
+    """
+    Metrics records of one kind as a frame with a "time" column; columns are added
+    (empty) when no record has them
+    """
+    frame = pd.DataFrame(ema_metrics.load(kind, since))
+    for column in ("ts",) + tuple(columns):
+        if column not in frame.columns:
+            frame[column] = pd.Series(dtype="float64" if column == "ts" else "object")
+    frame["time"] = pd.to_datetime(frame["ts"], unit="s")
+    return frame
+
+
+def load_calls(since=None):
+    calls = load_frame(
+        "call", since,
+        ("model", "thinking_budget", "latency", "status", "rate_limited", "prompt_version") + TOKEN_FIELDS
+    )
+    calls["prompt_version"] = calls["prompt_version"].fillna("unknown")
+    calls["rate_limited"] = calls["rate_limited"].eq(True)
+    calls["thinking_budget"] = calls["thinking_budget"].fillna(-1).astype(int).astype(str)
+    for field in TOKEN_FIELDS:
+        calls[field] = pd.to_numeric(calls[field], errors="coerce").fillna(0)
+    return calls
+
+
+def latency_percentiles(calls, by=("model", "thinking_budget")):
+    """
+    Call count, error count and latency percentiles (seconds) per group
+    """
+    by = list(by)
+    if calls.empty:
+        return pd.DataFrame(columns=by + ["calls", "errors"] + [f"p{int(q * 100)}" for q in PERCENTILES])
+    ok = calls[calls["status"] == "ok"]
+    table = ok.groupby(by)["latency"].quantile(list(PERCENTILES)).unstack()
+    table.columns = [f"p{int(q * 100)}" for q in table.columns]
+    counts = calls.groupby(by).agg(
+        calls=("status", "size"),
+        errors=("status", lambda status: int((status != "ok").sum()))
+    )
+    return counts.join(table).reset_index()
+
+
+def latency_over_time(calls, freq, series="prompt_version"):
+    """
+    p50 and p90 latency per time bucket and series, one row per (time, series, percentile)
+    """
+    ok = calls[calls["status"] == "ok"]
+    if ok.empty:
+        return pd.DataFrame(columns=["time", series, "percentile", "seconds"])
+    grouped = ok.groupby([pd.Grouper(key="time", freq=freq), series])["latency"]
+    frame = grouped.quantile([0.5, 0.9]).rename("seconds").reset_index()
+    frame = frame.rename(columns={frame.columns[2]: "percentile"})
+    frame["percentile"] = frame["percentile"].map(lambda q: f"p{int(q * 100)}")
+    return frame
+
+
+def tokens_over_time(calls, freq):
+    """
+    Token totals per time bucket and kind (input, output, thinking, cached input)
+    """
+    if calls.empty:
+        return pd.DataFrame(columns=["time", "kind", "tokens"])
+    totals = calls.groupby(pd.Grouper(key="time", freq=freq))[list(TOKEN_FIELDS)].sum().reset_index()
+    frame = totals.melt(id_vars="time", var_name="kind", value_name="tokens")
+    frame["kind"] = frame["kind"].str.replace("_tokens", "")
+    return frame
+
+
+def cache_rates(calls, pipelines, freq):
+    """
+    Per time bucket: the share of pipeline runs answered from stored work (dedup or
+    incremental reuse) and the share of input tokens served from the model's context cache
+    """
+    rows = []
+    if not pipelines.empty:
+        runs = pipelines.assign(hit=pipelines["reuse"].fillna("none") != "none")
+        reuse = runs.groupby(pd.Grouper(key="time", freq=freq))["hit"].mean().reset_index()
+        rows.append(reuse.rename(columns={"hit": "rate"}).assign(cache="result reuse"))
+    if not calls.empty:
+        tokens = calls.groupby(pd.Grouper(key="time", freq=freq))[["cached_tokens", "input_tokens"]].sum()
+        tokens = tokens[tokens["input_tokens"] > 0]
+        rate = (tokens["cached_tokens"] / tokens["input_tokens"]).rename("rate").reset_index()
+        rows.append(rate.assign(cache="context cache (input tokens)"))
+    if not rows:
+        return pd.DataFrame(columns=["time", "rate", "cache"])
+    return pd.concat(rows, ignore_index=True).dropna(subset=["rate"])
+
+
+def failures_over_time(calls, retries, freq):
+    """
+    Counts per time bucket of 429 responses, other failed calls and re-queued documents
+    """
+    rows = []
+    if not calls.empty:
+        failed = calls[calls["status"] != "ok"]
+        limited = failed["rate_limited"]
+        for label, subset in (("429 rate limited", failed[limited]), ("other errors", failed[~limited])):
+            if not subset.empty:
+                counts = subset.groupby(pd.Grouper(key="time", freq=freq)).size().rename("count").reset_index()
+                rows.append(counts.assign(kind=label))
+    if not retries.empty:
+        counts = retries.groupby(pd.Grouper(key="time", freq=freq)).size().rename("count").reset_index()
+        rows.append(counts.assign(kind="retries"))
+    if not rows:
+        return pd.DataFrame(columns=["time", "count", "kind"])
+    return pd.concat(rows, ignore_index=True)
+
+
+def batch_runs(batches):
+    """
+    One row per batch run with its throughput in documents per minute
+    """
+    if batches.empty:
+        return pd.DataFrame(columns=["time", "documents", "done", "failed", "retried", "workers", "seconds",
+                                     "docs_per_minute"])
+    runs = batches[["time", "documents", "done", "failed", "retried", "workers", "seconds"]].copy()
+    runs["docs_per_minute"] = runs["done"] / runs["seconds"].clip(lower=1e-9) * 60
+    return runs.sort_values("time", ascending=False)
+
+
+def stage_summary(path):
+    """
+    Per span name in a trace file: count, total and percentile durations in milliseconds
+    """
+    spans = [event for event in ema_trace.load_events(path) if event.get("ph") == "X"]
+    if not spans:
+        return pd.DataFrame(columns=["stage", "count", "total_ms", "p50_ms", "p90_ms", "max_ms"])
+    frame = pd.DataFrame({"stage": [s["name"] for s in spans], "ms": [s["dur"] / 1000 for s in spans]})
+    summary = frame.groupby("stage")["ms"].agg(
+        count="size",
+        total_ms="sum",
+        p50_ms=lambda ms: ms.quantile(0.5),
+        p90_ms=lambda ms: ms.quantile(0.9),
+        max_ms="max"
+    )
+    return summary.sort_values("total_ms", ascending=False).reset_index()
@@ -0,0 +1,240 @@
+import datetime
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+from ema_normalize import estimate_tokens
+
+# Preflight estimates shown before an extraction is submitted, and the token budgets
+# that are enforced before any model call is made.
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+# One row per model call and per outstanding reservation, shared by every process using the store
+LEDGER_PATH = os.path.join(STORE_DIR, "usage.sqlite")
+
+# Token budgets (0 disables the check)
+USER_DAILY_TOKEN_BUDGET = int(os.environ.get("EMA_USER_DAILY_TOKEN_BUDGET", "0"))
+DAILY_TOKEN_BUDGET = int(os.environ.get("EMA_DAILY_TOKEN_BUDGET", "0"))
+# A reservation left behind by a process that died stops counting after this long
+RESERVATION_TTL_SECONDS = int(os.environ.get("EMA_RESERVATION_TTL_SECONDS", "3600"))
+
+# Maximum output tokens of the model, thinking included
+OUTPUT_TOKEN_LIMIT = 65536
+# Share of the output limit above which an input is flagged for splitting
+OUTPUT_LIMIT_MARGIN = 0.9
+
+# Output per indication: field names, evidence, confidences and JSON punctuation
+TOKENS_PER_INDICATION = 260
+
+# USD per million tokens (thinking tokens are billed as output)
+PRICING = {
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50},
+    "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40},
+}
+
+# Rough generation speed and fixed overhead used for the latency estimate
+OUTPUT_TOKENS_PER_SECOND = {
+    "gemini-2.5-flash": 180.0,
+    "gemini-2.5-flash-lite": 350.0,
+}
+BASE_LATENCY_SECONDS = 1.5
+
+_INDICATED_RE = re.compile(r"\bindicated\b", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.;])\s+(?=[A-Z])")
+
+
+def count_indications(text):
+    """
+    Estimate the number of indications from the "is indicated" statements
+    """
+    return max(1, len(_INDICATED_RE.findall(text or "")))
+
+
+def count_prompt_tokens(text, prompt, count_fn=None):
+    """
+    Count input tokens with count_fn(contents) if given (e.g. the API's count_tokens),
+    falling back to the local estimate. Returns (tokens, exact).
+    """
+    if count_fn is not None:
+        try:
+            return int(count_fn([text, prompt])), True
+        except Exception:
+            pass
+    return estimate_tokens(text) + estimate_tokens(prompt), False
+
+
+def preflight(text, prompt, model_name="gemini-2.5-flash", thinking_budget=2500, count_fn=None):
+    """
+    Estimate input and output tokens, latency and cost of extracting text.
+    """
+    input_tokens, exact = count_prompt_tokens(text, prompt, count_fn)
+    indications = count_indications(text)
+    text_tokens = estimate_tokens(text)
+
+    # Each indication repeats its Indication_text and its section's Disease_level_full_text,
+    # which together come to roughly three times the input text over the whole array
+    output_tokens = indications * TOKENS_PER_INDICATION + 3 * text_tokens
+    total_output = output_tokens + thinking_budget
+
+    pricing = PRICING.get(model_name, PRICING["gemini-2.5-flash"])
+    speed = OUTPUT_TOKENS_PER_SECOND.get(model_name, OUTPUT_TOKENS_PER_SECOND["gemini-2.5-flash"])
+    cost = (input_tokens * pricing["input"] + total_output * pricing["output"]) / 1_000_000
+
+    limit = OUTPUT_TOKEN_LIMIT * OUTPUT_LIMIT_MARGIN
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_exact": exact,
+        "indications": indications,
+        "output_tokens": output_tokens,
+        "thinking_tokens": thinking_budget,
+        "latency_seconds": BASE_LATENCY_SECONDS + total_output / speed,
+        "cost_usd": cost,
+        "exceeds_output_limit": total_output > limit,
+        "suggested_parts": max(1, -(-output_tokens // int(limit - thinking_budget)))
+    }
+
+
+def split_text(text, parts):
+    """
+    Split text into roughly equal parts by indication count, cutting only at sentence
+    boundaries in front of an "indicated" sentence so no indication is cut in half
+    """
+    if parts <= 1:
+        return [text]
+    sentences = _SENTENCE_END_RE.split(text)
+    total = count_indications(text)
+    per_part = -(-total // parts)
+
+    chunks = []
+    current = []
+    seen = 0
+    for sentence in sentences:
+        has_indication = bool(_INDICATED_RE.search(sentence))
+        if has_indication and seen == per_part and current:
+            chunks.append(" ".join(current))
+            current = []
+            seen = 0
+        current.append(sentence)
+        seen += has_indication
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    user TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    reserved_at REAL
+);
+CREATE INDEX IF NOT EXISTS usage_day ON usage (day, user);
+"""
+
+_initialized = set()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(LEDGER_PATH) or ".", exist_ok=True)
+    # Autocommit; reserve() opens its own write transaction
+    conn = sqlite3.connect(LEDGER_PATH, timeout=30, isolation_level=None)
+    if LEDGER_PATH not in _initialized:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(_SCHEMA)
+        _initialized.add(LEDGER_PATH)
+    return conn
+
+
+def _today():
+    return datetime.date.today().isoformat()
+
+
+def _usage_today(conn, user):
+    user_used, total_used = conn.execute(
+        "SELECT COALESCE(SUM(CASE WHEN user = ? THEN tokens END), 0), COALESCE(SUM(tokens), 0) FROM usage "
+        "WHERE day = ? AND (reserved_at IS NULL OR reserved_at > ?)",
+        (user, _today(), time.time() - RESERVATION_TTL_SECONDS)
+    ).fetchone()
+    return user_used, total_used
+
+
+def usage_today(user):
+    """
+    Return (tokens used or reserved by user today, tokens used or reserved by everyone today)
+    """
+    with closing(_connect()) as conn:
+        return _usage_today(conn, user)
+
+
+def _over_budget(user, tokens, user_used, total_used):
+    if USER_DAILY_TOKEN_BUDGET and user_used + tokens > USER_DAILY_TOKEN_BUDGET:
+        return (
+            f"Daily token budget for {user} would be exceeded "
+            f"({user_used:,} used + {tokens:,} needed > {USER_DAILY_TOKEN_BUDGET:,})"
+        )
+    if DAILY_TOKEN_BUDGET and total_used + tokens > DAILY_TOKEN_BUDGET:
+        return (
+            f"Daily token budget would be exceeded "
+            f"({total_used:,} used + {tokens:,} needed > {DAILY_TOKEN_BUDGET:,})"
+        )
+    return None
+
+
+def check_budget(user, tokens):
+    """
+    Check whether a call of the given size fits the per-user and daily budgets.
+    Returns (allowed, message). Nothing is held; use reserve() before actually running it.
+    """
+    message = _over_budget(user, tokens, *usage_today(user))
+    return message is None, message or ""
+
+
+def reserve(user, tokens):
+    """
+    Check the budgets and, if the call fits, hold its estimated tokens until release(), so
+    concurrent callers in any process see them as used. Returns (reservation id or None
+    when refused, message).
+    """
+    if not USER_DAILY_TOKEN_BUDGET and not DAILY_TOKEN_BUDGET:
+        return 0, ""
+    with closing(_connect()) as conn:
+        # Takes the write lock before reading, so no other process can check in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            message = _over_budget(user, tokens, *_usage_today(conn, user))
+            if message is not None:
+                conn.execute("ROLLBACK")
+                return None, message
+            reservation = conn.execute(
+                "INSERT INTO usage (day, user, tokens, reserved_at) VALUES (?, ?, ?, ?)",
+                (_today(), user, int(tokens), time.time())
+            ).lastrowid
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return reservation, ""
+
+
+def release(reservation):
+    """
+    Drop a reservation once its calls are done; what they spent was recorded by record_usage()
+    """
+    if not reservation:
+        return
+    with closing(_connect()) as conn:
+        conn.execute("DELETE FROM usage WHERE id = ? AND reserved_at IS NOT NULL", (reservation,))
+
+
+def record_usage(user, tokens):
+    """
+    Add tokens spent by a user to today's ledger; calls made for no user (None) are not charged
+    """
+    if not tokens or user is None:
+        return
+    with closing(_connect()) as conn:
+        conn.execute("INSERT INTO usage (day, user, tokens) VALUES (?, ?, ?)", (_today(), user, int(tokens)))
+        # Only today's ledger is needed for the budgets
+        conn.execute("DELETE FROM usage WHERE day < ?", (_today(),))
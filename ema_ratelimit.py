@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+# Shared client-side rate limit for model calls. Every call made through
+# ema_core.call_gemini_api acquires a slot first, so batch runs, the watch-folder
+# daemon and multi-file uploads all stay under the same per-minute quota. When the
+# API answers 429 the limiter backs off and callers block until the pause is over.
+
+REQUESTS_PER_MINUTE = float(os.environ.get("EMA_REQUESTS_PER_MINUTE", "0"))
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class RateLimitError(Exception):
+    """
+    The model's quota was exhausted (HTTP 429 / RESOURCE_EXHAUSTED)
+    """
+
+
+def is_rate_limit_error(error):
+    if isinstance(error, RateLimitError):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+class RateLimiter:
+    """
+    Token bucket limiter with exponential backoff on 429 responses
+    """
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute / 6) if per_minute else 0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.backoff = 1.0
+        self.lock = threading.Lock()
+
+    def _wait_time(self):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if not self.per_minute:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) * 60 / self.per_minute
+
+    def acquire(self):
+        """
+        Block until a call may be made
+        """
+        while True:
+            with self.lock:
+                wait = self._wait_time()
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def throttled(self):
+        """
+        True while calls are paused after a 429
+        """
+        return time.monotonic() < self.paused_until
+
+    def penalize(self):
+        """
+        Pause all callers after a 429, doubling the pause on consecutive 429s
+        """
+        with self.lock:
+            self.paused_until = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF_SECONDS)
+
+    def reward(self):
+        """
+        Reset the backoff after a successful call
+        """
+        with self.lock:
+            self.backoff = 1.0
+
+
+shared = RateLimiter()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+import ema_terms
+from ema_incremental import field_value
+
+# Indexed local store of extraction results. Each product keeps its latest extraction;
+# every indication is a row, and each facet value (category, treatment line, modality,
+# population) is also a row in indication_facets so faceted queries are index lookups
+# instead of scans over JSON files. The "disease" facet holds canonical disease IDs from
+# the terminology index (ema_terms), so surface forms of one disease count together.
+
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+DB_PATH = os.path.join(STORE_DIR, "results.sqlite")
+
+# Facet name -> extracted field; multi-valued fields are split on commas
+FACETS = {
+    "category": "Primary Disease_category",
+    "treatment_line": "Treatment line",
+    "modality": "Treatment modality",
+    "population": "Population",
+}
+MULTI_VALUED = {"modality", "population"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_key TEXT UNIQUE NOT NULL,
+    product TEXT NOT NULL,
+    source TEXT,
+    extracted_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indications (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT,
+    indication_no INTEGER,
+    treatment_line TEXT,
+    modality TEXT,
+    population TEXT,
+    subtypes TEXT,
+    indication_text TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indication_facets (
+    indication_id INTEGER NOT NULL REFERENCES indications(id) ON DELETE CASCADE,
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_indications_product ON indications(product_id);
+CREATE INDEX IF NOT EXISTS idx_facets_lookup ON indication_facets(facet, value, indication_id);
+CREATE INDEX IF NOT EXISTS idx_facets_indication ON indication_facets(indication_id);
+"""
+
+_initialized = set()
+
+
+def connect(path=None):
+    """
+    Open the store, creating the schema on first use
+    """
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if path not in _initialized:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(_SCHEMA)
+        _initialized.add(path)
+    return conn
+
+
+def _text(item, key):
+    value = field_value(item, key)
+    return None if value is None else str(value).strip()
+
+
+def facet_values(facet, value):
+    """
+    Split a field value into the facet values it is indexed under
+    """
+    if value in (None, "", "_"):
+        return []
+    if facet in MULTI_VALUED:
+        return [part.strip() for part in re.split(r"[,;]", value) if part.strip()]
+    return [value.strip()]
+
+
+def save(product, data, source=None, path=None):
+    """
+    Store the latest extraction of a product, replacing any earlier one. Results without
+    a product name are kept apart by source name, or by a hash of their content.
+    """
+    product = (product or "").strip()
+    items = data if isinstance(data, list) else [data]
+    if product:
+        product_key = product.lower()
+    elif source:
+        product_key = f"source:{source.lower()}"
+        product = f"unknown ({source})"
+    else:
+        digest = hashlib.sha256(json.dumps(items, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        product_key = f"sha256:{digest}"
+        product = f"unknown ({digest[:8]})"
+    with closing(connect(path)) as conn, conn:
+        conn.execute("DELETE FROM products WHERE product_key = ?", (product_key,))
+        product_id = conn.execute(
+            "INSERT INTO products (product_key, product, source, extracted_at) VALUES (?, ?, ?, ?)",
+            (product_key, product, source, time.time())
+        ).lastrowid
+
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            number = field_value(item, "Indication #")
+            indication_id = conn.execute(
+                "INSERT INTO indications (product_id, position, category, indication_no, treatment_line, "
+                "modality, population, subtypes, indication_text, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    product_id,
+                    position,
+                    _text(item, "Primary Disease_category"),
+                    number if isinstance(number, int) else None,
+                    _text(item, "Treatment line"),
+                    _text(item, "Treatment modality"),
+                    _text(item, "Population"),
+                    _text(item, "Disease + sybtypes"),
+                    _text(item, "Indication_text"),
+                    json.dumps(item, ensure_ascii=False)
+                )
+            ).lastrowid
+            rows = []
+            for facet, key in FACETS.items():
+                for value in facet_values(facet, _text(item, key)):
+                    rows.append((indication_id, facet, value.lower()))
+            rows += [(indication_id, "disease", disease_id) for disease_id in ema_terms.disease_ids(item)]
+            conn.executemany("INSERT INTO indication_facets (indication_id, facet, value) VALUES (?, ?, ?)", rows)
+
+
+def reindex_diseases(path=None):
+    """
+    Re-map the disease facet of every stored indication, e.g. after the terminology file changed
+    """
+    with closing(connect(path)) as conn, conn:
+        conn.execute("DELETE FROM indication_facets WHERE facet = 'disease'")
+        indications = conn.execute("SELECT id, data FROM indications").fetchall()
+        conn.executemany(
+            "INSERT INTO indication_facets (indication_id, facet, value) VALUES (?, ?, ?)",
+            (
+                (indication_id, "disease", disease_id)
+                for indication_id, data in indications
+                for disease_id in ema_terms.disease_ids(json.loads(data))
+            )
+        )
+    return len(indications)
+
+
+def _filter_sql(filters, text=None, product=None):
+    """
+    Build the WHERE clause for facet filters. filters maps facet -> list of accepted values
+    (any of them matches); different facets must all match.
+    """
+    clauses = []
+    params = []
+    for facet, values in (filters or {}).items():
+        values = [v.lower() for v in values if v]
+        if not values:
+            continue
+        placeholders = ", ".join("?" for _ in values)
+        clauses.append(
+            f"i.id IN (SELECT indication_id FROM indication_facets WHERE facet = ? AND value IN ({placeholders}))"
+        )
+        params += [facet] + values
+    if text:
+        clauses.append("(i.category LIKE ? OR i.subtypes LIKE ? OR i.indication_text LIKE ?)")
+        params += [f"%{text}%"] * 3
+    if product:
+        clauses.append("p.product_key LIKE ?")
+        params.append(f"%{product.lower()}%")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_ids(filters=None, text=None, product=None, path=None):
+    """
+    IDs of all indications matching the facet filters, free text and product name
+    """
+    where, params = _filter_sql(filters, text, product)
+    sql = f"SELECT i.id FROM indications i JOIN products p ON p.id = i.product_id{where}"
+    with closing(connect(path)) as conn:
+        return [row[0] for row in conn.execute(sql, params)]
+
+
+def query(filters=None, text=None, product=None, limit=1000, path=None):
+    """
+    Return indications matching the facet filters, free text and product name
+    """
+    where, params = _filter_sql(filters, text, product)
+    sql = (
+        "SELECT p.product, i.category, i.indication_no, i.treatment_line, i.modality, i.population, "
+        "i.subtypes, i.indication_text FROM indications i JOIN products p ON p.id = i.product_id"
+        f"{where} ORDER BY p.product, i.position LIMIT ?"
+    )
+    columns = ["Product", "Primary Disease_category", "Indication #", "Treatment line",
+               "Treatment modality", "Population", "Disease + sybtypes", "Indication_text"]
+    with closing(connect(path)) as conn:
+        return [dict(zip(columns, row)) for row in conn.execute(sql, params + [limit])]
+
+
+def facet_counts(facet, filters=None, text=None, product=None, path=None):
+    """
+    Count matching indications per value of one facet, ignoring that facet's own filter
+    """
+    others = {k: v for k, v in (filters or {}).items() if k != facet}
+    where, params = _filter_sql(others, text, product)
+    sql = (
+        "SELECT f.value, COUNT(DISTINCT i.id) FROM indication_facets f "
+        "JOIN indications i ON i.id = f.indication_id JOIN products p ON p.id = i.product_id"
+        f"{where}{' AND' if where else ' WHERE'} f.facet = ? GROUP BY f.value ORDER BY COUNT(DISTINCT i.id) DESC"
+    )
+    with closing(connect(path)) as conn:
+        return conn.execute(sql, params + [facet]).fetchall()
+
+
+def stats(path=None):
+    with closing(connect(path)) as conn:
+        products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        indications = conn.execute("SELECT COUNT(*) FROM indications").fetchone()[0]
+    return {"products": products, "indications": indications}
+
+
+def version(path=None):
+    """
+    Changes whenever a product is saved, so caches built from the store can tell they are stale
+    """
+    with closing(connect(path)) as conn:
+        return list(conn.execute("SELECT COUNT(*), MAX(id), MAX(extracted_at) FROM products").fetchone())
@@ -0,0 +1,143 @@
+import json
+import re
+import time
+
+import ema_metrics
+import ema_validate
+from ema_preflight import count_indications
+
+# Cheapest model first; the last tier is the one every escalation ends on
+MODEL_TIERS = ["gemini-2.5-flash-lite", "gemini-2.5-flash"]
+
+# Values below this confidence on the cheap tier are re-asked on the larger model: the
+# prompt reserves it for missing or weak evidence. Ambiguous values (0.50-0.59) and null
+# or default "_" values follow the prompt's own confidence rules and are kept.
+MIN_CONFIDENCE = 0.50
+
+# Inputs routed to the cheap tier: few indications, short, and not oncology
+MAX_SIMPLE_INDICATIONS = 2
+MAX_SIMPLE_CHARS = 3000
+
+_ONCOLOGY_RE = re.compile(
+    r"\b(cancer|carcinoma|tumou?rs?|lymphoma|leuka?emia|melanoma|myeloma|sarcoma|"
+    r"mesothelioma|neoplasm|malignan\w*|metasta\w*|oncolog\w*|glioma|blastoma)\b",
+    re.IGNORECASE
+)
+
+
+def classify_input(text):
+    """
+    Return "simple" for short single-indication non-oncology inputs, else "complex"
+    """
+    if (
+        count_indications(text) <= MAX_SIMPLE_INDICATIONS
+        and len(text) <= MAX_SIMPLE_CHARS
+        and not _ONCOLOGY_RE.search(text)
+    ):
+        return "simple"
+    return "complex"
+
+
+def low_confidence_violations(data):
+    """
+    Report values whose confidence is below MIN_CONFIDENCE (missing or weak evidence), in
+    ema_validate's violation shape
+    """
+    violations = []
+    for index, item in enumerate(data if isinstance(data, list) else [data]):
+        if not isinstance(item, dict):
+            continue
+        for name in ema_validate.FIELD_RULES:
+            field = item.get(name)
+            if not isinstance(field, dict):
+                continue
+            value = field.get("value")
+            confidence = field.get("confidence")
+            if value in (None, "_") or not isinstance(confidence, (int, float)):
+                continue
+            if confidence < MIN_CONFIDENCE:
+                violations.append({
+                    "index": index,
+                    "field": name,
+                    "message": f"weak or missing evidence (confidence {confidence:.2f}) on the cheaper model"
+                })
+    return violations
+
+
+def cascade_extract(text, extract_fn, ask_fn):
+    """
+    Extract with the cheapest suitable model and escalate only what fails.
+
+    extract_fn(text, model_name) returns the parsed JSON array.
+    ask_fn(text, prompt, model_name) returns the parsed JSON of a repair call.
+
+    Simple inputs go to the cheap tier first. Its output is validated; failing or
+    low-confidence fields are re-asked on the larger model with a targeted repair call,
+    and unparseable output or fields still failing after repair escalate to a full
+    extraction on the larger model. Returns (data, route) where route describes the path.
+    """
+    route = {"class": classify_input(text), "tiers": [], "escalated": False}
+    large = MODEL_TIERS[-1]
+
+    if route["class"] == "simple":
+        small = MODEL_TIERS[0]
+        start = time.perf_counter()
+        outcome = "hit"
+        try:
+            data = extract_fn(text, small)
+            violations = ema_validate.validate_extraction(data) + low_confidence_violations(data)
+            if violations:
+                outcome = "repaired"
+                data, remaining = ema_validate.repair_extraction(
+                    data, violations, lambda t, p: ask_fn(t, p, large)
+                )
+                if remaining:
+                    data = None
+                    outcome = "escalated"
+        except (json.JSONDecodeError, ValueError, KeyError, IndexError, TypeError):
+            data = None
+            # A failed repair escalates like one that left violations behind
+            outcome = "escalated" if outcome == "repaired" else "parse_failure"
+
+        ema_metrics.record(
+            "routing",
+            tier=0,
+            model=small,
+            outcome=outcome,
+            latency=time.perf_counter() - start
+        )
+        route["tiers"].append({"model": small, "outcome": outcome})
+        if data is not None:
+            return data, route
+        route["escalated"] = True
+
+    start = time.perf_counter()
+    data = extract_fn(text, large)
+    outcome = "escalation" if route["escalated"] else "direct"
+    ema_metrics.record(
+        "routing",
+        tier=len(MODEL_TIERS) - 1,
+        model=large,
+        outcome=outcome,
+        latency=time.perf_counter() - start
+    )
+    route["tiers"].append({"model": large, "outcome": outcome})
+    return data, route
+
+
+def tier_stats(records=None):
+    """
+    Summarize routing records per model: attempts, cheap-tier hit rate and mean latency
+    """
+    records = ema_metrics.load("routing") if records is None else records
+    stats = {}
+    for entry in records:
+        model_stats = stats.setdefault(entry["model"], {"attempts": 0, "hits": 0, "latency": 0.0})
+        model_stats["attempts"] += 1
+        # A tier "hits" when its answer is the one that was kept
+        model_stats["hits"] += entry["outcome"] not in ("parse_failure", "escalated")
+        model_stats["latency"] += entry.get("latency", 0.0)
+    for model_stats in stats.values():
+        model_stats["hit_rate"] = model_stats["hits"] / model_stats["attempts"]
+        model_stats["mean_latency"] = model_stats["latency"] / model_stats["attempts"]
+    return stats
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+
+import ema_core
+import ema_normalize
+import ema_preflight
+import ema_trace
+
+# Small HTTP service around the extraction pipeline for other internal systems.
+#
+#   POST /extract        {"text": "...", "product": "...", "options": {...}} -> {"job_id", "status"}
+#                        (429 when the caller's daily token budget would be exceeded)
+#   GET  /status/<id>    -> {"job_id", "status", "requests", "elapsed"}
+#   GET  /result/<id>    -> {"job_id", "data", "violations"} once the job is done
+#
+# Identical concurrent requests (same normalized text, prompt and options) share one
+# in-flight job, so N pipelines asking for the same product pay for one model call.
+
+MAX_WORKERS = int(os.environ.get("EMA_SERVICE_WORKERS", "8"))
+MAX_FINISHED_JOBS = 1000
+SERVICE_TOKEN = os.environ.get("EMA_SERVICE_TOKEN", "")
+
+# Per-caller tokens as "token:user,token:user"; token budgets are charged to that user.
+# Calls authorised by EMA_SERVICE_TOKEN (or made without auth) are charged to SERVICE_USER.
+SERVICE_TOKENS = dict(
+    entry.strip().split(":", 1) for entry in os.environ.get("EMA_SERVICE_TOKENS", "").split(",") if ":" in entry
+)
+SERVICE_USER = os.environ.get("EMA_SERVICE_USER", "service")
+
+# Options a caller may set; everything else uses the pipeline defaults
+PIPELINE_OPTIONS = {"normalize", "incremental", "dedup", "max_distance", "routing", "two_stage", "repair", "split_parts"}
+
+
+def request_key(text, product, options):
+    """
+    Hash the normalized text, the prompt and the config that identify an extraction
+    """
+    normalized = ema_normalize.normalize(text)["text"] if options.get("normalize", True) else text
+    payload = json.dumps(
+        {"text": normalized, "product": product, "options": options, "prompt": ema_core.cdp_ema_prompt},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobTable:
+    """
+    Jobs by id plus the single-flight map from request key to the in-flight job
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.jobs = OrderedDict()
+        self.in_flight = {}
+
+    def submit(self, text, product, options, user, reservation=None):
+        """
+        Start a job, or join the identical one in flight; the budget reservation is released when
+        the job finishes (at once when joining, as no further calls are made)
+        """
+        key = request_key(text, product, options)
+        job = self.in_flight.get(key)
+        if job is not None:
+            ema_preflight.release(reservation)
+            job["requests"] += 1
+            return job
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "key": key,
+            "status": "pending",
+            "requests": 1,
+            "submitted": time.time(),
+            "finished": None,
+            "result": None,
+            "error": None
+        }
+        self.jobs[job["job_id"]] = job
+        self.in_flight[key] = job
+        asyncio.get_running_loop().create_task(self._run(job, text, product, options, user, reservation))
+        return job
+
+    async def _run(self, job, text, product, options, user, reservation=None):
+        job["status"] = "running"
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor,
+                ema_trace.bind(lambda: ema_core.run_pipeline(text, product=product, user=user, **options), "service.job")
+            )
+            job["result"] = {"data": result["data"], "violations": result["violations"]}
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+        finally:
+            ema_preflight.release(reservation)
+            job["finished"] = time.time()
+            self.in_flight.pop(job["key"], None)
+            self._evict()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def prepare(self):
+        authorization = self.request.headers.get("Authorization", "")
+        token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else None
+        if token is not None and token in SERVICE_TOKENS:
+            self.user = SERVICE_TOKENS[token]
+        elif (SERVICE_TOKEN or SERVICE_TOKENS) and token != SERVICE_TOKEN:
+            raise tornado.web.HTTPError(401)
+        else:
+            self.user = SERVICE_USER
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    def write_error(self, status_code, **kwargs):
+        self.write_json({"error": self._reason}, status_code)
+
+    @property
+    def table(self):
+        return self.application.settings["jobs"]
+
+    def job_or_404(self, job_id):
+        job = self.table.get(job_id)
+        if job is None:
+            raise tornado.web.HTTPError(404, reason="unknown job")
+        return job
+
+
+class ExtractHandler(BaseHandler):
+    def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            raise tornado.web.HTTPError(400, reason="body must be JSON")
+
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="body must be a JSON object")
+        text = body.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise tornado.web.HTTPError(400, reason="text is required")
+        options = body.get("options") or {}
+        if not isinstance(options, dict):
+            raise tornado.web.HTTPError(400, reason="options must be an object")
+        unknown = set(options) - PIPELINE_OPTIONS
+        if unknown:
+            raise tornado.web.HTTPError(400, reason=f"unknown options: {', '.join(sorted(unknown))}")
+        product = body.get("product") or ""
+        if not isinstance(product, str):
+            raise tornado.web.HTTPError(400, reason="product must be a string")
+
+        estimate = ema_preflight.preflight(text, ema_core.cdp_ema_prompt)
+        reservation, budget_message = ema_preflight.reserve(
+            self.user, estimate["input_tokens"] + estimate["output_tokens"] + estimate["thinking_tokens"]
+        )
+        if reservation is None:
+            raise tornado.web.HTTPError(429, reason=budget_message)
+
+        job = self.table.submit(text, product, options, self.user, reservation)
+        self.write_json({"job_id": job["job_id"], "status": job["status"]}, 202)
+
+
+class StatusHandler(BaseHandler):
+    def get(self, job_id):
+        job = self.job_or_404(job_id)
+        self.write_json({
+            "job_id": job_id,
+            "status": job["status"],
+            "requests": job["requests"],
+            "elapsed": (job["finished"] or time.time()) - job["submitted"],
+            "error": job["error"]
+        })
+
+
+class ResultHandler(BaseHandler):
+    def get(self, job_id):
+        job = self.job_or_404(job_id)
+        if job["status"] == "failed":
+            self.write_json({"job_id": job_id, "status": "failed", "error": job["error"]}, 500)
+        elif job["status"] != "done":
+            self.write_json({"job_id": job_id, "status": job["status"]}, 409)
+        else:
+            self.write_json(dict(job_id=job_id, **job["result"]))
+
+
+def make_app(max_workers=MAX_WORKERS):
+    return tornado.web.Application(
+        [
+            (r"/extract", ExtractHandler),
+            (r"/status/([0-9a-f]+)", StatusHandler),
+            (r"/result/([0-9a-f]+)", ResultHandler),
+        ],
+        jobs=JobTable(ThreadPoolExecutor(max_workers=max_workers))
+    )
+
+
+async def serve(port, max_workers):
+    app = make_app(max_workers)
+    app.listen(port)
+    print(f"EMA extraction service listening on :{port}")
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP service for EMA extractions")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("EMA_SERVICE_PORT", "8700")))
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.port, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+import time
+
+import ema_core
+
+# Speculative extraction: once the pasted text has been left alone for DEBOUNCE_SECONDS,
+# the pipeline starts in a background thread so the result is often ready by the time
+# the user clicks "Extract Info". Any change to the text or options cancels the running
+# job (at its next model call) and a new one starts after the next quiet period.
+# A draft stores nothing and is charged to nobody; when the user accepts it, the caller
+# stores it with ema_core.persist_result and charges its tokens.
+
+DEBOUNCE_SECONDS = 1.5
+
+
+def request_key(text, options):
+    """
+    Identify a pipeline run by its input text and options
+    """
+    payload = json.dumps([text, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SpeculativeJob:
+    """
+    One background pipeline run
+    """
+
+    def __init__(self, key, text, options):
+        self.key = key
+        self.text = text
+        self.options = options
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.result = None
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            options = dict(self.options, persist=False, user=None)
+            self.result = ema_core.run_pipeline(self.text, cancel=self.cancel_event, **options)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.monotonic()
+            self.done_event.set()
+
+    def status(self):
+        if not self.done_event.is_set():
+            return "cancelling" if self.cancel_event.is_set() else "running"
+        if isinstance(self.error, ema_core.PipelineCancelled):
+            return "cancelled"
+        return "failed" if self.error is not None else "done"
+
+    def wait(self, timeout=None):
+        """
+        Wait for the job and return its result, re-raising its error
+        """
+        self.done_event.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SpeculativeRunner:
+    """
+    Holds at most one speculative job per session and tracks when the input last changed
+    """
+
+    def __init__(self, debounce=DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self.job = None
+        self.key = None
+        self.changed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def observe(self, key):
+        """
+        Note the current input; a different key cancels the running job and restarts the debounce
+        """
+        with self.lock:
+            if key == self.key:
+                return
+            self.key = key
+            self.changed_at = time.monotonic()
+            self._cancel()
+
+    def settled(self):
+        return time.monotonic() - self.changed_at >= self.debounce
+
+    def maybe_start(self, key, text, options):
+        """
+        Start a job for key once the input has settled, unless one already exists
+        """
+        with self.lock:
+            if key != self.key or not self.settled():
+                return None
+            if self.job is not None and self.job.key == key and self.job.status() != "cancelled":
+                return self.job
+            self._cancel()
+            self.job = SpeculativeJob(key, text, options)
+            self.job.thread.start()
+            return self.job
+
+    def job_for(self, key):
+        """
+        Return the job for key if one was started and has not failed or been cancelled
+        """
+        with self.lock:
+            job = self.job
+        if job is None or job.key != key or job.status() in ("cancelled", "cancelling", "failed"):
+            return None
+        return job
+
+    def _cancel(self):
+        if self.job is not None and not self.job.done_event.is_set():
+            self.job.cancel_event.set()
+        self.job = None
+
+    def cancel(self):
+        with self.lock:
+            self._cancel()
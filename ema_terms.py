@@ -0,0 +1,317 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import deque
+
+from ema_incremental import field_value
+
+# Disease terminology index. The same disease arrives as "NSCLC", "Non-small cell lung
+# cancer (NSCLC)" or "non-small cell lung cancer"; this maps such values to one canonical
+# disease ID without a model call. Synonyms and abbreviations from a TSV terminology file
+# are compiled into an Aho-Corasick automaton, written once as flat uint32 arrays and
+# memory-mapped on load, so opening the index costs nothing and a lookup is a single
+# linear pass over the normalized value. The index is rebuilt whenever the source file
+# changes (its SHA-256 is kept in the index header).
+#
+# The IDs are used for grouping: the "disease" facet of the result store and the
+# disease_id column of ema_columnar. The near-duplicate index (ema_dedup) deliberately
+# still compares raw input text, since a reused result's values and evidence are quoted
+# from its input and would not be found in a text that names the disease differently.
+
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+TERMS_SOURCE = os.environ.get(
+    "EMA_TERMS_SOURCE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "disease_terms.tsv")
+)
+TERMS_INDEX = os.environ.get("EMA_TERMS_INDEX", os.path.join(STORE_DIR, "disease_terms.idx"))
+
+# Fields whose values are mapped, in order of preference for the single best ID
+DISEASE_FIELDS = ("Disease + sybtypes", "Primary Disease_category")
+
+# Magic (format version and byte order of the arrays), source SHA-256, node, edge and concept-blob sizes
+_MAGIC = b"EMATRM1" + (b"L" if sys.byteorder == "little" else b"B")
+_HEADER = struct.Struct("<8s32sIII")
+_NONE = -1
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_term(text):
+    """
+    Lowercase, strip accents and collapse everything but letters and digits to single spaces
+    """
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+
+def read_source(path=TERMS_SOURCE):
+    """
+    Parse the terminology TSV into [(id, preferred name, [synonyms])]
+    """
+    concepts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2:
+                raise ValueError(f"{path}: expected 'id<TAB>name<TAB>synonyms', got {line.strip()!r}")
+            synonyms = [s for s in parts[2].split("|") if s.strip()] if len(parts) > 2 else []
+            concepts.append((parts[0].strip(), parts[1].strip(), synonyms))
+    return concepts
+
+
+def _source_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def build(source=TERMS_SOURCE, path=TERMS_INDEX):
+    """
+    Compile the terminology file into the binary index at path
+    """
+    concepts = read_source(source)
+
+    # Trie over normalized synonyms; the preferred name is a synonym too
+    children = [{}]
+    outputs = [_NONE]
+    depths = [0]
+    for number, (_, name, synonyms) in enumerate(concepts):
+        for synonym in [name] + synonyms:
+            term = normalize_term(synonym)
+            if not term:
+                continue
+            node = 0
+            for char in term:
+                child = children[node].get(char)
+                if child is None:
+                    child = len(children)
+                    children.append({})
+                    outputs.append(_NONE)
+                    depths.append(depths[node] + 1)
+                    children[node][char] = child
+                node = child
+            # The first concept listing a term keeps it
+            if outputs[node] == _NONE:
+                outputs[node] = number
+
+    # Failure and dictionary-suffix links, breadth first; the root's children fail to the root
+    fail = [0] * len(children)
+    dict_link = [_NONE] * len(children)
+    queue = deque(children[0].values())
+    while queue:
+        node = queue.popleft()
+        for char, child in children[node].items():
+            state = fail[node]
+            while state and char not in children[state]:
+                state = fail[state]
+            link = fail[child] = children[state].get(char, 0)
+            dict_link[child] = link if outputs[link] != _NONE else dict_link[link]
+            queue.append(child)
+
+    # Flatten: each node's edges are contiguous and sorted by character code
+    edge_start = array("I", [0])
+    edge_char = array("I")
+    edge_child = array("I")
+    for node in range(len(children)):
+        for char, child in sorted(children[node].items()):
+            edge_char.append(ord(char))
+            edge_child.append(child)
+        edge_start.append(len(edge_char))
+
+    blob = json.dumps([[concept_id, name] for concept_id, name, _ in concepts], ensure_ascii=False).encode("utf-8")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _source_digest(source), len(children), len(edge_char), len(blob)))
+        for values in (edge_start, edge_char, edge_child, array("I", fail), array("I", depths),
+                       array("i", outputs), array("i", dict_link)):
+            values.tofile(f)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _negated(text, start):
+    """
+    Whether the term at start is preceded by the word "non" ("non-Hodgkin lymphoma" is not Hodgkin lymphoma)
+    """
+    return text[max(start - 4, 0):start] == "non " and (start == 4 or text[start - 5] == " ")
+
+
+class TermIndex:
+    """
+    A memory-mapped terminology index; use load() rather than building one directly
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.digest, nodes, edges, blob_size = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a terminology index for this version")
+        view = self._view = memoryview(self._map)
+        offset = _HEADER.size
+
+        def take(count, typecode):
+            nonlocal offset
+            values = view[offset:offset + count * 4].cast(typecode)
+            offset += count * 4
+            return values
+
+        self._edge_start = take(nodes + 1, "I")
+        self._edge_char = take(edges, "I")
+        self._edge_child = take(edges, "I")
+        self._fail = take(nodes, "I")
+        self._depth = take(nodes, "I")
+        self._output = take(nodes, "i")
+        self._dict_link = take(nodes, "i")
+        self.concepts = [tuple(concept) for concept in json.loads(bytes(view[offset:offset + blob_size]))]
+        self.names = dict(self.concepts)
+
+    def _step(self, node, code):
+        edge_char = self._edge_char
+        while True:
+            lo, hi = self._edge_start[node], self._edge_start[node + 1]
+            at = bisect.bisect_left(edge_char, code, lo, hi)
+            if at < hi and edge_char[at] == code:
+                return self._edge_child[at]
+            if node == 0:
+                return 0
+            node = self._fail[node]
+
+    def matches(self, value):
+        """
+        Every whole-word term in value as (start, end, concept id), offsets into normalize_term(value);
+        a term directly after the word "non" is not a match
+        """
+        text = normalize_term(value)
+        found = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            node = self._step(node, ord(char))
+            state = node if self._output[node] != _NONE else self._dict_link[node]
+            while state != _NONE:
+                start = end - self._depth[state]
+                if (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " ") \
+                        and not _negated(text, start):
+                    found.append((start, end, self.concepts[self._output[state]][0]))
+                state = self._dict_link[state]
+        return found
+
+    def canonical(self, value):
+        """
+        The (id, preferred name) of the longest term in value, or None; ties go to the first
+        """
+        best = None
+        for start, end, concept_id in self.matches(value):
+            if best is None or end - start > best[1] - best[0] or (end - start == best[1] - best[0] and start < best[0]):
+                best = (start, end, concept_id)
+        return None if best is None else (best[2], self.names[best[2]])
+
+    def close(self):
+        for values in (self._edge_start, self._edge_char, self._edge_child, self._fail, self._depth,
+                       self._output, self._dict_link, self._view):
+            values.release()
+        self._map.close()
+
+
+def load(source=TERMS_SOURCE, path=TERMS_INDEX):
+    """
+    Open the index, (re)building it first when it is missing or older than the source file
+    """
+    if os.path.exists(source):
+        digest = _source_digest(source)
+        try:
+            index = TermIndex(path)
+            if index.digest == digest:
+                return index
+            index.close()
+        except (OSError, ValueError, struct.error):
+            pass
+        build(source, path)
+    return TermIndex(path)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The process-wide index, loaded on first use; None when there is no terminology file
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(TERMS_SOURCE) and not os.path.exists(TERMS_INDEX):
+                    return None
+                _index = load()
+    return _index
+
+
+def canonical(value):
+    """
+    The (id, preferred name) for a disease value, or None when no known term is in it
+    """
+    index = get_index()
+    return None if index is None else index.canonical(value)
+
+
+def disease_name(concept_id):
+    index = get_index()
+    return concept_id if index is None else index.names.get(concept_id, concept_id)
+
+
+def disease_ids(item):
+    """
+    Canonical IDs for an indication's disease fields, most specific field first, without repeats
+    """
+    ids = []
+    for key in DISEASE_FIELDS:
+        match = canonical(field_value(item, key))
+        if match and match[0] not in ids:
+            ids.append(match[0])
+    return ids
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the disease terminology index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="compile the terminology file")
+    build_parser.add_argument("--source", default=TERMS_SOURCE)
+    build_parser.add_argument("--index", default=TERMS_INDEX)
+    lookup_parser = commands.add_parser("lookup", help="map disease values to canonical IDs")
+    lookup_parser.add_argument("values", nargs="+")
+    commands.add_parser("reindex", help="re-map the disease facet of every stored indication")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        path = build(args.source, args.index)
+        print(f"Wrote {path} ({len(read_source(args.source))} concepts, {os.path.getsize(path):,} bytes)")
+    elif args.command == "lookup":
+        for value in args.values:
+            match = canonical(value)
+            print(f"{value}\t{match[0] if match else '-'}\t{match[1] if match else ''}")
+    else:
+        import ema_results
+
+        print(f"Re-mapped {ema_results.reindex_diseases():,} indications")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+import atexit
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+# Stage-level tracing exported as Chrome trace JSON, which Perfetto (ui.perfetto.dev)
+# and chrome://tracing open directly. Spans are "complete" events per thread, so they
+# nest by time on each thread's track; work handed to a pool is wrapped with bind() so
+# it records its parent span and a flow arrow from the submitting span.
+#
+# Off unless EMA_TRACE=1 or enable() is called. When off, span() returns a shared no-op
+# object, so instrumented code pays one flag check per span.
+
+STORE_DIR = os.environ.get("EMA_STORE_DIR", "ema_store")
+TRACE_DIR = os.environ.get("EMA_TRACE_DIR", os.path.join(STORE_DIR, "traces"))
+
+# Buffered events are written out in batches of this size, or after this many seconds
+FLUSH_EVERY = 256
+FLUSH_SECONDS = 2.0
+
+_enabled = False
+_file = None
+_path = None
+_first_event = True
+_buffer = []
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+_named_threads = set()
+_last_flush = 0.0
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _now_us():
+    return time.time_ns() / 1000
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _emit(event):
+    tid = event["tid"]
+    with _lock:
+        if tid not in _named_threads:
+            _named_threads.add(tid)
+            _buffer.append({
+                "ph": "M", "name": "thread_name", "pid": event["pid"], "tid": tid,
+                "args": {"name": threading.current_thread().name}
+            })
+        _buffer.append(event)
+        full = len(_buffer) >= FLUSH_EVERY or time.monotonic() - _last_flush > FLUSH_SECONDS
+    if full:
+        flush()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "span_id", "parent_id")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent_id = stack[-1] if stack else getattr(_local, "remote_parent", None)
+        self.span_id = next(_ids)
+        stack.append(self.span_id)
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        _stack().pop()
+        args = dict(self.args, span_id=self.span_id)
+        if self.parent_id is not None:
+            args["parent_id"] = self.parent_id
+        if exc_type is not None:
+            args["error"] = exc_type.__name__
+        _emit({
+            "name": self.name,
+            "cat": self.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": self.start,
+            "dur": end - self.start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args
+        })
+        return False
+
+    def set(self, **args):
+        """
+        Attach more arguments to the span, e.g. results only known at the end
+        """
+        self.args.update(args)
+
+
+def enabled():
+    return _enabled
+
+
+def span(name, **args):
+    """
+    Context manager timing one stage: with ema_trace.span("core.call", model=...):
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """
+    Decorator form of span(), named after the function by default
+    """
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn, name=None):
+    """
+    Wrap a callable that will run on another thread so its span is a child of the
+    current span, with a flow arrow from here to there. Returns fn itself when off.
+    """
+    if not _enabled:
+        return fn
+    stack = _stack()
+    parent_id = stack[-1] if stack else None
+    flow_id = next(_ids)
+    span_name = name or getattr(fn, "__qualname__", "task")
+    _emit({"name": "handoff", "cat": "flow", "ph": "s", "id": flow_id, "ts": _now_us(),
+           "pid": os.getpid(), "tid": threading.get_ident()})
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "remote_parent", None)
+        _local.remote_parent = parent_id
+        try:
+            with _Span(span_name, {}):
+                _emit({"name": "handoff", "cat": "flow", "ph": "f", "bp": "e", "id": flow_id, "ts": _now_us(),
+                       "pid": os.getpid(), "tid": threading.get_ident()})
+                return fn(*args, **kwargs)
+        finally:
+            _local.remote_parent = previous
+    return wrapper
+
+
+def flush():
+    """
+    Write buffered events to the trace file
+    """
+    global _buffer, _first_event, _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+        events, _buffer = _buffer, []
+        if _file is None or not events:
+            return
+        # Chrome's JSON array format allows a missing "]", so a crashed run is still readable
+        for event in events:
+            _file.write(("" if _first_event else ",\n") + json.dumps(event, default=str))
+            _first_event = False
+        _file.flush()
+
+
+def enable(path=None):
+    """
+    Start tracing to path (default: a new file under TRACE_DIR); returns the path
+    """
+    global _enabled, _file, _path, _first_event
+    if _enabled:
+        return _path
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+    _path = path
+    _file = open(path, "w", encoding="utf-8")
+    _file.write("[\n")
+    _first_event = True
+    _named_threads.clear()
+    _buffer.append({"ph": "M", "name": "process_name", "pid": os.getpid(), "args": {"name": "ema"}})
+    _enabled = True
+    return path
+
+
+def disable():
+    """
+    Stop tracing and close the trace file
+    """
+    global _enabled, _file
+    if not _enabled:
+        return
+    _enabled = False
+    flush()
+    with _lock:
+        _file.write("\n]\n")
+        _file.close()
+        _file = None
+
+
+def trace_files():
+    """
+    Trace files under TRACE_DIR, newest first
+    """
+    if not os.path.isdir(TRACE_DIR):
+        return []
+    paths = [os.path.join(TRACE_DIR, name) for name in os.listdir(TRACE_DIR) if name.endswith(".json")]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def load_events(path):
+    """
+    Read a trace file, including one whose run did not finish
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if not content.endswith("]"):
+        content = content.rstrip(",") + "]"
+    return json.loads(content)
+
+
+atexit.register(disable)
+
+if os.environ.get("EMA_TRACE", "").lower() in ("1", "true", "yes"):
+    enable()
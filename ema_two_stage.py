@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import ema_metrics
+import ema_trace
+from ema_incremental import renumber_indications
+
+# Optional two-stage pipeline: one minimal call segments the text into disease sections
+# and indications, then one small call per indication fills the remaining fields
+# concurrently. Wall-clock time is bounded by the slowest indication, not their sum.
+
+MAX_WORKERS = 8
+
+ENRICHED_FIELDS = ["Treatment line", "Treatment modality", "Population", "Disease + sybtypes"]
+
+SEGMENT_PROMPT = """
+You are an expert Clinical Data Analyst. Segment the provided EMA therapeutic indications text.
+
+- The text is divided into sections by disease. Each section starts with its bolded or capitalized header
+  (e.g. "Melanoma", "Non-small cell lung cancer (NSCLC)"). If there is no header, use the disease name
+  from the indication text.
+- For each section give the Primary Disease_category and the full text block of the section, copied exactly.
+- Within each section, list every distinct indication: the specific sentence(s) defining who and what is
+  treated, copied exactly. Stop at a new patient population or a different drug combination.
+- IF an indication lists multiple distinct tumor types that share the same treatment conditions, create a
+  separate section for each tumor type.
+- Do not split a disease if only the treatment modality differs.
+
+Return ONLY a JSON object in this shape:
+{"sections": [{"category": {"value": "Melanoma", "evidence": "Melanoma", "confidence": 0.95},
+               "text": "<full section text>"}],
+ "indications": [{"section": 0, "text": "<indication text>"}]}
+"""
+
+ENRICH_PROMPT = """
+You are an expert Clinical Data Analyst. The input is ONE therapeutic indication from an EMA text.
+Extract the fields below using ONLY this Indication_text.
+
+{rules}
+
+Return ONLY a JSON object with exactly these keys, each with value, evidence and confidence:
+{fields}
+"""
+
+_RULES_START = "# Global Confidence Rules"
+_RULES_END = "## 1. High-Level Logic"
+_FIELDS_START = "### **Treatment line**"
+_FIELDS_END = "# One-Shot Example"
+
+
+def build_enrichment_prompt(main_prompt):
+    """
+    Build the per-indication prompt from the confidence rules, the field rules for the
+    enriched fields and the negative constraints of the main extraction prompt
+    """
+    rules = []
+    for start, end in ((_RULES_START, _RULES_END), (_FIELDS_START, _FIELDS_END)):
+        begin = main_prompt.find(start)
+        finish = main_prompt.find(end, begin + 1)
+        if begin != -1 and finish != -1:
+            rules.append(main_prompt[begin:finish].strip())
+    return ENRICH_PROMPT.format(rules="\n\n".join(rules), fields=", ".join(f'"{f}"' for f in ENRICHED_FIELDS))
+
+
+def _missing_field():
+    return {"value": None, "evidence": "", "confidence": 0.0}
+
+
+def _text_field(text):
+    return {"value": text, "evidence": text, "confidence": 1.0}
+
+
+def assemble(segments, enrichments):
+    """
+    Combine the segmentation and the per-indication enrichments into the standard array format
+    """
+    sections = segments.get("sections", [])
+    data = []
+    for indication, enriched in zip(segments.get("indications", []), enrichments):
+        try:
+            section = sections[int(indication.get("section", 0))]
+        except (ValueError, TypeError, IndexError):
+            section = {}
+        category = section.get("category")
+        if not isinstance(category, dict):
+            category = {"value": category, "evidence": category or "", "confidence": 0.9 if category else 0.0}
+
+        item = {
+            "Primary Disease_category": category,
+            "Disease_level_full_text": _text_field(section.get("text", "")),
+            "Indication #": {"value": 0, "evidence": "implicit sequencing", "confidence": 1.0},
+            "Indication_text": _text_field(indication.get("text", ""))
+        }
+        for name in ENRICHED_FIELDS:
+            field = enriched.get(name) if isinstance(enriched, dict) else None
+            item[name] = field if isinstance(field, dict) else _missing_field()
+        data.append(item)
+    return renumber_indications(data)
+
+
+def two_stage_extract(text, main_prompt, segment_fn, enrich_fn, max_workers=MAX_WORKERS, errors=(ValueError,),
+                      on_failure=None):
+    """
+    Run the two-stage pipeline.
+
+    segment_fn(text, prompt) and enrich_fn(text, prompt) return parsed JSON; enrich_fn is
+    called from worker threads, so it must not touch Streamlit state. An enrichment that
+    raises one of errors (parse and model errors) leaves its fields empty with zero
+    confidence so validation and repair can pick them up; it is recorded as an
+    "enrich_failure" metric and reported to on_failure(index, error) from the calling
+    thread. Any other error propagates.
+    """
+    with ema_trace.span("two_stage.segment"):
+        segments = segment_fn(text, SEGMENT_PROMPT)
+    indications = segments.get("indications", []) if isinstance(segments, dict) else []
+    if not indications:
+        return []
+
+    prompt = build_enrichment_prompt(main_prompt)
+    failures = []
+
+    def enrich(index, indication):
+        try:
+            return enrich_fn(indication.get("text", ""), prompt)
+        except errors as e:
+            ema_metrics.record("enrich_failure", error=type(e).__name__)
+            failures.append((index, e))
+            return {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(indications)))) as pool:
+        futures = [
+            pool.submit(ema_trace.bind(enrich, "two_stage.enrich"), index, indication)
+            for index, indication in enumerate(indications)
+        ]
+        enrichments = [future.result() for future in futures]
+
+    if on_failure is not None:
+        for index, error in sorted(failures, key=lambda failure: failure[0]):
+            on_failure(index, error)
+    return assemble(segments, enrichments)
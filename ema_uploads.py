@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import ema_core
+import ema_documents
+import ema_preflight
+import ema_trace
+
+# Extraction of many uploaded SmPC files at once. Files are parsed on the ingest pool
+# and extracted concurrently on a thread pool; every model call still goes through the
+# shared rate limiter in ema_core. The batch runs in the background and keeps a row of
+# state per file, so the UI can redraw a progress grid while it runs.
+
+UPLOAD_WORKERS = int(os.environ.get("EMA_UPLOAD_WORKERS", "16"))
+
+STATE_LABELS = {
+    "queued": "⏳ Queued",
+    "reading": "📄 Reading",
+    "waiting": "🕓 Waiting for a slot",
+    "extracting": "🔄 Extracting",
+    "done": "✅ Done",
+    "failed": "❌ Failed",
+}
+
+
+def unique_names(names):
+    """
+    Make file names unique by numbering repeats: a.pdf, a (2).pdf, ...
+    """
+    seen = {}
+    unique = []
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        candidate = name
+        while candidate in seen:
+            seen[name] += 1
+            candidate = f"{stem} ({seen[name]}){extension}"
+        seen.setdefault(name, 1)
+        seen.setdefault(candidate, 1)
+        unique.append(candidate)
+    return unique
+
+
+class UploadBatch:
+    """
+    Background extraction of a set of uploaded files
+    """
+
+    def __init__(self, files, pipeline_options=None, workers=UPLOAD_WORKERS, ingest=None, on_result=None):
+        """
+        files is a list of (file name, bytes). ingest is an ema_ingest.IngestPool; without
+        one, files are parsed on the extraction threads. on_result(name, text, result) is
+        called from a worker thread with the section text of every successful extraction.
+        """
+        names = unique_names([os.path.basename(name) for name, _ in files])
+        self.files = list(zip(names, [content for _, content in files]))
+        self.pipeline_options = dict(pipeline_options or {})
+        self.workers = max(1, min(workers, len(self.files)))
+        self.ingest = ingest
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.rows = {
+            name: {"state": "queued", "started": None, "finished": None, "indications": None,
+                   "tokens": 0, "message": ""}
+            for name, _ in self.files
+        }
+        self.results = {}
+        self.started = None
+        self.finished = None
+        self.temp_dir = None
+        self.thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def done(self):
+        return self.finished is not None
+
+    def _update(self, name, **fields):
+        with self.lock:
+            self.rows[name].update(fields)
+
+    def _add_tokens(self, name, input_tokens, output_tokens, thinking_tokens):
+        with self.lock:
+            self.rows[name]["tokens"] += input_tokens + output_tokens + thinking_tokens
+
+    def _run(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="ema_upload_")
+        try:
+            paths = {}
+            for name, content in self.files:
+                path = os.path.join(self.temp_dir, name)
+                with open(path, "wb") as f:
+                    f.write(content)
+                paths[name] = path
+
+            with ema_trace.span("uploads.batch", files=len(paths)), ThreadPoolExecutor(max_workers=self.workers) as pool:
+                jobs = []
+                sections = {}
+                for name, path in paths.items():
+                    self._update(name, state="reading", started=time.monotonic())
+                    if self.ingest is None:
+                        jobs.append(pool.submit(ema_trace.bind(self._read_and_extract, "uploads.file"), name, path))
+                    else:
+                        sections[self.ingest.submit(path)] = name
+                # Parsed sections are submitted from this thread, so the pool is still open for all of them
+                for section in as_completed(sections):
+                    job = self._section_ready(pool, sections[section], section)
+                    if job is not None:
+                        jobs.append(job)
+                wait(jobs)
+        finally:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.finished = time.monotonic()
+
+    def _section_ready(self, pool, name, future):
+        try:
+            text = future.result()
+        except Exception as e:
+            self._update(name, state="failed", finished=time.monotonic(), message=f"Could not read: {e}")
+            return None
+        job = pool.submit(ema_trace.bind(self._extract, "uploads.file"), name, text)
+        with self.lock:
+            # The extraction may already have started and moved the row on
+            if self.rows[name]["state"] == "reading":
+                self.rows[name]["state"] = "waiting"
+        return job
+
+    def _read_and_extract(self, name, path):
+        try:
+            text = ema_documents.read_section_41(path)
+        except Exception as e:
+            self._update(name, state="failed", finished=time.monotonic(), message=f"Could not read: {e}")
+            return
+        self._extract(name, text)
+
+    def _extract(self, name, text):
+        self._update(name, state="extracting")
+        try:
+            if not text.strip():
+                raise ValueError("no section 4.1 text found")
+            user = self.pipeline_options.get("user", "anonymous")
+            estimate = ema_preflight.preflight(text, ema_core.cdp_ema_prompt)
+            reservation, budget_message = ema_preflight.reserve(
+                user, estimate["input_tokens"] + estimate["output_tokens"] + estimate["thinking_tokens"]
+            )
+            if reservation is None:
+                raise RuntimeError(budget_message)
+            options = dict(self.pipeline_options)
+            options["product"] = options.get("product") or os.path.splitext(name)[0]
+            options.setdefault("split_parts", estimate["suggested_parts"] if estimate["exceeds_output_limit"] else 1)
+            try:
+                result = ema_core.run_pipeline(
+                    text,
+                    source=name,
+                    on_usage=lambda *tokens: self._add_tokens(name, *tokens),
+                    **options
+                )
+            finally:
+                ema_preflight.release(reservation)
+        except Exception as e:
+            self._update(name, state="failed", finished=time.monotonic(), message=str(e))
+            return
+        data = result["data"]
+        if self.on_result is not None:
+            self.on_result(name, text, result)
+        with self.lock:
+            self.results[name] = result
+        self._update(
+            name,
+            state="done",
+            finished=time.monotonic(),
+            indications=len(data) if isinstance(data, list) else 1,
+            message=f"{len(result['violations'])} rule violation(s)" if result["violations"] else ""
+        )
+
+    def table(self):
+        """
+        Rows for the progress grid
+        """
+        now = time.monotonic()
+        rows = []
+        with self.lock:
+            for name, row in self.rows.items():
+                elapsed = None
+                if row["started"] is not None:
+                    elapsed = round((row["finished"] or now) - row["started"], 1)
+                rows.append({
+                    "File": name,
+                    "State": STATE_LABELS[row["state"]],
+                    "Elapsed (s)": elapsed,
+                    "Indications": row["indications"],
+                    "Tokens": row["tokens"],
+                    "Message": row["message"],
+                })
+        return rows
+
+    def counts(self):
+        with self.lock:
+            states = [row["state"] for row in self.rows.values()]
+        return {state: states.count(state) for state in STATE_LABELS if state in states}
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def combined_json(self):
+        """
+        All results as one JSON document: {file name: extracted array}, in upload order
+        """
+        with self.lock:
+            combined = {name: self.results[name]["data"] for name, _ in self.files if name in self.results}
+        return json.dumps(combined, indent=2, ensure_ascii=False)
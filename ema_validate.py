@@ -0,0 +1,238 @@
+import json
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+from ema_incremental import field_value, renumber_indications
+
+# Population values allowed by the prompt ("Pediatric" is used by its age rules too)
+POPULATION_VALUES = {"Infant", "Paediatric", "Pediatric", "Adolescent", "Adult", "Elderly"}
+
+FIELD_NAMES = [
+    "Primary Disease_category",
+    "Disease_level_full_text",
+    "Indication #",
+    "Indication_text",
+    "Treatment line",
+    "Treatment modality",
+    "Population",
+    "Disease + sybtypes"
+]
+
+# Only the rules relevant to a failing field are sent back to the model
+FIELD_RULES = {
+    "Treatment line": (
+        'EXTRACT ONLY FROM Indication_text. "at least one"/"≥ 1" prior therapy -> "Second line and later"; '
+        '"at least two"/"≥ 2" -> "Third line and later"; "first-line"/"previously untreated" -> "First line"; '
+        '"after N prior therapies" -> "(N+1) line"; "relapsed"/"refractory"/"after prior therapy" -> "Second line"; '
+        'otherwise "_".'
+    ),
+    "Treatment modality": (
+        'EXTRACT ONLY FROM Indication_text. Comma-join any of "Monotherapy", "Combination", "Adjunct", '
+        '"Neoadjuvant", "Adjuvant". If no modality is mentioned use "_" (never assume Monotherapy).'
+    ),
+    "Population": (
+        'EXTRACT ONLY FROM Indication_text. Allowed values only: Infant, Paediatric, Adolescent, Adult, Elderly, '
+        'comma-joined. Ages: 0-1 Infant, >1-12 Pediatric, >12-18 Adolescent, >18-60 Adult. '
+        'If no population or age is present use "_". Never default to Adult.'
+    ),
+    "Disease + sybtypes": (
+        'EXTRACT ONLY FROM Indication_text. The disease name with its modifiers (stage, mutation, risk). '
+        'Remove treatment context, rationale and treatment history.'
+    )
+}
+
+CONFIDENCE_RULES = (
+    "Confidence is a number between 0.0 and 1.0. If evidence is empty and a value is present, confidence "
+    "MUST be < 0.50. If value is null, confidence <= 0.60. A default \"_\" value has confidence <= 0.30."
+)
+
+REPAIR_PROMPT = """
+You previously extracted structured fields from an EMA therapeutic indication and some fields break the rules below.
+Re-extract ONLY the listed fields for each listed indication, using only its Indication_text.
+
+# Confidence Rules
+{confidence_rules}
+
+# Field Rules
+{field_rules}
+
+Each field MUST include value, evidence and confidence.
+Return a single JSON object keyed by the indication id, containing only the requested fields, e.g.:
+{{"3": {{"Population": {{"value": "Adult", "evidence": "in adults", "confidence": 0.94}}}}}}
+"""
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and value.strip() in ("", "_"))
+
+
+class BaseField(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    value: Any = None
+    evidence: Optional[str] = None
+    confidence: float = Field(ge=0.0, le=1.0)
+
+
+class ExtractedField(BaseField):
+    @model_validator(mode="after")
+    def check_special_cases(self):
+        if not _is_blank(self.value) and not (self.evidence or "").strip() and self.confidence >= 0.50:
+            raise ValueError("value present with empty evidence must have confidence < 0.50")
+        if self.value is None and self.confidence > 0.60:
+            raise ValueError("null value must have confidence <= 0.60")
+        return self
+
+
+class DefaultableField(ExtractedField):
+    @model_validator(mode="after")
+    def check_default(self):
+        if isinstance(self.value, str) and self.value.strip() == "_" and self.confidence > 0.30:
+            raise ValueError('default "_" value must have confidence <= 0.30')
+        return self
+
+
+class PopulationField(DefaultableField):
+    @field_validator("value")
+    @classmethod
+    def check_vocabulary(cls, value):
+        if _is_blank(value):
+            return value
+        parts = [part.strip() for part in str(value).split(",")]
+        unknown = [part for part in parts if part not in POPULATION_VALUES]
+        if unknown:
+            raise ValueError(f"population values not allowed: {', '.join(unknown)}")
+        return value
+
+
+class IndexField(BaseField):
+    # Evidence for the counter is implicit sequencing, so no special-case checks
+    value: int
+
+
+class Indication(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    primary_disease_category: ExtractedField = Field(alias="Primary Disease_category")
+    disease_level_full_text: ExtractedField = Field(alias="Disease_level_full_text")
+    indication_number: IndexField = Field(alias="Indication #")
+    indication_text: ExtractedField = Field(alias="Indication_text")
+    treatment_line: DefaultableField = Field(alias="Treatment line")
+    treatment_modality: DefaultableField = Field(alias="Treatment modality")
+    population: PopulationField = Field(alias="Population")
+    disease_subtypes: DefaultableField = Field(alias="Disease + sybtypes")
+
+
+def validate_indication(item):
+    """
+    Validate one indication object. Returns a list of (field, message) tuples.
+    """
+    if not isinstance(item, dict):
+        return [(None, "indication is not a JSON object")]
+    try:
+        Indication.model_validate(item)
+    except ValidationError as e:
+        violations = []
+        for error in e.errors():
+            field = error["loc"][0] if error["loc"] else None
+            message = error["msg"].removeprefix("Value error, ")
+            violations.append((field, message))
+        return violations
+    return []
+
+
+def validate_extraction(data):
+    """
+    Check a parsed extraction against the schema, the confidence SPECIAL CASES, the
+    Population vocabulary and per-category Indication # sequencing.
+
+    Returns a list of violations as dicts with "index", "field" and "message".
+    """
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return [{"index": None, "field": None, "message": "output is not a JSON array"}]
+
+    violations = []
+    counters = {}
+    for index, item in enumerate(data):
+        for field, message in validate_indication(item):
+            violations.append({"index": index, "field": field, "message": message})
+
+        category = str(field_value(item, "Primary Disease_category", "") or "").strip().lower()
+        counters[category] = counters.get(category, 0) + 1
+        number = field_value(item, "Indication #")
+        if isinstance(number, int) and number != counters[category]:
+            violations.append({
+                "index": index,
+                "field": "Indication #",
+                "message": f"expected {counters[category]}, Indication # must restart at 1 per category"
+            })
+    return violations
+
+
+def build_repair_request(data, violations):
+    """
+    Build the payload and prompt for a targeted repair call covering only the failing
+    fields of the failing indications. Returns (payload, prompt), or (None, None) if
+    nothing needs the model.
+
+    Only fields with FIELD_RULES are sent: the repair sees nothing but the Indication_text,
+    which cannot fix the other fields, so their violations are left for the caller to report.
+    """
+    wanted = {}
+    for violation in violations:
+        # Indication # is repaired locally; structural problems need a full re-run
+        if violation["index"] is None or violation["field"] not in FIELD_RULES:
+            continue
+        wanted.setdefault(violation["index"], {}).setdefault(violation["field"], []).append(violation["message"])
+
+    if not wanted:
+        return None, None
+
+    payload = {}
+    fields = set()
+    for index, problems in wanted.items():
+        item = data[index]
+        payload[str(index)] = {
+            "Indication_text": field_value(item, "Indication_text", ""),
+            "fields": {name: {"current": item.get(name), "problems": messages} for name, messages in problems.items()}
+        }
+        fields.update(problems)
+
+    field_rules = "\n".join(f"- {name}: {FIELD_RULES[name]}" for name in sorted(fields))
+    prompt = REPAIR_PROMPT.format(confidence_rules=CONFIDENCE_RULES, field_rules=field_rules)
+    return json.dumps(payload, ensure_ascii=False), prompt
+
+
+def repair_extraction(data, violations, ask_fn):
+    """
+    Repair violations with the cheapest available fix: Indication # is re-sequenced locally,
+    other failing fields are re-asked in one small targeted call.
+
+    ask_fn(text, prompt) must return the parsed JSON of the model response.
+    Returns (data, remaining_violations), with data in the shape it came in (a single
+    object stays a single object).
+    """
+    single = isinstance(data, dict)
+    items = [data] if single else data
+
+    if any(v["field"] == "Indication #" for v in violations):
+        renumber_indications(items)
+
+    payload, prompt = build_repair_request(items, violations)
+    if payload is not None:
+        repaired = ask_fn(payload, prompt)
+        if isinstance(repaired, dict):
+            for key, fields in repaired.items():
+                try:
+                    item = items[int(key)]
+                except (ValueError, IndexError):
+                    continue
+                if isinstance(fields, dict) and isinstance(item, dict):
+                    for name, field in fields.items():
+                        if name in FIELD_NAMES and isinstance(field, dict):
+                            item[name] = field
+
+    return (items[0] if single else items), validate_extraction(items)
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import ema_core
+import ema_documents
+import ema_ingest
+import ema_metrics
+import ema_ratelimit
+import ema_trace
+
+# Watch-folder ingestion daemon. New or changed SmPC files dropped into a folder are
+# debounced until their size stops changing, then fed through a bounded queue to
+# extraction workers. Workers block on the shared rate limiter, so when the model's
+# quota is hit the queue fills up and the debouncer waits instead of piling up work.
+# Settled files start parsing on a process pool as they are queued, so by the time a
+# worker takes one its section 4.1 text is usually ready.
+
+DEBOUNCE_SECONDS = 5.0
+QUEUE_SIZE = 16
+WORKERS = 2
+STATE_FILE = ".ema_watch_state.json"
+RESULT_SUFFIX = ".ema.json"
+
+
+class _DropFolderHandler(FileSystemEventHandler):
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.daemon.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.daemon.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.daemon.touch(event.dest_path)
+
+
+class WatchDaemon:
+    """
+    Watches a drop folder and extracts every new or changed document once
+    """
+
+    def __init__(self, drop_dir, output_dir=None, workers=WORKERS, queue_size=QUEUE_SIZE,
+                 debounce=DEBOUNCE_SECONDS, log=print, ingest_workers=ema_ingest.INGEST_WORKERS):
+        self.drop_dir = os.path.abspath(drop_dir)
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.workers = workers
+        self.debounce = debounce
+        self.log = log
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.state_path = os.path.join(self.output_dir or self.drop_dir, STATE_FILE)
+        self.state = self._load_state()
+        self.state_lock = threading.Lock()
+        self.ingest_workers = ingest_workers
+        self.ingest = None
+
+    # State: content hash of each file that has been extracted
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def result_path(self, path):
+        directory = self.output_dir or os.path.dirname(path)
+        return os.path.join(directory, os.path.splitext(os.path.basename(path))[0] + RESULT_SUFFIX)
+
+    def touch(self, path):
+        """
+        Note a file event; the file is queued once it has been quiet for the debounce period
+        """
+        if not ema_documents.is_supported(path) or os.path.basename(path).startswith("."):
+            return
+        with self.pending_lock:
+            self.pending[path] = {"last_event": time.monotonic(), "size": None}
+
+    def _file_hash(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _debounce_loop(self):
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            ready = []
+            with self.pending_lock:
+                for path, entry in list(self.pending.items()):
+                    if now - entry["last_event"] < self.debounce:
+                        continue
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError:
+                        # Deleted or renamed before it settled
+                        del self.pending[path]
+                        continue
+                    if size != entry["size"]:
+                        # Still being written: wait another debounce period
+                        entry["size"] = size
+                        entry["last_event"] = now
+                        continue
+                    del self.pending[path]
+                    ready.append(path)
+
+            for path in ready:
+                try:
+                    digest = self._file_hash(path)
+                except OSError:
+                    continue
+                with self.state_lock:
+                    if self.state.get(path) == digest:
+                        continue
+                section = self.ingest.submit(path)
+                # Blocks while the queue is full; this is the backpressure on ingest
+                while not self.stop_event.is_set():
+                    try:
+                        self.queue.put((path, digest, section), timeout=1.0)
+                        break
+                    except queue.Full:
+                        if ema_ratelimit.shared.throttled():
+                            self.log("Rate limited: waiting for extraction queue to drain")
+            time.sleep(0.5)
+
+    def _worker_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                path, digest, section = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self._process(path, digest, section)
+            except ema_ratelimit.RateLimitError:
+                # Put the document back; the limiter pauses callers until the quota recovers
+                self.log(f"Rate limited on {os.path.basename(path)}, retrying later")
+                ema_metrics.record("retry", source="watch", reason="rate_limited")
+                self.touch(path)
+            except Exception as e:
+                self.log(f"Failed {os.path.basename(path)}: {e}")
+            finally:
+                self.queue.task_done()
+
+    @ema_trace.traced("watch.document")
+    def _process(self, path, digest, section):
+        start = time.perf_counter()
+        with ema_trace.span("watch.wait_for_ingest"):
+            text = section.result()
+        product = os.path.splitext(os.path.basename(path))[0]
+        result = ema_core.run_pipeline(text, product=product, user="watch-folder", source=path)
+
+        output_path = self.result_path(path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result["data"], f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, output_path)
+
+        with self.state_lock:
+            self.state[path] = digest
+            self._save_state()
+        self.log(f"Extracted {os.path.basename(path)} -> {output_path} ({time.perf_counter() - start:.1f} s)")
+
+    def run(self):
+        """
+        Scan existing files, then watch the folder until stop() or Ctrl+C
+        """
+        for name in sorted(os.listdir(self.drop_dir)):
+            self.touch(os.path.join(self.drop_dir, name))
+
+        self.ingest = ema_ingest.IngestPool(self.ingest_workers)
+        observer = Observer()
+        observer.schedule(_DropFolderHandler(self), self.drop_dir, recursive=False)
+        observer.start()
+        threads = [threading.Thread(target=self._debounce_loop, daemon=True)]
+        threads += [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self.log(f"Watching {self.drop_dir} ({self.workers} workers, queue size {self.queue.maxsize})")
+
+        try:
+            while not self.stop_event.is_set():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            observer.stop()
+            observer.join()
+            for thread in threads:
+                thread.join(timeout=5)
+            self.ingest.close(cancel=True)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract SmPC files dropped into a folder")
+    parser.add_argument("drop_dir", help="folder to watch for PDF, DOCX and TXT files")
+    parser.add_argument("--output", help="write results here instead of next to the source files")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS)
+    parser.add_argument("--ingest-workers", type=int, default=ema_ingest.INGEST_WORKERS,
+                        help="processes used to parse documents")
+    args = parser.parse_args(argv)
+
+    WatchDaemon(
+        args.drop_dir,
+        output_dir=args.output,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        debounce=args.debounce,
+        ingest_workers=args.ingest_workers
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
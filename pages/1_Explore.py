@@ -0,0 +1,96 @@
+import streamlit as st
+import time
+import ema_columnar
+import ema_results
+import ema_terms
+
+# Page configuration
+st.set_page_config(
+    page_title="EMA Extraction Tool - Explore",
+    page_icon="🩺",
+    layout="wide"
+)
+
+st.title("🔎 Explore Extracted Indications")
+
+store_stats = ema_results.stats()
+st.caption(f"{store_stats['products']:,} products · {store_stats['indications']:,} indications in the local result store")
+
+# Free text and product filters
+col_text, col_product = st.columns([2, 1])
+with col_text:
+    text_filter = st.text_input(
+        "Disease contains:",
+        placeholder="e.g., NSCLC, melanoma, diabetes"
+    )
+with col_product:
+    product_filter = st.text_input("Product contains:")
+
+
+def facet_options(facet, filters):
+    return {
+        value: count
+        for value, count in ema_results.facet_counts(facet, filters, text_filter.strip(), product_filter.strip())
+    }
+
+
+# Facet filters; each facet's options are counted under the other active filters
+facet_labels = {
+    "disease": "Disease",
+    "treatment_line": "Treatment line",
+    "modality": "Treatment modality",
+    "population": "Population",
+}
+filters = {facet: st.session_state.get(f"facet_{facet}", []) for facet in facet_labels}
+facet_columns = st.columns(len(facet_labels))
+for column, (facet, label) in zip(facet_columns, facet_labels.items()):
+    with column:
+        options = facet_options(facet, filters)
+        for value in filters[facet]:
+            options.setdefault(value, 0)
+        filters[facet] = st.multiselect(
+            label,
+            options=list(options),
+            format_func=lambda value, facet=facet, options=options: (
+                f"{ema_terms.disease_name(value) if facet == 'disease' else value} ({options[value]})"
+            ),
+            key=f"facet_{facet}"
+        )
+
+
+@st.cache_resource(max_entries=1)
+def corpus(version):
+    # One memory-mapped columnar table per store version, shared by all sessions of this worker
+    return ema_columnar.load_store()
+
+
+start = time.perf_counter()
+matching = ema_columnar.select(
+    corpus(ema_columnar.store_version()),
+    ema_results.query_ids(filters, text_filter.strip(), product_filter.strip())
+)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+st.caption(f"{matching.num_rows:,} matching indications ({elapsed_ms:.1f} ms)")
+show_evidence = st.toggle("Show evidence and confidence", value=False)
+columns = ema_columnar.VALUE_COLUMNS + (ema_columnar.EVIDENCE_COLUMNS if show_evidence else [])
+st.dataframe(ema_columnar.to_pandas(matching, columns), use_container_width=True, hide_index=True)
+
+# Exports of the matching rows with every field's value, evidence and confidence
+col_csv, col_parquet = st.columns(2)
+with col_csv:
+    st.download_button(
+        label="📥 Download CSV",
+        data=ema_columnar.to_csv_bytes(matching),
+        file_name="ema_indications.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
+with col_parquet:
+    st.download_button(
+        label="📥 Download Parquet",
+        data=ema_columnar.to_parquet_bytes(matching),
+        file_name="ema_indications.parquet",
+        mime="application/octet-stream",
+        use_container_width=True
+    )
@@ -0,0 +1,167 @@
+import streamlit as st
+import altair as alt
+import os
+import time
+import ema_perf
+import ema_trace
+
+# Page configuration
+st.set_page_config(
+    page_title="EMA Extraction Tool - Performance",
+    page_icon="🩺",
+    layout="wide"
+)
+
+st.title("📈 Performance")
+st.caption("Model calls, token use, caching and batch throughput from the local metrics log and trace files.")
+
+# Time window and filters
+col_window, col_models, col_series = st.columns([1, 2, 1])
+with col_window:
+    window = st.selectbox("Time window:", list(ema_perf.WINDOWS), index=1)
+seconds = ema_perf.WINDOWS[window]
+since = time.time() - seconds if seconds else None
+freq = ema_perf.BUCKETS[window]
+
+calls = ema_perf.load_calls(since)
+pipelines = ema_perf.load_frame("pipeline", since, ("reuse",))
+retries = ema_perf.load_frame("retry", since)
+batches = ema_perf.load_frame("batch", since, ("documents", "done", "failed", "retried", "workers", "seconds"))
+
+with col_models:
+    models = sorted(calls["model"].dropna().unique())
+    selected_models = st.multiselect("Models:", models, default=models)
+with col_series:
+    series = st.selectbox(
+        "Compare latency by:",
+        ["prompt_version", "model", "thinking_budget"],
+        format_func=lambda column: column.replace("_", " ").capitalize()
+    )
+calls = calls[calls["model"].isin(selected_models)]
+
+if calls.empty and pipelines.empty and batches.empty:
+    st.info("ℹ️ No metrics recorded in this window yet. Run some extractions and come back.")
+    st.stop()
+
+# Headline numbers
+ok_calls = calls[calls["status"] == "ok"]
+metric_columns = st.columns(5)
+metric_columns[0].metric("Model calls", f"{len(calls):,}")
+metric_columns[1].metric("p50 latency", f"{ok_calls['latency'].quantile(0.5):.1f} s" if len(ok_calls) else "–")
+metric_columns[2].metric("p90 latency", f"{ok_calls['latency'].quantile(0.9):.1f} s" if len(ok_calls) else "–")
+metric_columns[3].metric("429 responses", f"{int(calls['rate_limited'].sum()):,}")
+reuse_rate = (pipelines["reuse"].fillna("none") != "none").mean() if len(pipelines) else None
+metric_columns[4].metric("Result reuse", f"{reuse_rate:.0%}" if reuse_rate is not None else "–")
+
+# Latency
+st.divider()
+st.subheader("⏱️ Latency")
+st.dataframe(
+    ema_perf.latency_percentiles(calls, ("model", "thinking_budget", "prompt_version")),
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        f"p{int(q * 100)}": st.column_config.NumberColumn(f"p{int(q * 100)} (s)", format="%.2f")
+        for q in ema_perf.PERCENTILES
+    }
+)
+
+col_histogram, col_trend = st.columns([1, 1])
+with col_histogram:
+    st.markdown("#### Distribution by model and thinking budget")
+    histogram = alt.Chart(ok_calls).mark_bar(opacity=0.7).encode(
+        x=alt.X("latency:Q", bin=alt.Bin(maxbins=40), title="Latency (s)"),
+        y=alt.Y("count():Q", stack=None, title="Calls"),
+        color=alt.Color("model:N", title="Model"),
+        row=alt.Row("thinking_budget:N", title="Thinking budget"),
+        tooltip=["model:N", "thinking_budget:N", "count():Q"]
+    ).properties(height=120)
+    st.altair_chart(histogram, use_container_width=True)
+with col_trend:
+    st.markdown("#### p50 / p90 over time")
+    trend = alt.Chart(ema_perf.latency_over_time(calls, freq, series)).mark_line(point=True).encode(
+        x=alt.X("time:T", title=None),
+        y=alt.Y("seconds:Q", title="Latency (s)"),
+        color=alt.Color(f"{series}:N", title=series.replace("_", " ").capitalize()),
+        strokeDash=alt.StrokeDash("percentile:N", title="Percentile"),
+        tooltip=["time:T", f"{series}:N", "percentile:N", alt.Tooltip("seconds:Q", format=".2f")]
+    )
+    st.altair_chart(trend, use_container_width=True)
+
+# Tokens
+st.divider()
+st.subheader("🔢 Tokens")
+tokens = alt.Chart(ema_perf.tokens_over_time(calls, freq)).mark_bar().encode(
+    x=alt.X("time:T", title=None),
+    y=alt.Y("tokens:Q", title="Tokens"),
+    color=alt.Color("kind:N", title="Kind"),
+    tooltip=["time:T", "kind:N", alt.Tooltip("tokens:Q", format=",.0f")]
+)
+st.altair_chart(tokens, use_container_width=True)
+
+# Caching, retries and rate limits
+st.divider()
+col_cache, col_failures = st.columns([1, 1])
+with col_cache:
+    st.subheader("♻️ Cache hit rates")
+    cache = alt.Chart(ema_perf.cache_rates(calls, pipelines, freq)).mark_line(point=True).encode(
+        x=alt.X("time:T", title=None),
+        y=alt.Y("rate:Q", title="Hit rate", axis=alt.Axis(format="%"), scale=alt.Scale(domain=[0, 1])),
+        color=alt.Color("cache:N", title="Cache"),
+        tooltip=["time:T", "cache:N", alt.Tooltip("rate:Q", format=".0%")]
+    )
+    st.altair_chart(cache, use_container_width=True)
+with col_failures:
+    st.subheader("🚦 Retries and 429s")
+    failures = ema_perf.failures_over_time(calls, retries, freq)
+    if failures.empty:
+        st.caption("✅ No failed calls or retries in this window.")
+    else:
+        failure_chart = alt.Chart(failures).mark_bar().encode(
+            x=alt.X("time:T", title=None),
+            y=alt.Y("count:Q", title="Count"),
+            color=alt.Color("kind:N", title=None),
+            tooltip=["time:T", "kind:N", "count:Q"]
+        )
+        st.altair_chart(failure_chart, use_container_width=True)
+
+# Batch runs
+st.divider()
+st.subheader("📦 Batch throughput")
+runs = ema_perf.batch_runs(batches)
+if runs.empty:
+    st.caption("No batch runs in this window.")
+else:
+    throughput = alt.Chart(runs).mark_bar().encode(
+        x=alt.X("time:T", title="Run started"),
+        y=alt.Y("docs_per_minute:Q", title="Documents per minute"),
+        color=alt.Color("workers:O", title="Workers"),
+        tooltip=["time:T", "documents:Q", "done:Q", "failed:Q", "retried:Q", "workers:Q",
+                 alt.Tooltip("docs_per_minute:Q", format=".1f")]
+    )
+    st.altair_chart(throughput, use_container_width=True)
+    st.dataframe(runs, use_container_width=True, hide_index=True)
+
+# Stage timings from trace files
+st.divider()
+st.subheader("🧵 Stage timings from traces")
+trace_paths = ema_trace.trace_files()
+if not trace_paths:
+    st.caption("No trace files yet. Start the app or a batch run with EMA_TRACE=1 to record them.")
+else:
+    trace_path = st.selectbox("Trace file:", trace_paths, format_func=os.path.basename)
+    stages = ema_perf.stage_summary(trace_path)
+    stage_chart = alt.Chart(stages).mark_bar().encode(
+        x=alt.X("total_ms:Q", title="Total time (ms)"),
+        y=alt.Y("stage:N", sort="-x", title=None),
+        tooltip=["stage:N", "count:Q", alt.Tooltip("p50_ms:Q", format=".1f"), alt.Tooltip("p90_ms:Q", format=".1f")]
+    )
+    st.altair_chart(stage_chart, use_container_width=True)
+    st.dataframe(stages, use_container_width=True, hide_index=True)
+    with open(trace_path, "rb") as f:
+        st.download_button(
+            label="📥 Download trace (open in ui.perfetto.dev)",
+            data=f.read(),
+            file_name=os.path.basename(trace_path),
+            mime="application/json"
+        )